@@ -0,0 +1,116 @@
+"""Run the benchmark suite and compare its results with a baseline.
+
+    uv run python -m benchmarks run [--suite all|repository|http]
+        [--sizes 20x1000,20x1000000] [--load-size 20x10000]
+        [--concurrency 1,8,32] [--only fetch_board,move]
+        [--output results.json] [--baseline PATH] [--threshold 0.25]
+    uv run python -m benchmarks compare RESULTS [--baseline PATH] [--threshold 0.25]
+
+`run` writes its results as JSON and, if the baseline file exists, compares
+them with it. Both commands exit with status 1 when a metric got worse than
+its baseline by more than the threshold, 25% by default. To record a new
+baseline, run the suite with `--output benchmarks/baseline.json`. Baselines
+only hold on the machine that recorded them: record one before a change and
+compare after it on the same machine. On a shared machine, a slow spell can
+make unchanged code look slower than the threshold; rerun before trusting a
+regression, or raise `--threshold`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks import endpoints, repository
+from benchmarks.generators import BoardSize
+from benchmarks.harness import (
+    DEFAULT_THRESHOLD,
+    Results,
+    compare,
+    environment,
+    report,
+)
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+OUTPUT_PATH = Path("benchmark-results.json")
+
+
+def sizes(value: str) -> list[BoardSize]:
+    return [BoardSize.parse(size) for size in value.split(",")]
+
+
+def numbers(value: str) -> list[int]:
+    return [int(number) for number in value.split(",")]
+
+
+def names(value: str) -> list[str]:
+    return value.split(",")
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and compare with a baseline")
+    run.add_argument("--suite", choices=["all", "repository", "http"], default="all")
+    run.add_argument(
+        "--sizes",
+        type=sizes,
+        default=repository.DEFAULT_SIZES,
+        help="board sizes for the repository functions, as <stages>x<tasks>",
+    )
+    run.add_argument(
+        "--load-size",
+        type=BoardSize.parse,
+        default=endpoints.DEFAULT_SIZE,
+        help="board size for the load test",
+    )
+    run.add_argument(
+        "--concurrency",
+        type=numbers,
+        default=endpoints.DEFAULT_CONCURRENCY,
+        help="numbers of concurrent clients in the load test",
+    )
+    run.add_argument(
+        "--only", type=names, help="only these repository functions or scenarios"
+    )
+    run.add_argument("--output", type=Path, default=OUTPUT_PATH)
+
+    compare = commands.add_parser("compare", help="compare results with a baseline")
+    compare.add_argument("results", type=Path)
+
+    for command in (run, compare):
+        command.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+        command.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    # read before running, so a run can overwrite its own baseline
+    baseline = Results.read(args.baseline) if args.baseline.exists() else None
+
+    if args.command == "run":
+        results = Results(environment=environment())
+        if args.suite in ("all", "repository"):
+            repository.run(results, args.sizes, args.only)
+        if args.suite in ("all", "http"):
+            endpoints.run(results, args.load_size, args.concurrency, only=args.only)
+        results.write(args.output)
+        print(f"\nwrote {len(results.metrics)} metrics to {args.output}")
+    else:
+        results = Results.read(args.results)
+
+    if baseline is None:
+        print(f"no baseline at {args.baseline}, nothing to compare")
+        return 0
+    if baseline.environment.get("platform") != results.environment.get("platform"):
+        print("warning: the baseline was recorded on a different platform")
+    print(f"\ncompared with {args.baseline} from {baseline.environment.get('date')}")
+    regressions = report(compare(results, baseline), args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
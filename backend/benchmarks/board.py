@@ -0,0 +1,80 @@
+"""Benchmark board assembly in `fetch_stages_with_tasks`.
+
+Compares the previous two-query, O(stages x tasks) implementation against the
+single-query, single-pass one for boards from 1k to 1M tasks, and for a fixed
+number of tasks spread over a growing number of stages.
+
+Run with `uv run python -m benchmarks.board`.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from sqlite3 import Cursor
+
+from pypika import Table
+
+from benchmarks.generators import populate
+from benchmarks.harness import timeit
+from src.helpers import init_conn, init_schema
+from src.repository import DEFAULT_SCHEMA, fetch_stages_with_tasks
+from src.schemas import StageDetail, StagePublic, TaskPublic
+
+NUM_STAGES = 20
+TASK_COUNTS = [1_000, 10_000, 100_000, 1_000_000]
+NUM_TASKS = 100_000
+STAGE_COUNTS = [5, 50, 500]
+
+
+def legacy_fetch_stages_with_tasks(cur: Cursor) -> list[StageDetail]:
+    """The implementation before the single-query rewrite, for comparison."""
+    cur = cur.execute(Table("stage").select("*").get_sql())
+    stages = [StagePublic.from_row(row) for row in cur.fetchall()]
+
+    cur = cur.execute(Table("task").select("*").get_sql())
+    tasks = [TaskPublic.from_row(row) for row in cur.fetchall()]
+
+    stage_details: list[StageDetail] = []
+    for stage in stages:
+        stage_tasks = [task for task in tasks if task.stage_id == stage.id]
+        stage = StageDetail(**stage.model_dump(), tasks=stage_tasks)
+        stage_details.append(stage.sort_by_position())
+    return stage_details
+
+
+def run(num_stages: int, num_tasks: int) -> tuple[float, float]:
+    conn = init_conn(Path(":memory:"))
+    cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+    populate(cur, num_stages, num_tasks)
+
+    repeat = 5 if num_tasks < 100_000 else 1
+    legacy = timeit(lambda: legacy_fetch_stages_with_tasks(cur), repeat)
+    current = timeit(lambda: fetch_stages_with_tasks(cur), repeat)
+    conn.close()
+    return legacy, current
+
+
+def main() -> None:
+    header = f"{'legacy [s]':>12} {'single pass [s]':>16} {'speedup':>8}"
+
+    print(f"{NUM_STAGES} stages\n{'tasks':>10} {header}")
+    for num_tasks in TASK_COUNTS:
+        legacy, current = run(NUM_STAGES, num_tasks)
+        print(
+            f"{num_tasks:>10} {legacy:>12.4f} {current:>16.4f} "
+            f"{legacy / current:>7.2f}x"
+        )
+
+    print(f"\n{NUM_TASKS} tasks\n{'stages':>10} {header}")
+    for num_stages in STAGE_COUNTS:
+        legacy, current = run(num_stages, NUM_TASKS)
+        print(
+            f"{num_stages:>10} {legacy:>12.4f} {current:>16.4f} "
+            f"{legacy / current:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    sqlite3.enable_callback_tracebacks(True)
+    main()
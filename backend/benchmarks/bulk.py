@@ -0,0 +1,67 @@
+"""Compare task import throughput: one task per transaction vs. bulk insert.
+
+`per task` mirrors `POST /tasks` (insert_task plus a commit per task),
+`bulk` is `insert_tasks` in one transaction, as done by `POST /tasks/bulk`.
+
+Run with `uv run python -m benchmarks.bulk`.
+"""
+
+from __future__ import annotations
+
+import tempfile
+import time
+from pathlib import Path
+
+from src.helpers import init_conn, init_schema
+from src.repository import DEFAULT_SCHEMA, insert_stage, insert_task, insert_tasks
+from src.schemas import StageCreate, TaskCreate
+
+NUM_STAGES = 5
+PER_TASK_ROWS = 2_000
+BULK_ROWS = [2_000, 50_000, 200_000]
+
+
+def make_tasks(num_tasks: int) -> list[TaskCreate]:
+    return [
+        TaskCreate(name=f"Task {i}", stage_id=i % NUM_STAGES + 1)
+        for i in range(num_tasks)
+    ]
+
+
+def rows_per_sec(db_path: Path, num_tasks: int, bulk: bool) -> float:
+    conn = init_conn(db_path)
+    cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+    for i in range(NUM_STAGES):
+        insert_stage(cur, StageCreate(name=f"Stage {i}"))
+    conn.commit()
+    tasks = make_tasks(num_tasks)
+
+    start = time.perf_counter()
+    if bulk:
+        insert_tasks(cur, tasks)
+        conn.commit()
+    else:
+        for task in tasks:
+            insert_task(cur, task)
+            conn.commit()
+    elapsed = time.perf_counter() - start
+
+    conn.close()
+    return num_tasks / elapsed
+
+
+def main() -> None:
+    print(f"{'mode':>10} {'rows':>10} {'rows/s':>12}")
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        db_path = Path(tmp) / "per_task.db"
+        rate = rows_per_sec(db_path, PER_TASK_ROWS, bulk=False)
+        print(f"{'per task':>10} {PER_TASK_ROWS:>10} {rate:>12.0f}")
+
+        for num_tasks in BULK_ROWS:
+            db_path = Path(tmp) / f"bulk_{num_tasks}.db"
+            rate = rows_per_sec(db_path, num_tasks, bulk=True)
+            print(f"{'bulk':>10} {num_tasks:>10} {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Load test of the HTTP endpoints through the ASGI app, at fixed concurrency.
+
+Every scenario runs against a fresh copy of a synthetic board, with a number
+of concurrent clients sharing the total requests. Each client is an httpx
+client calling the app in process, so the numbers include the whole request
+path (middleware, validation, database threads, serialization) but neither a
+server nor the network. For a server under load over real connections, see
+`benchmarks.load`.
+
+Results are `http/<scenario>/c<concurrency>/<p50_ms|p95_ms|rps>`, the best of
+a few rounds. Failed requests abort the run: a fast error is not a result.
+
+Run as part of the suite with `uv run python -m benchmarks run`, or alone
+with `uv run python -m benchmarks.endpoints`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from collections.abc import Awaitable, Callable, Iterator, Sequence
+from contextlib import contextmanager
+from math import inf
+from pathlib import Path
+
+import httpx
+
+os.environ.setdefault("SQLITE_DATABASE_PATH", ":memory:")
+
+from benchmarks.generators import BoardSize, create_board  # noqa: E402
+from benchmarks.harness import Results, percentile  # noqa: E402
+from src.cache import BoardCache  # noqa: E402
+from src.events import BoardEvents  # noqa: E402
+from src.executor import DatabaseExecutor  # noqa: E402
+from src.helpers import open_pool  # noqa: E402
+from src.main import app  # noqa: E402
+from src.metrics import Metrics, trace_statement  # noqa: E402
+from src.repository import fetch_board_version  # noqa: E402
+
+DEFAULT_SIZE = BoardSize(20, 10_000)
+DEFAULT_CONCURRENCY = [1, 8, 32]
+REQUESTS = 400
+ROUNDS = 3
+READERS = 4
+WRITE_RATIO = 0.1
+
+# the app logs at INFO, and so would httpx, for every request
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+@contextmanager
+def serving(
+    db_path: Path, readers: int = READERS, metrics: Metrics | None = None
+) -> Iterator[None]:
+    """Set up the app state the lifespan would, on the database at `db_path`."""
+    trace = trace_statement if metrics is not None else None
+    app.state.pool = open_pool(db_path, size=readers, timeout=5, trace=trace)
+    app.state.db_executor = DatabaseExecutor(readers=readers)
+    app.state.board_cache = BoardCache()
+    with app.state.pool.read() as cur:
+        app.state.board_events = BoardEvents(fetch_board_version(cur))
+    app.state.metrics = metrics
+    try:
+        yield
+    finally:
+        app.state.board_events.close()
+        app.state.db_executor.shutdown()
+        app.state.pool.close()
+
+
+class Session:
+    """One client of the board: its connection and the last ETag it saw."""
+
+    def __init__(self, client: httpx.AsyncClient, size: BoardSize, seed: int):
+        self.client = client
+        self.size = size
+        self.rng = random.Random(seed)
+        self.etag = ""
+
+    def task(self) -> int:
+        return self.rng.randint(1, self.size.tasks)
+
+    def stage(self) -> int:
+        return self.rng.randint(1, self.size.stages)
+
+    async def load_board(self) -> httpx.Response:
+        response = await self.client.get(
+            "/stages/tasks", headers={"If-None-Match": self.etag}
+        )
+        self.etag = response.headers.get("ETag", self.etag)
+        return response
+
+
+async def board(session: Session) -> httpx.Response:
+    return await session.client.get("/stages/tasks")
+
+
+async def revalidate(session: Session) -> httpx.Response:
+    return await session.load_board()
+
+
+async def summary(session: Session) -> httpx.Response:
+    return await session.client.get("/stages/summary")
+
+
+async def stage_page(session: Session) -> httpx.Response:
+    return await session.client.get(
+        f"/stages/{session.stage()}/tasks", params={"limit": 50}
+    )
+
+
+async def search(session: Session) -> httpx.Response:
+    return await session.client.get("/tasks/search", params={"q": str(session.task())})
+
+
+async def create(session: Session) -> httpx.Response:
+    task = {"name": "New task", "stage_id": session.stage()}
+    return await session.client.post("/tasks", json=task)
+
+
+async def rename(session: Session) -> httpx.Response:
+    return await session.client.patch(
+        f"/tasks/{session.task()}", json={"name": f"Renamed {session.task()}"}
+    )
+
+
+async def move(session: Session) -> httpx.Response:
+    per_stage = session.size.tasks // session.size.stages
+    return await session.client.patch(
+        f"/tasks/{session.task()}/move",
+        params={"response": "delta"},
+        json={
+            "stage_id": session.stage(),
+            "to_index": session.rng.randrange(per_stage),
+        },
+    )
+
+
+async def frontend(session: Session) -> httpx.Response:
+    """Like the frontend: mostly revalidating the board, sometimes moving a task."""
+    if session.rng.random() < WRITE_RATIO:
+        return await move(session)
+    return await session.load_board()
+
+
+Scenario = Callable[[Session], Awaitable[httpx.Response]]
+SCENARIOS: dict[str, Scenario] = {
+    "board": board,
+    "revalidate": revalidate,
+    "summary": summary,
+    "stage_page": stage_page,
+    "search": search,
+    "create": create,
+    "rename": rename,
+    "move": move,
+    "frontend": frontend,
+}
+
+
+async def drive(
+    scenario: Scenario, size: BoardSize, concurrency: int, requests: int
+) -> tuple[list[float], float]:
+    """Send `requests` requests from `concurrency` clients, return the latencies
+    and the elapsed time."""
+    latencies: list[float] = []
+    failures: list[str] = []
+
+    async def client(session: Session, count: int) -> None:
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await scenario(session)
+            latencies.append(time.perf_counter() - start)
+            if response.is_error:
+                failures.append(f"{response.status_code} {response.text[:200]}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        sessions = [Session(http, size, seed) for seed in range(concurrency)]
+        # every client starts with the board and its ETag, like a fresh tab
+        for session in sessions:
+            await session.load_board()
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(client(session, requests // concurrency) for session in sessions)
+        )
+        elapsed = time.perf_counter() - start
+    if failures:
+        raise RuntimeError(f"{len(failures)} failed requests, first: {failures[0]}")
+    return latencies, elapsed
+
+
+def run(
+    results: Results,
+    size: BoardSize = DEFAULT_SIZE,
+    concurrency: Sequence[int] = DEFAULT_CONCURRENCY,
+    requests: int = REQUESTS,
+    only: Sequence[str] | None = None,
+    rounds: int = ROUNDS,
+) -> None:
+    """Load test every scenario, or those in `only`, at every concurrency.
+
+    Like the repository functions, every run is repeated in `rounds` rounds
+    over all of them, and the best round counts.
+    """
+    runs = [
+        (name, scenario, clients)
+        for name, scenario in SCENARIOS.items()
+        if only is None or name in only
+        for clients in concurrency
+    ]
+    # (p50, p95, requests per second) of the best round
+    best: dict[tuple[str, int], tuple[float, float, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        board_path = create_board(Path(tmp) / "board.db", size)
+        db_path = Path(tmp) / "bench.db"
+        for _ in range(rounds):
+            for name, scenario, clients in runs:
+                shutil.copyfile(board_path, db_path)
+                with serving(db_path):
+                    latencies, elapsed = asyncio.run(
+                        drive(scenario, size, clients, requests)
+                    )
+                p50, p95, rps = best.get((name, clients), (inf, inf, 0.0))
+                best[name, clients] = (
+                    min(p50, statistics.median(latencies) * 1e3),
+                    min(p95, percentile(latencies, 95) * 1e3),
+                    max(rps, len(latencies) / elapsed),
+                )
+
+    print(
+        f"\nendpoints on {size.stages} stages x {size.tasks} tasks, {requests} requests"
+    )
+    print(
+        f"{'scenario':>14} {'clients':>8} {'p50 [ms]':>9} {'p95 [ms]':>9} {'req/s':>8}"
+    )
+    for (name, clients), (p50, p95, rps) in best.items():
+        prefix = f"http/{name}/c{clients}"
+        results.add(f"{prefix}/p50_ms", p50, "ms")
+        results.add(f"{prefix}/p95_ms", p95, "ms")
+        results.add(f"{prefix}/rps", rps, "req/s", better="higher")
+        print(f"{name:>14} {clients:>8} {p50:>9.2f} {p95:>9.2f} {rps:>8.0f}")
+
+
+def main() -> None:
+    run(Results())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Fan-out cost of board events to many subscribers.
+
+Subscribes `n` consumers to one `BoardEvents`, publishes a burst of events
+from another thread, like the database write thread does, and measures how
+long it takes until every subscriber has received all of them.
+
+Run with `uv run python -m benchmarks.events`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from src.events import BoardEvent, BoardEvents
+
+SUBSCRIBER_COUNTS = [100, 1_000, 10_000]
+NUM_EVENTS = 100
+
+
+async def consume(events: BoardEvents, received: list[int]) -> None:
+    async for frames in events.subscribe(0):
+        received[0] += frames.count(b"\nevent: ")
+
+
+async def fan_out(num_subscribers: int) -> float:
+    events = BoardEvents(version=0)
+    received = [0]
+    consumers = [
+        asyncio.ensure_future(consume(events, received)) for _ in range(num_subscribers)
+    ]
+    await asyncio.sleep(0.1)  # let everyone subscribe
+
+    def publish() -> None:
+        for version in range(1, NUM_EVENTS + 1):
+            events.publish(version, BoardEvent("task.deleted", {"id": version}))
+
+    start = time.perf_counter()
+    threading.Thread(target=publish).start()
+    while received[0] < num_subscribers * NUM_EVENTS:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    events.close()
+    await asyncio.gather(*consumers)
+    return elapsed
+
+
+def main() -> None:
+    print(f"{NUM_EVENTS} events published back to back")
+    print(f"{'subscribers':>12} {'delivered in [s]':>17} {'per delivery [us]':>18}")
+    for num_subscribers in SUBSCRIBER_COUNTS:
+        elapsed = asyncio.run(fan_out(num_subscribers))
+        per_delivery = elapsed / (num_subscribers * NUM_EVENTS) * 1e6
+        print(f"{num_subscribers:>12} {elapsed:>17.4f} {per_delivery:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Synthetic boards for the benchmarks.
+
+`populate` fills an empty database with stages and tasks spread round-robin
+over them, with sort keys `POSITION_GAP` apart like tasks created through the
+API. Tasks are named `Task <n>` by default; `word_names` draws names from a
+skewed vocabulary instead, for benchmarks where names matter, like search.
+Numbered tasks are generated by SQLite itself, so a board of 1M tasks is
+built in seconds.
+"""
+
+from __future__ import annotations
+
+import random
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from sqlite3 import Cursor
+from typing import NamedTuple
+
+from src.helpers import init_conn, init_schema
+from src.repository import DEFAULT_SCHEMA, POSITION_GAP
+
+NUMBERED_TASKS = """
+WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?)
+INSERT INTO task (name, stage_id, position)
+SELECT 'Task ' || i, i % ? + 1, i / ? * ? FROM n
+"""
+INSERT_TASK = "INSERT INTO task (name, stage_id, position) VALUES (?, ?, ?)"
+
+
+class BoardSize(NamedTuple):
+    stages: int
+    tasks: int
+
+    def __str__(self) -> str:
+        return f"{self.stages}x{self.tasks}"
+
+    @classmethod
+    def parse(cls, size: str) -> BoardSize:
+        """Parse `<stages>x<tasks>`, like `20x100000`."""
+        stages, tasks = size.lower().split("x")
+        return cls(int(stages), int(tasks))
+
+
+def populate(
+    cur: Cursor,
+    num_stages: int,
+    num_tasks: int,
+    names: Iterable[str] | None = None,
+) -> None:
+    """Add `num_stages` stages and `num_tasks` tasks to an empty board."""
+    cur.executemany(
+        "INSERT INTO stage (name) VALUES (?)",
+        [(f"Stage {i}",) for i in range(num_stages)],
+    )
+    if names is None:
+        if num_tasks:
+            params = (num_tasks, num_stages, num_stages, POSITION_GAP)
+            cur.execute(NUMBERED_TASKS, params)
+    else:
+        cur.executemany(
+            INSERT_TASK,
+            (
+                (name, i % num_stages + 1, i // num_stages * POSITION_GAP)
+                for i, name in enumerate(islice(names, num_tasks))
+            ),
+        )
+    cur.connection.commit()
+
+
+def word_names(
+    vocabulary_size: int = 5_000,
+    words: tuple[int, int] = (2, 6),
+    seed: int = 0,
+) -> Iterator[str]:
+    """Yield names of a few words `w<k>`, word k drawn with weight 1 / (k + 1).
+
+    Like in natural language, a few words are in a large part of the names
+    and most words in only a handful.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"w{k}" for k in range(vocabulary_size)]
+    weights = [1 / (k + 1) for k in range(vocabulary_size)]
+    while True:
+        yield " ".join(rng.choices(vocabulary, weights, k=rng.randint(*words)))
+
+
+def create_board(
+    path: Path, size: BoardSize, names: Iterable[str] | None = None
+) -> Path:
+    """Create a database at `path` with the current schema and a board of `size`."""
+    conn = init_conn(path)
+    try:
+        populate(init_schema(conn.cursor(), DEFAULT_SCHEMA), *size, names)
+    finally:
+        conn.close()
+    return path
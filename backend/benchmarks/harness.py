@@ -0,0 +1,189 @@
+"""Timing, result files and baseline comparison for the benchmark suite.
+
+A run produces flat metrics named like `repository/fetch_task_by_id/20x10000`,
+each with a value, a unit and whether lower or higher is better. They are
+written as JSON together with the environment they were measured in, and
+compared metric by metric against a baseline file: a metric regressed when
+it got worse by more than a relative threshold.
+
+Baselines are only comparable on the machine they were recorded on.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Literal, NamedTuple, TypedDict
+
+DEFAULT_THRESHOLD = 0.25
+ROUNDS = 5
+MIN_BATCH_SECONDS = 0.05
+
+
+class Metric(TypedDict):
+    value: float
+    unit: str
+    better: Literal["lower", "higher"]
+
+
+class Results:
+    def __init__(
+        self,
+        metrics: dict[str, Metric] | None = None,
+        environment: dict[str, Any] | None = None,
+    ) -> None:
+        self.metrics = metrics if metrics is not None else {}
+        self.environment = environment if environment is not None else {}
+
+    def add(
+        self,
+        name: str,
+        value: float,
+        unit: str,
+        better: Literal["lower", "higher"] = "lower",
+    ) -> None:
+        self.metrics[name] = Metric(value=value, unit=unit, better=better)
+
+    def write(self, path: Path) -> None:
+        data = {"environment": self.environment, "metrics": self.metrics}
+        path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+
+    @classmethod
+    def read(cls, path: Path) -> Results:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(data["metrics"], data["environment"])
+
+
+def environment() -> dict[str, Any]:
+    """Describe where results were measured, to tell apart baselines."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def timeit(fn: Callable[[], object], repeat: int) -> float:
+    """Return the best time of `repeat` calls of `fn`, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_per_call(
+    fns: dict[str, Callable[[int], object]],
+    reset: Callable[[], object] | None = None,
+    max_calls: int | None = None,
+    rounds: int = ROUNDS,
+) -> dict[str, float]:
+    """Return the best time of a call of each function, in seconds, by name.
+
+    Functions are called with a running count, so they can pick different
+    rows for every call, in batches long enough to make timer resolution
+    irrelevant but at most `max_calls` long. `reset`, if given, runs untimed
+    after every batch, e.g. to roll back writes.
+
+    Each round runs one batch of every function, and the best round counts:
+    on a shared machine slow spells last seconds, longer than measuring one
+    function, so rounds taken at different times are what gets past them.
+    """
+    calls = dict.fromkeys(fns, 0)
+
+    def batch(name: str, size: int) -> float:
+        start = time.perf_counter()
+        for i in range(calls[name], calls[name] + size):
+            fns[name](i)
+        elapsed = time.perf_counter() - start
+        calls[name] += size
+        if reset is not None:
+            reset()
+        return elapsed / size
+
+    sizes = {}
+    for name in fns:
+        size = 1
+        while batch(name, size) * size < MIN_BATCH_SECONDS:
+            if max_calls is not None and size >= max_calls:
+                break
+            size = min(size * 2, max_calls) if max_calls else size * 2
+        sizes[name] = size
+
+    best = dict.fromkeys(fns, float("inf"))
+    for _ in range(rounds):
+        for name, size in sizes.items():
+            best[name] = min(best[name], batch(name, size))
+    return best
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """Return the `p`th percentile of `samples`, interpolating between ranks."""
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Change(NamedTuple):
+    name: str
+    unit: str
+    baseline: float
+    current: float
+    worse_by: float  # relative, negative when it improved
+
+
+def compare(current: Results, baseline: Results) -> list[Change]:
+    """Compare every metric in both results, in the order of `current`."""
+    changes = []
+    for name, metric in current.metrics.items():
+        base = baseline.metrics.get(name)
+        if base is None or base["value"] == 0 or metric["value"] == 0:
+            continue
+        if metric["better"] == "lower":
+            worse_by = metric["value"] / base["value"] - 1
+        else:
+            worse_by = base["value"] / metric["value"] - 1
+        changes.append(
+            Change(name, metric["unit"], base["value"], metric["value"], worse_by)
+        )
+    return changes
+
+
+def report(changes: list[Change], threshold: float) -> list[Change]:
+    """Print the changes and return those worse than `threshold`."""
+    regressions = [change for change in changes if change.worse_by > threshold]
+    width = max((len(change.name) for change in changes), default=0)
+    print(f"{'metric':<{width}} {'baseline':>12} {'current':>12} {'worse by':>8}")
+    for change in changes:
+        flag = "  REGRESSION" if change in regressions else ""
+        print(
+            f"{change.name:<{width}} {change.baseline:>12.4g} {change.current:>12.4g}"
+            f" {change.worse_by:>+8.1%}{flag}"
+        )
+    print(
+        f"{len(regressions)} of {len(changes)} metrics worse by more than"
+        f" {threshold:.0%}"
+    )
+    return regressions
@@ -0,0 +1,217 @@
+"""Concurrent load test for `/stages/tasks` and `/tasks/{id}/move`.
+
+Starts the app with uvicorn in a subprocess and drives it over HTTP with a
+fixed number of concurrent clients, for several connection pool sizes (the
+number of database read threads). Clients behave like the frontend: every
+tenth request is a move answered with a delta, the others revalidate the
+board with the ETag they last saw. Reports latency percentiles, failed
+requests and the deepest write and read queues seen by the database
+executor.
+
+The clients run in a separate process from the server, so they do not
+compete with it for the event loop and the GIL. Each keeps one connection
+open, like a browser tab, and speaks just enough HTTP/1.1 to send a request
+and read the response: a full-featured client spends more CPU per request
+than the server does and ends up measuring itself.
+
+Run with `uv run python -m benchmarks.load`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.generators import populate
+from src.helpers import init_conn, init_schema
+from src.repository import DEFAULT_SCHEMA
+
+NUM_STAGES = 5
+NUM_TASKS = 2_000
+CONCURRENCY = 500
+REQUESTS_PER_CLIENT = 20
+POOL_SIZES = [1, 4, 8]
+WRITE_RATIO = 0.1
+STARTUP_TIMEOUT = 10.0
+
+
+class Connection:
+    """A keep-alive HTTP/1.1 connection that sends one request at a time."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, port: int) -> Connection:
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+    ) -> tuple[int, dict[str, str], bytes]:
+        lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if body:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        self.writer.write("\r\n".join(lines).encode() + b"\r\n\r\n" + body)
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")[:-2]
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            response_headers[name.lower()] = value.strip()
+        length = int(response_headers.get("content-length", 0))
+        return (
+            int(status_line.split()[1]),
+            response_headers,
+            (await self.reader.readexactly(length)),
+        )
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def client_loop(
+    port: int,
+    rng: random.Random,
+    latencies: list[float],
+    failures: list[int],
+) -> None:
+    conn = await Connection.open(port)
+    etag = ""
+    try:
+        for _ in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            if rng.random() < WRITE_RATIO:
+                task_id = rng.randint(1, NUM_TASKS)
+                body = {"stage_id": rng.randint(1, NUM_STAGES), "to_index": 0}
+                status, _, _ = await conn.request(
+                    "PATCH",
+                    f"/tasks/{task_id}/move?response=delta",
+                    body=json.dumps(body).encode(),
+                )
+            else:
+                status, headers, _ = await conn.request(
+                    "GET", "/stages/tasks", {"If-None-Match": etag}
+                )
+                etag = headers.get("etag", etag)
+            if status >= 400:
+                failures.append(status)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: Path, pool_size: int, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SQLITE_DATABASE_PATH": str(db_path),
+        "SQLITE_POOL_SIZE": str(pool_size),
+        "SQLITE_POOL_TIMEOUT": "30",
+    }
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--backlog",
+            str(CONCURRENCY * 2),
+            # clients reuse connections that may idle while others are served
+            "--timeout-keep-alive",
+            "60",
+        ],
+        env=env,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+
+async def run(port: int) -> tuple[float, float, float, int, dict]:
+    latencies: list[float] = []
+    failures: list[int] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            client_loop(port, random.Random(i), latencies, failures)
+            for i in range(CONCURRENCY)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    conn = await Connection.open(port)
+    _, _, body = await conn.request("GET", "/executor/stats")
+    conn.close()
+    stats = json.loads(body)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return (
+        len(latencies) / elapsed,
+        quantiles[49],
+        quantiles[98],
+        len(failures),
+        stats,
+    )
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "load.db"
+        conn = init_conn(db_path)
+        populate(init_schema(conn.cursor(), DEFAULT_SCHEMA), NUM_STAGES, NUM_TASKS)
+        conn.close()
+
+        print(f"{CONCURRENCY} clients, {NUM_TASKS} tasks, {WRITE_RATIO:.0%} moves")
+        print(
+            f"{'pool size':>10} {'req/s':>8} {'p50 [ms]':>9} {'p99 [ms]':>9} "
+            f"{'failed':>7} {'max writes queued':>18} {'max reads queued':>17}"
+        )
+        for pool_size in POOL_SIZES:
+            port = free_port()
+            server = start_server(db_path, pool_size, port)
+            try:
+                throughput, p50, p99, failed, stats = asyncio.run(run(port))
+            finally:
+                server.terminate()
+                server.wait()
+            print(
+                f"{pool_size:>10} {throughput:>8.1f} {p50 * 1000:>9.1f} "
+                f"{p99 * 1000:>9.1f} {failed:>7} "
+                f"{stats['write']['max_queued']:>18} "
+                f"{stats['read']['max_queued']:>17}"
+            )
+
+
+if __name__ == "__main__":
+    main()
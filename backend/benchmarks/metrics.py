@@ -0,0 +1,109 @@
+"""Overhead of request metrics, with metrics disabled and enabled.
+
+Calls the ASGI app directly, one request at a time, so the numbers are the
+cost of serving a request in process without any HTTP or network overhead,
+which is where the instrumentation would show most. Requests cover a cached
+read (no database work), a paginated read and a rename (a write). The two
+variants take turns for several rounds and the best round counts, since the
+differences are small next to the noise of a shared machine.
+
+Run with `uv run python -m benchmarks.metrics`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("SQLITE_DATABASE_PATH", ":memory:")
+
+from benchmarks.endpoints import serving  # noqa: E402
+from benchmarks.generators import BoardSize, create_board  # noqa: E402
+from src.main import app  # noqa: E402
+from src.metrics import Metrics  # noqa: E402
+
+NUM_STAGES = 5
+NUM_TASKS = 10_000
+REQUESTS = 500
+ROUNDS = 10
+
+# (label, method, path, query, body)
+REQUESTS_UNDER_TEST = [
+    ("cached board summary", "GET", "/stages/summary", b"", b""),
+    ("stage page", "GET", "/stages/1/tasks", b"limit=20", b""),
+    ("rename", "PATCH", "/tasks/1", b"", b'{"name": "renamed"}'),
+]
+
+
+async def call(method: str, path: str, query: bytes, body: bytes) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "server": ("bench", 80),
+        "client": ("bench", 50000),
+        "app": app,
+    }
+    status = 0
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def us_per_request(method: str, path: str, query: bytes, body: bytes) -> float:
+    assert await call(method, path, query, body) == 200
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await call(method, path, query, body)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+
+def measure(db_path: Path, enabled: bool) -> dict[str, float]:
+    with serving(db_path, readers=2, metrics=Metrics() if enabled else None):
+        return {
+            label: asyncio.run(us_per_request(method, path, query, body))
+            for label, method, path, query, body in REQUESTS_UNDER_TEST
+        }
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = create_board(Path(tmp) / "bench.db", BoardSize(NUM_STAGES, NUM_TASKS))
+
+        disabled: dict[str, float] = {}
+        enabled: dict[str, float] = {}
+        for _ in range(ROUNDS):
+            for best, on in ((disabled, False), (enabled, True)):
+                for label, us in measure(db_path, on).items():
+                    best[label] = min(best.get(label, us), us)
+
+    print(f"{REQUESTS} sequential requests each, in process, best of {ROUNDS}")
+    print(f"{'request':>22} {'disabled [us]':>14} {'enabled [us]':>13} {'overhead':>9}")
+    for label in disabled:
+        overhead = enabled[label] / disabled[label] - 1
+        print(
+            f"{label:>22} {disabled[label]:>14.1f} {enabled[label]:>13.1f} "
+            f"{overhead:>8.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
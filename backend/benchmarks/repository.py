@@ -0,0 +1,240 @@
+"""Microbenchmarks of every repository function on synthetic boards.
+
+Each function is called on a board database of every size, in batches of
+calls on changing tasks and stages, and its best time per call recorded as
+`repository/<function>/<stages>x<tasks>`. Writes are rolled back after every
+batch, so every batch starts from the same board.
+
+Run as part of the suite with `uv run python -m benchmarks run`, or alone
+with `uv run python -m benchmarks.repository`.
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+from collections.abc import Callable, Sequence
+from pathlib import Path
+from sqlite3 import Cursor
+
+from benchmarks.generators import BoardSize, create_board
+from benchmarks.harness import Results, time_per_call
+from src.helpers import init_conn
+from src.repository import (
+    bump_board_version,
+    delete_task_by_id,
+    ensure_stages_exist,
+    fetch_all_stages,
+    fetch_all_tasks,
+    fetch_all_tasks_by_stage_id,
+    fetch_all_tasks_json,
+    fetch_board,
+    fetch_board_summary_json,
+    fetch_board_version,
+    fetch_moved_tasks,
+    fetch_neighbour_positions,
+    fetch_next_task_position,
+    fetch_stage_by_id,
+    fetch_stage_by_name,
+    fetch_stage_tasks_page,
+    fetch_stages_with_tasks,
+    fetch_stages_with_tasks_json,
+    fetch_task_by_id,
+    fetch_task_stages,
+    fetch_tasks_in_window,
+    insert_stage,
+    insert_task,
+    insert_tasks,
+    iter_all_tasks,
+    move_tasks,
+    patch_task,
+    position_between,
+    rebalance_stage_positions,
+    search_tasks,
+    search_terms,
+    set_stage_order,
+    update_task_ordering,
+)
+from src.schemas import (
+    StageCreate,
+    TaskBulkMove,
+    TaskCreate,
+    TaskMoveUpdate,
+    TaskNameUpdate,
+    TaskPublic,
+)
+
+DEFAULT_SIZES = [BoardSize(20, 1_000), BoardSize(20, 10_000), BoardSize(20, 100_000)]
+PAGE_SIZE = 100
+WINDOW_SIZE = 20
+INSERT_BATCH_SIZE = 100
+MOVE_BATCH_SIZE = 5
+
+
+def benchmarks(cur: Cursor, size: BoardSize) -> dict[str, Callable[[int], object]]:
+    """Return a call of every repository function on the board, by name."""
+    rng = random.Random(0)
+    task_ids = [row[0] for row in cur.execute("SELECT id FROM task")]
+    rng.shuffle(task_ids)
+    stage_ids = [row[0] for row in cur.execute("SELECT id FROM stage")]
+    per_stage = size.tasks // size.stages
+    indexes = [rng.randrange(per_stage + 1) for _ in range(1_000)]
+    orders = {
+        stage_id: [task.id for task in fetch_all_tasks_by_stage_id(cur, stage_id)]
+        for stage_id in stage_ids
+    }
+    # the key of the task in the middle of each stage, to page from there
+    middle_keys = {
+        stage_id: (
+            cur.execute(
+                "SELECT position, id FROM task WHERE id = ?",
+                (order[len(order) // 2],),
+            ).fetchone()
+        )
+        for stage_id, order in orders.items()
+    }
+    moved = [moved_pair(cur, task_ids[i]) for i in range(min(100, len(task_ids)))]
+
+    def task(i: int) -> int:
+        return task_ids[i % len(task_ids)]
+
+    def stage(i: int) -> int:
+        return stage_ids[i % len(stage_ids)]
+
+    def index(i: int) -> int:
+        return indexes[i % len(indexes)]
+
+    def task_to_move(i: int) -> TaskPublic:
+        old_task = fetch_task_by_id(cur, task(i))
+        assert old_task is not None
+        return old_task
+
+    def stage_order(i: int) -> Sequence[int]:
+        # calls on the same stage alternate between reversing and restoring it
+        order = orders[stage(i)]
+        return order[::-1] if i // len(stage_ids) % 2 == 0 else order
+
+    def drain_tasks() -> None:
+        for _ in iter_all_tasks(cur, 1_000):
+            pass
+
+    return {
+        "fetch_board_version": lambda i: fetch_board_version(cur),
+        "bump_board_version": lambda i: bump_board_version(cur),
+        "fetch_board": lambda i: fetch_board(cur),
+        "fetch_stages_with_tasks": lambda i: fetch_stages_with_tasks(cur),
+        "fetch_stages_with_tasks_json": lambda i: fetch_stages_with_tasks_json(cur),
+        "fetch_all_stages": lambda i: fetch_all_stages(cur),
+        "fetch_stage_by_name": lambda i: fetch_stage_by_name(
+            cur, f"Stage {i % size.stages}"
+        ),
+        "fetch_stage_by_id": lambda i: fetch_stage_by_id(cur, stage(i)),
+        "fetch_board_summary_json": lambda i: fetch_board_summary_json(cur),
+        "insert_stage": lambda i: insert_stage(cur, StageCreate(name=f"New {i}")),
+        "ensure_stages_exist": lambda i: ensure_stages_exist(cur, stage_ids),
+        "fetch_next_task_position": lambda i: fetch_next_task_position(cur, stage(i)),
+        "insert_task": lambda i: insert_task(
+            cur, TaskCreate(name=f"New {i}", stage_id=stage(i))
+        ),
+        "insert_tasks": lambda i: insert_tasks(
+            cur,
+            [
+                TaskCreate(name=f"New {i}.{j}", stage_id=stage(i + j))
+                for j in range(INSERT_BATCH_SIZE)
+            ],
+        ),
+        "fetch_all_tasks": lambda i: fetch_all_tasks(cur),
+        "fetch_all_tasks_json": lambda i: fetch_all_tasks_json(cur),
+        "iter_all_tasks": lambda i: drain_tasks(),
+        "fetch_all_tasks_by_stage_id": lambda i: fetch_all_tasks_by_stage_id(
+            cur, stage(i)
+        ),
+        "fetch_task_by_id": lambda i: fetch_task_by_id(cur, task(i)),
+        "fetch_task_stages": lambda i: fetch_task_stages(
+            cur, task_ids[i % len(task_ids) :][:WINDOW_SIZE]
+        ),
+        "fetch_tasks_in_window": lambda i: fetch_tasks_in_window(
+            cur, stage(i), index(i), index(i) + WINDOW_SIZE
+        ),
+        "fetch_stage_tasks_page": lambda i: fetch_stage_tasks_page(
+            cur, stage(i), middle_keys[stage(i)], PAGE_SIZE
+        ),
+        "fetch_neighbour_positions": lambda i: fetch_neighbour_positions(
+            cur, stage(i), index(i), task(i)
+        ),
+        "position_between": lambda i: position_between(i, i + 1_024),
+        "fetch_moved_tasks": lambda i: fetch_moved_tasks(cur, *moved[i % len(moved)]),
+        "update_task_ordering": lambda i: update_task_ordering(
+            cur,
+            task_to_move(i),
+            TaskMoveUpdate(stage_id=stage(i + 1), to_index=index(i)),
+        ),
+        "rebalance_stage_positions": lambda i: rebalance_stage_positions(cur, stage(i)),
+        "move_tasks": lambda i: move_tasks(
+            cur,
+            [
+                TaskBulkMove(
+                    task_id=task(i + j),
+                    stage_id=stage(i + j + 1),
+                    to_index=index(i + j),
+                )
+                for j in range(MOVE_BATCH_SIZE)
+            ],
+        ),
+        "set_stage_order": lambda i: set_stage_order(cur, stage(i), stage_order(i)),
+        "patch_task": lambda i: patch_task(
+            cur, task(i), TaskNameUpdate(name=f"Renamed {i}")
+        ),
+        "delete_task_by_id": lambda i: delete_task_by_id(cur, task(i)),
+        "search_terms": lambda i: search_terms("write the release notes"),
+        "search_tasks": lambda i: search_tasks(cur, str(task(i)), None, 20),
+    }
+
+
+def moved_pair(cur: Cursor, task_id: int) -> tuple[TaskPublic, TaskPublic]:
+    """A task and itself moved up to 50 places up its stage."""
+    old_task = fetch_task_by_id(cur, task_id)
+    assert old_task is not None
+    moved_task = old_task.model_copy(
+        update={"position": max(old_task.position - 50, 0)}
+    )
+    return old_task, moved_task
+
+
+def run(
+    results: Results,
+    sizes: Sequence[BoardSize] = DEFAULT_SIZES,
+    only: Sequence[str] | None = None,
+) -> None:
+    """Benchmark every repository function, or those in `only`, on every size."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            assert size.tasks >= size.stages > 0, "every stage needs a task"
+            path = create_board(Path(tmp) / f"{size}.db", size)
+            conn = init_conn(path)
+            cur = conn.cursor()
+            try:
+                print(
+                    f"\nrepository functions on {size.stages} stages x {size.tasks} tasks"
+                )
+                print(f"{'function':>30} {'per call [us]':>14}")
+                fns = {
+                    name: fn
+                    for name, fn in benchmarks(cur, size).items()
+                    if only is None or name in only
+                }
+                timings = time_per_call(fns, reset=conn.rollback, max_calls=size.tasks)
+                for name, seconds in timings.items():
+                    results.add(f"repository/{name}/{size}", seconds * 1e6, "us")
+                    print(f"{name:>30} {seconds * 1e6:>14.1f}")
+            finally:
+                conn.rollback()
+                conn.close()
+
+
+def main() -> None:
+    run(Results())
+
+
+if __name__ == "__main__":
+    main()
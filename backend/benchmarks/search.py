@@ -0,0 +1,95 @@
+"""Latency of task search through the FTS5 index on large boards.
+
+Task names are a few words drawn from a fixed vocabulary with a skewed
+distribution, so some words match a large part of the board and others only
+a handful of tasks. Every query is timed through `search_tasks` and, for
+comparison, as the `LIKE` scan a search without the index would run.
+
+`LIKE` returns the first rows it comes across, unranked, so it stops early on
+common words. Ranking scores every match, so its cost follows the number of
+matches: selective queries are fast at any board size.
+
+Run with `uv run python -m benchmarks.search`.
+"""
+
+from __future__ import annotations
+
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+from sqlite3 import Cursor
+
+from benchmarks.generators import populate, word_names
+from src.helpers import init_conn, init_schema
+from src.repository import DEFAULT_SCHEMA, search_tasks, search_terms
+
+NUM_STAGES = 10
+TASK_COUNTS = [100_000, 500_000]
+VOCABULARY_SIZE = 5_000
+PAGE_SIZE = 20
+RUNS = 20
+
+# (label, text, stage filter)
+QUERIES = [
+    ("common word", "w0", None),
+    ("rare word", "w4321", None),
+    ("2-char prefix", "w1", None),
+    ("two words", "w0 w1", None),
+    ("common, one stage", "w0", 1),
+]
+
+COUNT_MATCHES = """
+SELECT COUNT(*) FROM task_search JOIN task ON task.id = task_search.rowid
+WHERE task_search MATCH ? AND (? IS NULL OR task.stage_id = ?)
+"""
+LIKE_SEARCH = """
+SELECT id, name, stage_id FROM task
+WHERE name LIKE ? AND (? IS NULL OR stage_id = ?)
+ORDER BY id
+LIMIT ?
+"""
+
+
+def like_search(cur: Cursor, text: str, stage_id: int | None) -> list:
+    # a substring scan; only the first word, LIKE cannot rank or match words
+    pattern = f"%{text.split()[0]}%"
+    return cur.execute(LIKE_SEARCH, (pattern, stage_id, stage_id, PAGE_SIZE)).fetchall()
+
+
+def latencies_ms(fn: Callable[[], object]) -> tuple[float, float]:
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    percentiles = statistics.quantiles(samples, n=20)
+    return statistics.median(samples), percentiles[18]
+
+
+def main() -> None:
+    print(f"first page of {PAGE_SIZE} results, {RUNS} runs per query")
+    print(
+        f"{'tasks':>8} {'query':>18} {'matches':>8} "
+        f"{'fts p50/p95 [ms]':>17} {'like p50/p95 [ms]':>18}"
+    )
+    for num_tasks in TASK_COUNTS:
+        conn = init_conn(Path(":memory:"))
+        cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+        populate(cur, NUM_STAGES, num_tasks, word_names(VOCABULARY_SIZE))
+
+        for label, text, stage_id in QUERIES:
+            matches = cur.execute(
+                COUNT_MATCHES, (search_terms(text), stage_id, stage_id)
+            ).fetchone()[0]
+            fts = latencies_ms(lambda: search_tasks(cur, text, stage_id, PAGE_SIZE))
+            like = latencies_ms(lambda: like_search(cur, text, stage_id))
+            print(
+                f"{num_tasks:>8} {label:>18} {matches:>8} "
+                f"{fts[0]:>8.2f}/{fts[1]:<8.2f} {like[0]:>9.2f}/{like[1]:<8.2f}"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
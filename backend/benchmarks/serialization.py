@@ -0,0 +1,77 @@
+"""Compare the validated model read path with the pre-serialized JSON one.
+
+`models` is what a `response_model=list[StageDetail]` endpoint costs: build
+the models from the rows, validate them against the response model and dump
+them to JSON. `json` serializes plain dicts straight from the rows.
+
+Run with `uv run python -m benchmarks.serialization`.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from sqlite3 import Cursor
+
+from pydantic import TypeAdapter
+
+from benchmarks.generators import populate
+from benchmarks.harness import timeit
+from src.helpers import init_conn, init_schema
+from src.repository import (
+    DEFAULT_SCHEMA,
+    fetch_all_tasks,
+    fetch_all_tasks_json,
+    fetch_stages_with_tasks_json,
+)
+from src.schemas import StageDetail, StagePublic, TaskPublic
+
+NUM_STAGES = 20
+TASK_COUNTS = [1_000, 10_000, 100_000]
+
+STAGES_ADAPTER = TypeAdapter(list[StageDetail])
+TASKS_ADAPTER = TypeAdapter(list[TaskPublic])
+
+
+def validated_board_json(cur: Cursor) -> bytes:
+    """The board built from validated models, as before the fast path."""
+    stages = [StagePublic.from_row(row) for row in cur.execute("SELECT * FROM stage")]
+    tasks = {stage.id: [] for stage in stages}
+    for task in fetch_all_tasks(cur):
+        tasks[task.stage_id].append(task)
+    board = [
+        StageDetail(**stage.model_dump(), tasks=tasks[stage.id]) for stage in stages
+    ]
+    return STAGES_ADAPTER.dump_json(STAGES_ADAPTER.validate_python(board))
+
+
+def validated_tasks_json(cur: Cursor) -> bytes:
+    return TASKS_ADAPTER.dump_json(TASKS_ADAPTER.validate_python(fetch_all_tasks(cur)))
+
+
+def main() -> None:
+    print(
+        f"{'tasks':>10} {'endpoint':>15} {'models [s]':>12} {'json [s]':>10} "
+        f"{'speedup':>8}"
+    )
+    for num_tasks in TASK_COUNTS:
+        conn = init_conn(Path(":memory:"))
+        cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+        populate(cur, NUM_STAGES, num_tasks)
+        repeat = 5 if num_tasks < 100_000 else 2
+
+        cases = {
+            "/stages/tasks": (validated_board_json, fetch_stages_with_tasks_json),
+            "/tasks": (validated_tasks_json, fetch_all_tasks_json),
+        }
+        for endpoint, (models, fast) in cases.items():
+            slow = timeit(lambda: models(cur), repeat)
+            quick = timeit(lambda: fast(cur), repeat)
+            print(
+                f"{num_tasks:>10} {endpoint:>15} {slow:>12.4f} {quick:>10.4f} "
+                f"{slow / quick:>7.2f}x"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
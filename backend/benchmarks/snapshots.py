@@ -0,0 +1,120 @@
+"""Compare snapshot save and restore times per snapshot format.
+
+`cli dump` is the previous save path (`sqlite3 .dump` in a subprocess),
+`sql` dumps in process with `iterdump`; both restore via `executescript`.
+`db` and `db.gz` are page-level copies through the online backup API.
+`diff` saves the changes to `CHANGED_TASKS` tasks since a `db` snapshot and
+restores by replaying them onto it.
+
+Run with `uv run python -m benchmarks.snapshots`.
+"""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.generators import populate
+from src.changelog import fetch_changes, fetch_lineage, fetch_log_seq_at
+from src.helpers import init_conn, init_schema
+from src.repository import DEFAULT_SCHEMA
+from src.snapshots import backup_db, dump_sql, restore_chain, restore_db, write_diff
+
+NUM_STAGES = 20
+TASK_COUNTS = [10_000, 100_000, 1_000_000]
+CHANGED_TASKS = 100
+
+
+def cli_dump(db_path: Path, path: Path) -> None:
+    with path.open("w") as f:
+        subprocess.run(["sqlite3", str(db_path), ".dump"], stdout=f, check=True)
+
+
+def time_format(db_path: Path, tmp: Path, fmt: str) -> tuple[float, float, int]:
+    path = tmp / f"snapshot.{'sql' if fmt == 'cli dump' else fmt}"
+    conn = init_conn(db_path)
+
+    start = time.perf_counter()
+    if fmt == "cli dump":
+        cli_dump(db_path, path)
+    elif fmt == "sql":
+        with path.open("w") as f:
+            dump_sql(conn, f)
+    else:
+        backup_db(conn, path)
+    save = time.perf_counter() - start
+    conn.close()
+
+    restored = tmp / "restored.db"
+    restored.unlink(missing_ok=True)
+    conn = init_conn(restored)
+    start = time.perf_counter()
+    restore_db(path, conn)
+    restore = time.perf_counter() - start
+    conn.close()
+
+    return save, restore, path.stat().st_size
+
+
+def time_diff(db_path: Path, tmp: Path) -> tuple[float, float, int]:
+    base = tmp / "base.db"
+    path = tmp / "snapshot.diff"
+    conn = init_conn(db_path)
+    cur = conn.cursor()
+    backup_db(conn, base)
+    lineage = fetch_lineage(cur)
+    cur.execute(
+        "UPDATE task SET name = name || ' changed' WHERE id <= ?", (CHANGED_TASKS,)
+    )
+    conn.commit()
+
+    start = time.perf_counter()
+    changes = fetch_changes(cur, fetch_log_seq_at(cur, lineage))
+    write_diff(path, {"changes": changes})
+    save = time.perf_counter() - start
+    conn.close()
+
+    restored = tmp / "restored.db"
+    restored.unlink(missing_ok=True)
+    conn = init_conn(restored)
+    start = time.perf_counter()
+    restore_chain([base, path], conn)
+    conn.commit()
+    restore = time.perf_counter() - start
+    conn.close()
+
+    return save, restore, path.stat().st_size
+
+
+def main() -> None:
+    formats = ["sql", "db", "db.gz"]
+    if shutil.which("sqlite3"):
+        formats.insert(0, "cli dump")
+
+    print(
+        f"{'tasks':>10} {'format':>9} {'save [s]':>9} {'restore [s]':>12} "
+        f"{'size [MB]':>10}"
+    )
+    for num_tasks in TASK_COUNTS:
+        with tempfile.TemporaryDirectory(dir=".") as tmp:
+            db_path = Path(tmp) / "board.db"
+            conn = init_conn(db_path)
+            populate(init_schema(conn.cursor(), DEFAULT_SCHEMA), NUM_STAGES, num_tasks)
+            conn.close()
+
+            for fmt in [*formats, "diff"]:
+                if fmt == "diff":
+                    save, restore, size = time_diff(db_path, Path(tmp))
+                else:
+                    save, restore, size = time_format(db_path, Path(tmp), fmt)
+                print(
+                    f"{num_tasks:>10} {fmt:>9} {save:>9.3f} {restore:>12.3f} "
+                    f"{size / 1e6:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compare inlined per-call queries with prepared statements bound to `?`.
+
+`inlined` builds the pypika query on every call with its values inlined, as
+the repository did before: the SQL text differs for every value, so SQLite
+parses each call again. `bound` runs the repository's statements, built
+once at import and reused from the connection's statement cache.
+
+Writes run in one open transaction, so the numbers show statement cost
+rather than commits.
+
+Run with `uv run python -m benchmarks.statements`.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from collections.abc import Callable
+from pathlib import Path
+from sqlite3 import Cursor
+
+from pypika import Query
+from pypika import functions as fn
+
+from benchmarks.generators import populate
+from src.helpers import init_conn, init_schema
+from src.repository import (
+    DEFAULT_SCHEMA,
+    POSITION_GAP,
+    TASK_INDEX,
+    Task_T,
+    bump_board_version,
+    fetch_task_by_id,
+    insert_task,
+    patch_task,
+)
+from src.schemas import TaskCreate, TaskNameUpdate, TaskPublic
+
+NUM_STAGES = 5
+NUM_TASKS = 10_000
+OPS = 5_000
+
+
+def inlined_fetch_task_by_id(cur: Cursor, id: int) -> TaskPublic | None:
+    query = (
+        Task_T.select(
+            Task_T.id, Task_T.name, Task_T.stage_id, TASK_INDEX.as_("position")
+        )
+        .where(Task_T.id == id)
+        .get_sql()
+    )
+    row = cur.execute(query).fetchone()
+    return TaskPublic.from_row(row) if row else None
+
+
+def inlined_insert_task(cur: Cursor, task: TaskCreate) -> TaskPublic:
+    query = (
+        Task_T.select(fn.Max(Task_T.position))
+        .where(Task_T.stage_id == task.stage_id)
+        .get_sql()
+    )
+    last = cur.execute(query).fetchone()[0]
+    query = (
+        Query.into(Task_T)
+        .columns("name", "stage_id", "position")
+        .insert(task.name, task.stage_id, last + POSITION_GAP)
+        .get_sql()
+    )
+    task_id = cur.execute(query).lastrowid
+    bump_board_version(cur)
+    new_task = inlined_fetch_task_by_id(cur, task_id)
+    assert new_task is not None
+    return new_task
+
+
+def inlined_patch_task(cur: Cursor, task_id: int, patch: TaskNameUpdate) -> TaskPublic:
+    query = Query.update(Task_T).where(Task_T.id == task_id)
+    for column, value in patch.model_dump(exclude_unset=True).items():
+        query = query.set(column, value)
+    cur.execute(query.get_sql())
+    bump_board_version(cur)
+    task = inlined_fetch_task_by_id(cur, task_id)
+    assert task is not None
+    return task
+
+
+def ops_per_sec(op: Callable[[int], object]) -> float:
+    start = time.perf_counter()
+    for i in range(OPS):
+        op(i)
+    return OPS / (time.perf_counter() - start)
+
+
+def run(cur: Cursor, variant: str) -> dict[str, float]:
+    rng = random.Random(0)
+    ids = [rng.randint(1, NUM_TASKS) for _ in range(OPS)]
+    stages = [rng.randint(1, NUM_STAGES) for _ in range(OPS)]
+    if variant == "inlined":
+        fetch, insert, patch = (
+            inlined_fetch_task_by_id,
+            inlined_insert_task,
+            inlined_patch_task,
+        )
+    else:
+        fetch, insert, patch = fetch_task_by_id, insert_task, patch_task
+
+    results = {
+        "fetch_task_by_id": ops_per_sec(lambda i: fetch(cur, ids[i])),
+        "insert_task": ops_per_sec(
+            lambda i: insert(cur, TaskCreate(name=f"New {i}", stage_id=stages[i]))
+        ),
+        "patch_task": ops_per_sec(
+            lambda i: patch(cur, ids[i], TaskNameUpdate(name=f"Renamed {i}"))
+        ),
+    }
+    cur.connection.rollback()
+    return results
+
+
+def main() -> None:
+    conn = init_conn(Path(":memory:"))
+    cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+    populate(cur, NUM_STAGES, NUM_TASKS)
+
+    inlined, bound = run(cur, "inlined"), run(cur, "bound")
+    conn.close()
+
+    print(f"{NUM_TASKS} tasks, {OPS} calls each")
+    print(
+        f"{'function':>18} {'inlined [ops/s]':>16} {'bound [ops/s]':>14} {'speedup':>8}"
+    )
+    for name in inlined:
+        print(
+            f"{name:>18} {inlined[name]:>16.0f} {bound[name]:>14.0f} "
+            f"{bound[name] / inlined[name]:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare read and write throughput of SQLite storage profiles.
+
+`before` is what a plain `sqlite3.connect` gives you (rollback journal,
+`synchronous=FULL`, small cache, no mmap), `after` is the default
+`StorageProfile` (WAL, `synchronous=NORMAL`, large cache, mmap).
+
+Run with `uv run python -m benchmarks.storage`.
+"""
+
+from __future__ import annotations
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.generators import populate
+from src.helpers import StorageProfile, init_conn, init_schema
+from src.repository import (
+    DEFAULT_SCHEMA,
+    fetch_stages_with_tasks,
+    fetch_task_by_id,
+    insert_task,
+    update_task_ordering,
+)
+from src.schemas import TaskCreate, TaskMoveUpdate
+
+NUM_STAGES = 5
+NUM_TASKS = 50_000
+READS = 20_000
+BOARD_READS = 5
+WRITES = 500
+
+PROFILES = {
+    "before": StorageProfile.sqlite_defaults(),
+    "after": StorageProfile(),
+}
+
+
+def ops_per_sec(ops: int, elapsed: float) -> float:
+    return ops / elapsed
+
+
+def bench(profile: StorageProfile, db_path: Path) -> dict[str, float]:
+    conn = init_conn(db_path, profile)
+    cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+    populate(cur, NUM_STAGES, NUM_TASKS)
+    rng = random.Random(0)
+    results: dict[str, float] = {}
+
+    start = time.perf_counter()
+    for _ in range(READS):
+        fetch_task_by_id(cur, rng.randint(1, NUM_TASKS))
+    results["point reads/s"] = ops_per_sec(READS, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(BOARD_READS):
+        fetch_stages_with_tasks(cur)
+    results["board reads/s"] = ops_per_sec(BOARD_READS, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(WRITES):
+        insert_task(cur, TaskCreate(name=f"new {i}", stage_id=i % NUM_STAGES + 1))
+        conn.commit()
+    results["inserts/s"] = ops_per_sec(WRITES, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(WRITES):
+        task = fetch_task_by_id(cur, rng.randint(1, NUM_TASKS))
+        assert task is not None
+        moved = TaskMoveUpdate(stage_id=rng.randint(1, NUM_STAGES), to_index=0)
+        update_task_ordering(cur, task, moved)
+        conn.commit()
+    results["moves/s"] = ops_per_sec(WRITES, time.perf_counter() - start)
+
+    conn.close()
+    return results
+
+
+def main() -> None:
+    results: dict[str, dict[str, float]] = {}
+    for name, profile in PROFILES.items():
+        with tempfile.TemporaryDirectory(dir=".") as tmp:
+            results[name] = bench(profile, Path(tmp) / "storage.db")
+
+    print(f"{NUM_TASKS} tasks in {NUM_STAGES} stages")
+    print(f"{'metric':>15} " + " ".join(f"{name:>10}" for name in results))
+    for metric in results["before"]:
+        values = " ".join(f"{r[metric]:>10.1f}" for r in results.values())
+        print(f"{metric:>15} {values}")
+
+
+if __name__ == "__main__":
+    main()
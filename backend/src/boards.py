@@ -0,0 +1,159 @@
+"""Boards, each in its own SQLite database file, opened on demand.
+
+The default board is the database at `SQLITE_DATABASE_PATH`, served by the
+unscoped routes. Every other board is a file in the boards directory, served
+by the same routes under `/boards/{board_id}`. An open board has its own
+connection pool, write thread, board cache and event stream, so writes to
+different boards never wait on each other's lock or commits.
+
+`Boards` keeps at most `max_open` boards open. Once more are open, boards no
+request uses are closed, least recently used first, so idle boards hold no
+connections, threads or cached reads. A board is opened again with its next
+request; clients see the same board versions as before, but its event
+history is gone, so subscribers resuming from before get a `reset` event.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.cache import BoardCache
+from src.events import BoardEvents
+from src.executor import GroupCommit
+from src.pool import ConnectionPool
+from src.schemas import BOARD_ID_PATTERN
+
+DEFAULT_MAX_OPEN_BOARDS = 16
+BOARD_SUFFIX = ".db"
+BOARD_ID = re.compile(BOARD_ID_PATTERN)
+
+
+class BoardNotFound(LookupError):
+    def __init__(self, board_id: str):
+        self.board_id = board_id
+        super().__init__(f"Board {board_id!r} not found")
+
+
+class BoardExists(ValueError):
+    def __init__(self, board_id: str):
+        self.board_id = board_id
+        super().__init__(f"Board {board_id!r} already exists")
+
+
+@dataclass
+class Board:
+    """What the requests to one board share."""
+
+    pool: ConnectionPool
+    commits: GroupCommit
+    cache: BoardCache
+    events: BoardEvents
+
+    def close(self) -> None:
+        """End the event streams, then stop the write thread and the pool."""
+        self.events.close()
+        self.commits.queue.shutdown()
+        self.pool.close()
+
+
+class OpenBoard:
+    def __init__(self, board: Board) -> None:
+        self.board = board
+        self.users = 0
+
+
+class Boards:
+    """The boards in `directory`, opened by `open_board` when first used.
+
+    Boards are acquired and released on the event loop, which is what keeps
+    the bookkeeping consistent without a lock. Opening and closing boards
+    does file I/O and runs on a thread instead. Concurrent requests for a
+    board that is not open share one opening, like board reads share one
+    load (see `load_cached_board`).
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        open_board: Callable[[Path], Board],
+        max_open: int = DEFAULT_MAX_OPEN_BOARDS,
+    ) -> None:
+        if max_open < 1:
+            raise ValueError(f"max_open must be at least 1, got {max_open}")
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.open_board = open_board
+        self.max_open = max_open
+        # least recently used first
+        self._open: OrderedDict[str, OpenBoard] = OrderedDict()
+        self._opening: dict[str, asyncio.Task[None]] = {}
+
+    def path(self, board_id: str) -> Path:
+        # the pattern keeps ids from naming files outside the directory
+        if not BOARD_ID.fullmatch(board_id):
+            raise BoardNotFound(board_id)
+        return self.directory / f"{board_id}{BOARD_SUFFIX}"
+
+    def ids(self) -> list[str]:
+        ids = (
+            path.name.removesuffix(BOARD_SUFFIX) for path in self.directory.iterdir()
+        )
+        return sorted(board_id for board_id in ids if BOARD_ID.fullmatch(board_id))
+
+    def is_open(self, board_id: str) -> bool:
+        return board_id in self._open
+
+    def create(self, board_id: str) -> None:
+        """Create an empty board, which gets its schema when first opened."""
+        try:
+            self.path(board_id).touch(exist_ok=False)
+        except FileExistsError:
+            raise BoardExists(board_id) from None
+
+    async def acquire(self, board_id: str) -> Board:
+        """Return the open board, opening it first if needed.
+
+        The board stays open until it is released as often as acquired.
+        """
+        while (entry := self._open.get(board_id)) is None:
+            opening = self._opening.get(board_id)
+            if opening is None:
+                path = self.path(board_id)
+                if not path.exists():
+                    raise BoardNotFound(board_id)
+                opening = asyncio.ensure_future(self._open_board(board_id, path))
+                self._opening[board_id] = opening
+            # shielded, so a cancelled request does not cancel the others' open
+            await asyncio.shield(opening)
+        self._open.move_to_end(board_id)
+        entry.users += 1
+        return entry.board
+
+    async def release(self, board_id: str) -> None:
+        self._open[board_id].users -= 1
+        excess = len(self._open) - self.max_open
+        if excess <= 0:
+            return
+        idle = [idle_id for idle_id, entry in self._open.items() if not entry.users]
+        # taken out before closing, so new requests open them anew
+        closing = [self._open.pop(idle_id).board for idle_id in idle[:excess]]
+        for board in closing:
+            await asyncio.to_thread(board.close)
+
+    def close(self) -> None:
+        """Close every open board, for shutdown."""
+        while self._open:
+            _, entry = self._open.popitem()
+            entry.board.close()
+
+    async def _open_board(self, board_id: str, path: Path) -> None:
+        try:
+            board = await asyncio.to_thread(self.open_board, path)
+            self._open[board_id] = OpenBoard(board)
+        finally:
+            del self._opening[board_id]
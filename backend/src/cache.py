@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any
+
+
+def make_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an `If-None-Match` header value against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def if_match_versions(if_match: str | None) -> set[int] | None:
+    """The versions an `If-Match` header value allows, or None for any.
+
+    `If-Match` compares strongly, so weak and malformed tags match nothing.
+    """
+    if not if_match:
+        return None
+    versions = set()
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return None
+        if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit():
+            versions.add(int(tag[1:-1]))
+    return versions
+
+
+class BoardCache:
+    """In-process cache of board reads for a single board version.
+
+    Entries are only valid for `version`. Committed writes report the new
+    board version through `update`, which drops every entry of an older
+    version. Reads that loaded an older version than the cache already knows
+    about are not stored.
+
+    The cache assumes this process performs every write to the database.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, Any] = {}
+        self.version: int | None = None
+        # loads in flight per key with the version they started at, only
+        # touched on the event loop
+        self.loads: dict[str, tuple[int | None, asyncio.Future[Any]]] = {}
+
+    @property
+    def etag(self) -> str | None:
+        version = self.version
+        return make_etag(version) if version is not None else None
+
+    def get(self, key: str) -> tuple[int, Any] | None:
+        with self._lock:
+            if self.version is None or key not in self._entries:
+                return None
+            return self.version, self._entries[key]
+
+    def put(self, key: str, version: int, value: Any) -> None:
+        with self._lock:
+            if self.version is not None and version < self.version:
+                return
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            self._entries[key] = value
+
+    def update(self, version: int) -> None:
+        """Advance the cache to a newly committed board version."""
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return
+            self._entries.clear()
+            self.version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.version = None
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from src.snapshots import atomic_path, snapshot_format
+
+CATALOG_DIR = ".catalog"
+CATALOG_FILE = "index.json"
+# a directory changed this close to a scan may have changed within the same
+# mtime tick without the scan seeing it, so the scan is not trusted yet
+RACY_WINDOW_NS = 1_000_000_000
+
+
+def is_snapshot(path: Path) -> bool:
+    return not path.name.startswith(".") and snapshot_format(path) is not None
+
+
+class SnapshotCatalog:
+    """Metadata of every snapshot in a directory, kept in a JSON index.
+
+    While the directory's mtime is unchanged the entries are served from
+    memory, which costs one `stat`. Snapshots are only ever added, replaced
+    or removed by renames and unlinks, which all change that mtime. A changed
+    directory is rescanned: files whose size and mtime match the index keep
+    their entry and only new or changed files are opened by `describe`.
+
+    The index lives in a subdirectory, so writing it does not change the
+    mtime of the snapshot directory itself.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        describe: Callable[[Path], dict[str, Any]],
+    ) -> None:
+        self.directory = directory
+        self.describe = describe
+        self.index_path = directory / CATALOG_DIR / CATALOG_FILE
+        self._lock = threading.Lock()
+        self._index: dict[str, Any] | None = None
+
+    def entries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [item["entry"] for item in self._fresh_index()["files"].values()]
+
+    def get(self, name: str) -> dict[str, Any] | None:
+        with self._lock:
+            item = self._fresh_index()["files"].get(name)
+        return item["entry"] if item else None
+
+    def _fresh_index(self) -> dict[str, Any]:
+        if self._index is None:
+            # created before reading the mtime, which creating it changes
+            self.index_path.parent.mkdir(exist_ok=True)
+            self._index = self._load()
+        dir_mtime_ns = self.directory.stat().st_mtime_ns
+        index = self._index
+        if (
+            index["dir_mtime_ns"] == dir_mtime_ns
+            and index["scanned_at_ns"] - dir_mtime_ns > RACY_WINDOW_NS
+        ):
+            return index
+
+        self._index = self._scan(index["files"], dir_mtime_ns)
+        self._save(self._index)
+        return self._index
+
+    def _scan(self, known: dict[str, Any], dir_mtime_ns: int) -> dict[str, Any]:
+        scanned_at_ns = time.time_ns()
+        files: dict[str, Any] = {}
+        with os.scandir(self.directory) as it:
+            for dir_entry in sorted(it, key=lambda e: e.name):
+                path = Path(dir_entry.path)
+                if not dir_entry.is_file() or not is_snapshot(path):
+                    continue
+                stat = dir_entry.stat()
+                item = known.get(dir_entry.name)
+                if (
+                    item is None
+                    or item["size"] != stat.st_size
+                    or item["mtime_ns"] != stat.st_mtime_ns
+                ):
+                    item = {
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "entry": self.describe(path),
+                    }
+                files[dir_entry.name] = item
+        return {
+            "dir_mtime_ns": dir_mtime_ns,
+            "scanned_at_ns": scanned_at_ns,
+            "files": files,
+        }
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # missing or unreadable, rebuild it from the directory
+            return {"dir_mtime_ns": None, "scanned_at_ns": 0, "files": {}}
+
+    def _save(self, index: dict[str, Any]) -> None:
+        with atomic_path(self.index_path) as tmp:
+            tmp.write_text(json.dumps(index), encoding="utf-8")
@@ -0,0 +1,139 @@
+"""Change log of `stage` and `task` rows, the basis of differential snapshots.
+
+Triggers record the id of every inserted, updated or deleted row in
+`change_log`, once per row with the seq of its latest write. Every snapshot
+records its lineage: the generation of the database it was taken from and
+the log seq at that point. The changes since a snapshot are the rows logged
+after its seq, read in their current state, or as deletes if they are gone.
+
+Replacing the database starts a new generation with an empty log. Its base
+is the lineage of the snapshot it was restored from, so changes can still be
+taken relative to that snapshot.
+"""
+
+from __future__ import annotations
+
+from sqlite3 import Cursor
+from typing import Any, TypedDict
+
+from src.migrations import CHANGE_LOG_TABLES
+
+
+class Lineage(TypedDict):
+    generation: str
+    seq: int
+
+
+class Changes(TypedDict):
+    columns: dict[str, list[str]]
+    upserts: dict[str, list[list[Any]]]
+    deletes: dict[str, list[int]]
+    sequences: dict[str, int]
+
+
+class NotAnAncestor(LookupError):
+    def __init__(self, lineage: Lineage):
+        self.lineage = lineage
+        super().__init__(
+            f"The database does not descend from snapshot lineage "
+            f"{lineage['generation']}:{lineage['seq']}"
+        )
+
+
+def fetch_log_seq(cur: Cursor) -> int:
+    row = cur.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def fetch_lineage(cur: Cursor) -> Lineage:
+    generation = cur.execute("SELECT generation FROM change_log_state").fetchone()[0]
+    return Lineage(generation=generation, seq=fetch_log_seq(cur))
+
+
+def fetch_log_seq_at(cur: Cursor, lineage: Lineage) -> int:
+    """The log seq at which the database was in the state of `lineage`.
+
+    Raises `NotAnAncestor` if the database never was in that state, or was
+    but its log no longer goes back that far.
+    """
+    generation, base_generation, base_seq, base_log_seq = cur.execute(
+        "SELECT generation, base_generation, base_seq, base_log_seq"
+        " FROM change_log_state"
+    ).fetchone()
+    if lineage["generation"] == generation:
+        return lineage["seq"]
+    if (lineage["generation"], lineage["seq"]) == (base_generation, base_seq):
+        return base_log_seq
+    raise NotAnAncestor(lineage)
+
+
+def fetch_changes(cur: Cursor, since: int) -> Changes:
+    """The current state of every row logged after `since`."""
+    changes = Changes(columns={}, upserts={}, deletes={}, sequences={})
+    for table in CHANGE_LOG_TABLES:
+        # `+tbl` keeps the (tbl, row_id) index out, the seq range is narrower
+        logged = "SELECT row_id FROM change_log WHERE +tbl = ? AND seq > ?"
+        rows = cur.execute(
+            f"SELECT * FROM {table} WHERE id IN ({logged}) ORDER BY id",
+            (table, since),
+        )
+        changes["columns"][table] = [column[0] for column in rows.description]
+        changes["upserts"][table] = [list(row) for row in rows.fetchall()]
+
+        present = {row[0] for row in changes["upserts"][table]}
+        logged_ids = {row_id for (row_id,) in cur.execute(logged, (table, since))}
+        changes["deletes"][table] = sorted(logged_ids - present)
+
+    # ids are never reused, so the next ids have to carry over as well
+    for name, seq in cur.execute(
+        "SELECT name, seq FROM sqlite_sequence WHERE name IN (?, ?)",
+        CHANGE_LOG_TABLES,
+    ):
+        changes["sequences"][name] = seq
+    return changes
+
+
+def apply_changes(cur: Cursor, changes: Changes) -> None:
+    """Bring the rows of `changes` into the state they were saved in."""
+    for table in reversed(CHANGE_LOG_TABLES):
+        cur.executemany(
+            f"DELETE FROM {table} WHERE id = ?",
+            [(row_id,) for row_id in changes["deletes"][table]],
+        )
+
+    for table in CHANGE_LOG_TABLES:
+        columns = changes["columns"][table]
+        known = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+        if unknown := set(columns) - known:
+            raise ValueError(f"unknown {table} columns {sorted(unknown)}")
+        names = ", ".join(f'"{column}"' for column in columns)
+        params = ", ".join("?" * len(columns))
+        cur.executemany(
+            f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({params})",
+            changes["upserts"][table],
+        )
+
+    for name, seq in changes["sequences"].items():
+        cur.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq, name)
+        )
+        if cur.rowcount == 0:
+            cur.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, seq)
+            )
+
+
+def reset_change_log(cur: Cursor, base: Lineage | None) -> None:
+    """Start a new generation with an empty log, based on snapshot `base`."""
+    cur.execute("DELETE FROM change_log")
+    cur.execute(
+        "UPDATE change_log_state SET generation = lower(hex(randomblob(16))),"
+        " base_generation = ?, base_seq = ?, base_log_seq = ?",
+        (
+            base["generation"] if base else None,
+            base["seq"] if base else None,
+            fetch_log_seq(cur),
+        ),
+    )
@@ -1,31 +1,49 @@
 from __future__ import annotations
 
 import datetime as dt
+import json
 import logging
-import os
-import subprocess
+import sqlite3
+from functools import cache
 from pathlib import Path
+from typing import Any, TextIO
 
-from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel as BaseSchema
 from starlette.status import (
     HTTP_201_CREATED,
+    HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
-    HTTP_500_INTERNAL_SERVER_ERROR,
+    HTTP_409_CONFLICT,
 )
 
-from src.helpers import load_schema_into_db
+from src.catalog import SnapshotCatalog
+from src.changelog import (
+    Lineage,
+    NotAnAncestor,
+    fetch_changes,
+    fetch_lineage,
+    fetch_log_seq_at,
+)
+from src.helpers import load_snapshot_into_db, read_cursor
 from src.repository import DEFAULT_SCHEMA
+from src.snapshots import (
+    FullSnapshotFormat,
+    SnapshotFormat,
+    atomic_path,
+    backup_db,
+    dump_sql,
+    read_diff,
+    restore_chain,
+    scratch_path,
+    snapshot_format,
+    snapshot_stats,
+    write_diff,
+)
 
 logging.basicConfig(level=logging.INFO)
 
 
-load_dotenv()
-_db_path_ = os.getenv("SQLITE_DATABASE_PATH")
-assert _db_path_ is not None
-DB_PATH = Path(_db_path_)
-
 DB_SNAPSHOTS_PATH = Path("./db_snapshots")
 DB_SNAPSHOTS_PATH.mkdir(exist_ok=True)
 CURRENT_SNAPSHOT_PATH = DB_SNAPSHOTS_PATH / ".current"
@@ -34,21 +52,33 @@ DEFAULT_SNAPSHOT_PATH = DB_SNAPSHOTS_PATH / "default.sql"
 SQL_COMMENT = "--"
 SNAPSHOT_COMMENT = f"{SQL_COMMENT} COMMENT: "
 SNAPSHOT_DATE = f"{SQL_COMMENT} DATE: "
+SNAPSHOT_LINEAGE = f"{SQL_COMMENT} LINEAGE: "
 DATE_FORMAT_TEXT = "%Y-%m-%d %H:%M:%S"
 
 
-def write_schema_to_file(
-    path: Path,
+def write_snapshot_header(
+    file: TextIO,
     comment: str,
     date: dt.datetime,
-    schema: str,
+    lineage: Lineage | None = None,
 ) -> None:
-    text = (
+    file.write(
         f"{SNAPSHOT_COMMENT}{comment}\n"
         f"{SNAPSHOT_DATE}{date.strftime(DATE_FORMAT_TEXT)}\n"
-        f"{schema}"
     )
-    path.write_text(text)
+    if lineage is not None:
+        file.write(f"{SNAPSHOT_LINEAGE}{lineage['generation']} {lineage['seq']}\n")
+
+
+def write_schema_to_file(
+    path: Path,
+    comment: str,
+    date: dt.datetime,
+    schema: str,
+) -> None:
+    with path.open("w") as f:
+        write_snapshot_header(f, comment, date)
+        f.write(schema)
 
 
 if not DEFAULT_SNAPSHOT_PATH.exists():
@@ -69,20 +99,143 @@ class SnapshotLoad(BaseSchema):
 
 class SnapshotCreate(SnapshotLoad):
     comment: str
+    format: SnapshotFormat = "sql"
+    # the snapshot a `diff` snapshot stores the changes since
+    parent: str | None = None
+
+
+class SnapshotCompact(SnapshotLoad):
+    format: FullSnapshotFormat = "db.gz"
 
 
-class SnapshotPublic(SnapshotCreate):
+class SnapshotPublic(SnapshotLoad):
+    comment: str
     date: dt.datetime
+    generation: str | None = None
+    seq: int | None = None
+    parent: str | None = None
+    size: int | None = None
+    sha256: str | None = None
+    stages: int | None = None
+    tasks: int | None = None
+
+    @property
+    def lineage(self) -> Lineage | None:
+        if self.generation is None or self.seq is None:
+            return None
+        return Lineage(generation=self.generation, seq=self.seq)
+
+
+SNAPSHOT_METADATA = {"comment", "date", "generation", "seq", "parent"}
+
+
+def metadata_path(path: Path) -> Path:
+    """Sidecar file holding the comment, date and lineage of a binary snapshot."""
+    return path.with_name(f"{path.name}.json")
 
 
 # FIXME: add error handling
 def parse_snapshot(path: Path) -> SnapshotPublic:
     name = path.name
+    fmt = snapshot_format(path)
+    if fmt == "diff":
+        diff = read_diff(path)
+        return SnapshotPublic(
+            name=name, **{key: diff[key] for key in SNAPSHOT_METADATA}
+        )
+    if fmt != "sql":
+        sidecar = metadata_path(path)
+        if not sidecar.exists():
+            # a database file copied in by hand
+            date = dt.datetime.fromtimestamp(path.stat().st_mtime)
+            return SnapshotPublic(name=name, comment="", date=date)
+        metadata = json.loads(sidecar.read_text(encoding="utf-8"))
+        return SnapshotPublic(name=name, **metadata)
+
     with path.open() as f:
         comment = f.readline().strip().removeprefix(SNAPSHOT_COMMENT)
         date_str = f.readline().strip().removeprefix(SNAPSHOT_DATE)
         date = dt.datetime.strptime(date_str, DATE_FORMAT_TEXT)
-    return SnapshotPublic(name=name, comment=comment, date=date)
+        line = f.readline()
+    public = SnapshotPublic(name=name, comment=comment, date=date)
+    if line.startswith(SNAPSHOT_LINEAGE):
+        public.generation, seq = line.removeprefix(SNAPSHOT_LINEAGE).split()
+        public.seq = int(seq)
+    return public
+
+
+def describe_snapshot(path: Path) -> dict[str, Any]:
+    return {
+        **parse_snapshot(path).model_dump(mode="json", exclude_none=True),
+        **snapshot_stats(path),
+    }
+
+
+@cache
+def snapshot_catalog(directory: Path) -> SnapshotCatalog:
+    return SnapshotCatalog(directory, describe_snapshot)
+
+
+def write_full_snapshot(conn: sqlite3.Connection, public: SnapshotPublic) -> None:
+    path = DB_SNAPSHOTS_PATH / public.name
+    if snapshot_format(path) == "sql":
+        with atomic_path(path) as tmp, tmp.open("w") as f:
+            write_snapshot_header(f, public.comment, public.date, public.lineage)
+            dump_sql(conn, f)
+        return
+    # the metadata is in place before the snapshot shows up in listings
+    with atomic_path(metadata_path(path)) as tmp:
+        tmp.write_text(
+            public.model_dump_json(include=SNAPSHOT_METADATA, exclude_none=True),
+            encoding="utf-8",
+        )
+    backup_db(conn, path)
+
+
+def existing_snapshot(name: str) -> Path:
+    snapshot_path = DB_SNAPSHOTS_PATH / name
+    if not snapshot_path.exists():
+        raise HTTPException(
+            HTTP_404_NOT_FOUND, detail=f"No snapshot file with {snapshot_path} found"
+        )
+    if snapshot_format(snapshot_path) is None:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST, detail=f"{snapshot_path} is not a snapshot file"
+        )
+    return snapshot_path
+
+
+def parent_lineage(name: str) -> Lineage:
+    existing_snapshot(name)
+    entry = snapshot_catalog(DB_SNAPSHOTS_PATH).get(name)
+    lineage = SnapshotPublic(**entry).lineage if entry else None
+    if lineage is None:
+        raise HTTPException(
+            HTTP_409_CONFLICT,
+            detail=f"Snapshot {name} has no lineage, save a full snapshot first",
+        )
+    return lineage
+
+
+def snapshot_chain(path: Path) -> list[Path]:
+    """The full snapshot a snapshot builds on, followed by the diffs up to it."""
+    chain = [path]
+    while snapshot_format(chain[-1]) == "diff":
+        diff = read_diff(chain[-1])
+        parent = DB_SNAPSHOTS_PATH / diff["parent"]
+        if parent in chain:
+            raise HTTPException(
+                HTTP_409_CONFLICT, detail=f"Snapshot {parent.name} has a cycle"
+            )
+        if parent_lineage(parent.name) != diff["parent_lineage"]:
+            raise HTTPException(
+                HTTP_409_CONFLICT,
+                detail=f"Snapshot {parent.name} changed since {chain[-1].name}"
+                " was saved on it",
+            )
+        chain.append(parent)
+    chain.reverse()
+    return chain
 
 
 @router.post(
@@ -90,58 +243,103 @@ def parse_snapshot(path: Path) -> SnapshotPublic:
     status_code=HTTP_201_CREATED,
     response_model=SnapshotPublic,
 )
-def save_dummy(snapshot: SnapshotCreate):
-    now = dt.datetime.now()
-    snapshot_path = DB_SNAPSHOTS_PATH / f"{snapshot.name}.sql"
-    try:
-        result = subprocess.run(
-            ["sqlite3", str(DB_PATH), ".dump"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        write_schema_to_file(
-            snapshot_path, snapshot.comment, date=now, schema=result.stdout
+def save_dummy(request: Request, snapshot: SnapshotCreate):
+    """Save the database as a full snapshot or as the changes since `parent`."""
+    name = f"{snapshot.name}.{snapshot.format}"
+    if snapshot.format == "diff" and snapshot.parent is None:
+        raise HTTPException(
+            HTTP_400_BAD_REQUEST, detail="A diff snapshot needs a parent snapshot"
         )
-    except subprocess.CalledProcessError as e:
-        logging.exception(
-            "Dumping sqlite db %s failed\nReturn Code: %d\nStdout: %s\nStderr: %s",
-            DB_PATH,
-            e.returncode,
-            e.stdout,
-            e.stderr,
+    parent = parent_lineage(snapshot.parent) if snapshot.format == "diff" else None
+
+    with read_cursor(request) as cur:
+        public = SnapshotPublic(
+            name=name,
+            comment=snapshot.comment,
+            date=dt.datetime.now(),
+            parent=snapshot.parent if parent else None,
+            **fetch_lineage(cur),
         )
+        if parent is None:
+            write_full_snapshot(cur.connection, public)
+        else:
+            try:
+                since = fetch_log_seq_at(cur, parent)
+            except NotAnAncestor as e:
+                raise HTTPException(HTTP_409_CONFLICT, detail=str(e))
+            write_diff(
+                DB_SNAPSHOTS_PATH / name,
+                {
+                    **public.model_dump(mode="json", include=SNAPSHOT_METADATA),
+                    "parent_lineage": parent,
+                    "changes": fetch_changes(cur, since),
+                },
+            )
+    return snapshot_catalog(DB_SNAPSHOTS_PATH).get(name) or public
+
+
+@router.post(
+    "/snapshots/compact",
+    status_code=HTTP_201_CREATED,
+    response_model=SnapshotPublic,
+)
+def compact_snapshot(snapshot: SnapshotCompact):
+    """Merge a diff snapshot and its chain into a full snapshot replacing it.
+
+    The full snapshot keeps the comment, date and lineage of the diff, diffs
+    saved on the diff are moved onto it.
+    """
+    diff_path = existing_snapshot(snapshot.name)
+    if snapshot_format(diff_path) != "diff":
         raise HTTPException(
-            HTTP_500_INTERNAL_SERVER_ERROR, detail="dumping db file failed"
+            HTTP_400_BAD_REQUEST, detail=f"{snapshot.name} is not a diff snapshot"
         )
-    return SnapshotPublic(
-        name=snapshot.name + ".sql", comment=snapshot.comment, date=now
-    )
+    name = f"{diff_path.name.removesuffix('.diff')}.{snapshot.format}"
+    if (DB_SNAPSHOTS_PATH / name).exists():
+        raise HTTPException(HTTP_409_CONFLICT, detail=f"Snapshot {name} exists")
+
+    chain = snapshot_chain(diff_path)
+    public = parse_snapshot(diff_path).model_copy(update={"name": name, "parent": None})
+    with scratch_path(diff_path.with_name(f".{diff_path.name}.db")) as tmp:
+        conn = sqlite3.connect(tmp)
+        try:
+            restore_chain(chain, conn)
+            conn.commit()
+            write_full_snapshot(conn, public)
+        finally:
+            conn.close()
+
+    for entry in snapshot_catalog(DB_SNAPSHOTS_PATH).entries():
+        if entry.get("parent") == diff_path.name:
+            child_path = DB_SNAPSHOTS_PATH / entry["name"]
+            write_diff(child_path, {**read_diff(child_path), "parent": name})
+    diff_path.unlink()
+
+    return snapshot_catalog(DB_SNAPSHOTS_PATH).get(name) or public
 
 
 @router.get("/snapshots/current", response_model=SnapshotPublic)
 def get_current_snapshot_name():
     if not CURRENT_SNAPSHOT_PATH.exists():
         raise HTTPException(HTTP_404_NOT_FOUND, detail="No current snapshot found")
-    current = CURRENT_SNAPSHOT_PATH.read_text().strip()
-    return parse_snapshot(Path(current))
+    current = Path(CURRENT_SNAPSHOT_PATH.read_text().strip())
+    entry = snapshot_catalog(DB_SNAPSHOTS_PATH).get(current.name)
+    if entry is None:
+        raise HTTPException(HTTP_404_NOT_FOUND, detail=f"No snapshot {current} found")
+    return entry
 
 
 @router.get("/snapshots", response_model=list[SnapshotPublic])
 def get_all_snapshots():
-    return [parse_snapshot(path) for path in DB_SNAPSHOTS_PATH.glob("*.sql")]
+    return snapshot_catalog(DB_SNAPSHOTS_PATH).entries()
 
 
 @router.post("/snapshots/load")
 def load_snapshot(request: Request, snapshot: SnapshotLoad):
-    snapshot_path = DB_SNAPSHOTS_PATH / snapshot.name
-    if not snapshot_path.exists():
-        raise HTTPException(
-            HTTP_404_NOT_FOUND, detail=f"No snapshot file with {snapshot_path} found"
-        )
+    snapshot_path = existing_snapshot(snapshot.name)
+    chain = snapshot_chain(snapshot_path)
 
-    schema = snapshot_path.read_text(encoding="utf-8")
-    load_schema_into_db(request, DB_PATH, schema)
+    load_snapshot_into_db(request, chain, parse_snapshot(snapshot_path).lineage)
 
     CURRENT_SNAPSHOT_PATH.write_text(str(snapshot_path), encoding="utf-8")
     logging.info("loading snapshot %s", snapshot_path)
@@ -0,0 +1,137 @@
+"""Board change events, pushed to clients as Server-Sent Events.
+
+Every committed write publishes one event with the board version it
+produced as its id. Events are encoded once and kept in a ring buffer of
+recent versions, which every subscriber reads from. A publish wakes all
+subscribers of an event loop through one shared future, so fan-out costs no
+per-subscriber queue or copy.
+
+A subscriber resumes from the last version it saw. If that version is no
+longer covered by the ring buffer, it gets a `reset` event instead and has
+to reload the board.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from collections.abc import AsyncIterator
+from itertools import islice
+from typing import Any, NamedTuple
+
+from pydantic_core import to_json
+
+DEFAULT_HISTORY = 1_024
+KEEP_ALIVE_SECONDS = 15.0
+KEEP_ALIVE = b": keep-alive\n\n"
+
+
+class BoardEvent(NamedTuple):
+    name: str
+    data: Any
+
+
+def encode_event(version: int, event: BoardEvent) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (
+        version,
+        event.name.encode(),
+        to_json(event.data),
+    )
+
+
+class BoardEvents:
+    """Ring buffer of encoded events that subscribers read and wait on.
+
+    Versions in the buffer are contiguous: a publish that skips versions
+    drops the history before it, since the changes in between are unknown.
+    `publish` may be called from any thread.
+    """
+
+    def __init__(self, version: int, history: int = DEFAULT_HISTORY) -> None:
+        self._lock = threading.Lock()
+        self._history: deque[tuple[int, bytes]] = deque(maxlen=history)
+        self._wakeups: dict[asyncio.AbstractEventLoop, asyncio.Future[None]] = {}
+        self.version = version
+        self.closed = False
+
+    def publish(self, version: int, event: BoardEvent) -> None:
+        frame = encode_event(version, event)
+        with self._lock:
+            if version <= self.version:
+                return
+            if version != self.version + 1:
+                self._history.clear()
+            self._history.append((version, frame))
+            self.version = version
+            wakeups, self._wakeups = self._wakeups, {}
+        wake(wakeups)
+
+    def close(self) -> None:
+        """End every subscription, so open streams do not hold up shutdown."""
+        with self._lock:
+            self.closed = True
+            wakeups, self._wakeups = self._wakeups, {}
+        wake(wakeups)
+
+    def poll(
+        self, since: int
+    ) -> tuple[list[tuple[int, bytes]] | None, asyncio.Future[None] | None]:
+        """Return the events after version `since`, or None if they are gone.
+
+        When there are none yet, also returns a future that is resolved by
+        the next publish. It has to be awaited on the calling event loop.
+        """
+        with self._lock:
+            if since == self.version:
+                if self.closed:
+                    return [], None
+                loop = asyncio.get_running_loop()
+                wakeup = self._wakeups.get(loop)
+                if wakeup is None:
+                    wakeup = self._wakeups[loop] = loop.create_future()
+                return [], wakeup
+
+            first = self._history[0][0] if self._history else self.version + 1
+            if not first - 1 <= since < self.version:
+                return None, None
+            return list(islice(self._history, since - first + 1, None)), None
+
+    async def subscribe(self, since: int | None) -> AsyncIterator[bytes]:
+        """Yield the encoded events after version `since`, then new ones.
+
+        Without `since`, starts at the current version. Sends a keep-alive
+        comment when nothing happened for a while, so idle connections are
+        not dropped by proxies.
+        """
+        if since is None:
+            since = self.version
+        while True:
+            events, wakeup = self.poll(since)
+            if events is None:
+                since = self.version
+                yield encode_event(since, BoardEvent("reset", {"version": since}))
+            elif events:
+                since = events[-1][0]
+                yield b"".join(frame for _, frame in events)
+            elif wakeup is None:
+                return
+            else:
+                try:
+                    # shielded, the future is shared with every other subscriber
+                    await asyncio.wait_for(asyncio.shield(wakeup), KEEP_ALIVE_SECONDS)
+                except TimeoutError:
+                    yield KEEP_ALIVE
+
+
+def wake(wakeups: dict[asyncio.AbstractEventLoop, asyncio.Future[None]]) -> None:
+    for loop, wakeup in wakeups.items():
+        try:
+            loop.call_soon_threadsafe(resolve, wakeup)
+        except RuntimeError:
+            pass  # the loop is closed, nobody is waiting anymore
+
+
+def resolve(wakeup: asyncio.Future[None]) -> None:
+    if not wakeup.done():
+        wakeup.set_result(None)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager
+from sqlite3 import Cursor
+from typing import Any, TypedDict
+
+DEFAULT_MAX_BATCH = 256
+
+
+class QueueStats(TypedDict):
+    workers: int
+    queued: int
+    running: int
+    completed: int
+    max_queued: int
+    wait_seconds_total: float
+
+
+class WorkQueue:
+    """A thread pool that counts the calls waiting for and running on it.
+
+    `queued` is the queue depth: calls submitted but not started yet, because
+    all `workers` threads are busy.
+    """
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._max_queued = 0
+        self._wait_seconds_total = 0.0
+
+    async def run[T](self, fn: Callable[[], T]) -> T:
+        """Call `fn` on one of the threads and wait for its result.
+
+        `fn` runs in a copy of the caller's context, so it sees the caller's
+        context variables like a coroutine would.
+        """
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+        submitted = time.perf_counter()
+
+        def call() -> T:
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_seconds_total += time.perf_counter() - submitted
+            try:
+                return fn()
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, context.run, call)
+
+    def stats(self) -> QueueStats:
+        with self._lock:
+            return QueueStats(
+                workers=self.workers,
+                queued=self._queued,
+                running=self._running,
+                completed=self._completed,
+                max_queued=self._max_queued,
+                wait_seconds_total=self._wait_seconds_total,
+            )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+
+class PendingWrite:
+    """A write waiting for its batch, and its outcome once the batch is done."""
+
+    __slots__ = ("context", "error", "fn", "on_commit", "result")
+
+    def __init__(
+        self,
+        fn: Callable[[Cursor], Any],
+        on_commit: Callable[[Any], object] | None,
+    ) -> None:
+        self.fn = fn
+        self.on_commit = on_commit
+        self.context = contextvars.copy_context()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class GroupCommit:
+    """Commits the writes waiting for the write thread together, in one go.
+
+    Every write queues a flush on the write thread. The first flush to run
+    takes every write waiting by then, up to `max_batch`, and runs them in
+    order in a single transaction; the flushes of those writes find nothing
+    left to do. Writes arriving while a batch commits make up the next one,
+    so under load the commits, and their fsyncs, are shared by many writes,
+    while a lone write is committed right away. A positive `window` makes a
+    flush wait up to that many seconds for more writes first, trading
+    latency for larger batches.
+
+    Each write runs in a savepoint, so one that raises is rolled back on its
+    own and the rest of its batch still commits. No write is acknowledged
+    before the commit of its batch returned: writes are exactly as durable
+    as the commit makes them, whatever the connection's `synchronous` mode.
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        window: float = 0.0,
+        max_batch: int = DEFAULT_MAX_BATCH,
+    ) -> None:
+        if max_batch < 1:
+            raise ValueError(f"max_batch must be at least 1, got {max_batch}")
+        self.queue = queue
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: list[PendingWrite] = []
+        self._changed = threading.Condition()
+
+    async def run[T](
+        self,
+        transaction: Callable[[], AbstractContextManager[Cursor]],
+        fn: Callable[[Cursor], T],
+        on_commit: Callable[[T], object] | None = None,
+    ) -> T:
+        """Call `fn` in a batch of writes and return once the batch committed.
+
+        `transaction` opens the transaction of a batch and commits it when its
+        block exits, like `ConnectionPool.write`. `on_commit`, if given, gets
+        the result of `fn` on the write thread after the commit, with the
+        commits of later batches waiting for it. `fn` and `on_commit` run in
+        a copy of the caller's context.
+        """
+        write = PendingWrite(fn, on_commit)
+        with self._changed:
+            self._pending.append(write)
+            self._changed.notify()
+        # every pending write has a flush queued behind it, so by the time
+        # this one ran, the write is in a batch that finished
+        await self.queue.run(lambda: self._flush(transaction))
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def _flush(self, transaction: Callable[[], AbstractContextManager[Cursor]]) -> None:
+        with self._changed:
+            if not self._pending:
+                return
+            if self.window > 0:
+                self._changed.wait_for(
+                    lambda: len(self._pending) >= self.max_batch, timeout=self.window
+                )
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+
+        try:
+            with transaction() as cur:
+                # savepoints outside a transaction would commit on release
+                cur.execute("BEGIN IMMEDIATE")
+                for write in batch:
+                    write.context.run(apply_write, cur, write)
+        except BaseException as e:
+            for write in batch:
+                write.result, write.error = None, write.error or e
+            return
+
+        for write in batch:
+            if write.error is None and write.on_commit is not None:
+                write.context.run(write.on_commit, write.result)
+
+
+def apply_write(cur: Cursor, write: PendingWrite) -> None:
+    """Run a write in a savepoint, rolling back only its changes if it raises."""
+    cur.execute("SAVEPOINT write")
+    try:
+        write.result = write.fn(cur)
+    except Exception as e:
+        cur.execute("ROLLBACK TO write")
+        write.error = e
+    finally:
+        cur.execute("RELEASE write")
+
+
+class DatabaseExecutor:
+    """Threads dedicated to database work, off the event loop.
+
+    Writes run on a single thread, in submission order: SQLite allows one
+    writer at a time anyway, so a second write thread would only wait on the
+    pool's write lock. `commits` batches them there into shared transactions.
+    Reads run on one thread per reader connection, so they never wait on the
+    pool for a connection. Neither competes with the server's shared
+    threadpool.
+    """
+
+    def __init__(
+        self,
+        readers: int,
+        write_window: float = 0.0,
+        max_batch: int = DEFAULT_MAX_BATCH,
+    ) -> None:
+        self.writes = WorkQueue("db-write", 1)
+        self.reads = WorkQueue("db-read", readers)
+        self.commits = GroupCommit(self.writes, write_window, max_batch)
+
+    def stats(self) -> dict[str, QueueStats]:
+        return {"write": self.writes.stats(), "read": self.reads.stats()}
+
+    def shutdown(self) -> None:
+        self.writes.shutdown()
+        self.reads.shutdown()
@@ -1,46 +1,461 @@
+from __future__ import annotations
+
+import asyncio
+import os
 import sqlite3
-from collections.abc import Generator
+import tempfile
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from sqlite3 import Connection, Cursor
-from typing import Annotated
 
-from fastapi import Depends, Request
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.status import (
+    HTTP_304_NOT_MODIFIED,
+    HTTP_404_NOT_FOUND,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
+
+from src.boards import Board, BoardNotFound, Boards
+from src.cache import etag_matches, make_etag
+from src.changelog import Lineage, reset_change_log
+from src.events import BoardEvent
+from src.executor import DatabaseExecutor
+from src.metrics import checkout
+from src.migrations import migrate
+from src.pool import ConnectionPool, PoolClosed, PoolTimeout
+from src.repository import bump_board_version, fetch_board_version
+from src.snapshots import restore_chain
+
+
+def request_board(request: Request) -> Board:
+    """The board of a request: the one in its path, or else the default board."""
+    board: Board | None = getattr(request.state, "board", None)
+    if board is not None:
+        return board
+    state = request.app.state
+    return Board(
+        state.pool, state.db_executor.commits, state.board_cache, state.board_events
+    )
+
+
+async def use_board(request: Request, board_id: str) -> AsyncIterator[Board]:
+    """Dependency of the routes under `/boards/{board_id}`: their board.
+
+    The board stays open until the response is sent, streams included.
+    """
+    boards: Boards = request.app.state.boards
+    try:
+        board = await boards.acquire(board_id)
+    except BoardNotFound as e:
+        raise HTTPException(HTTP_404_NOT_FOUND, detail=str(e))
+    request.state.board = board
+    try:
+        yield board
+    finally:
+        await boards.release(board_id)
+
+
+@contextmanager
+def read_cursor(request: Request) -> Iterator[Cursor]:
+    """Check out a pooled reader cursor, answering 503 if none is available."""
+    pool = request_board(request).pool
+    try:
+        with checkout(pool.read()) as cur:
+            yield cur
+    except (PoolTimeout, PoolClosed) as e:
+        raise HTTPException(HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+
+async def run_read[T](request: Request, fn: Callable[[Cursor], T]) -> T:
+    """Call `fn` with a reader cursor on one of the database read threads.
+
+    The read threads are shared by every board, each read checks out a
+    reader of its own board's pool.
+    """
+    pool = request_board(request).pool
+    executor: DatabaseExecutor = request.app.state.db_executor
+
+    def read() -> T:
+        with checkout(pool.read()) as cur:
+            return fn(cur)
+
+    try:
+        return await executor.reads.run(read)
+    except (PoolTimeout, PoolClosed) as e:
+        raise HTTPException(HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
 
+async def run_write[T](
+    request: Request,
+    fn: Callable[[Cursor], T],
+    event: Callable[[T], BoardEvent | None] | None = None,
+) -> T:
+    """Call `fn` with the writer cursor on the board's write thread.
 
-def get_cursor(request: Request) -> Generator[Cursor]:
-    cur = request.app.state.cur
+    The write joins the next batch of writes committed together (see
+    `GroupCommit`) and returns once that batch is committed; if `fn` raises,
+    only its own changes are rolled back. After the commit, `event` turns the
+    result into the event to publish to subscribers, if any, and the board
+    cache is advanced to the new board version, so both happen before the
+    response is sent.
+    """
+    board = request_board(request)
+
+    def write(cur: Cursor) -> tuple[T, int]:
+        # the writer is already checked out for the batch, this only counts
+        # the rows this write changed
+        with checkout(nullcontext(cur)) as cur:
+            return fn(cur), fetch_board_version(cur)
+
+    def publish(written: tuple[T, int]) -> None:
+        # published from the write thread, so events go out in commit order
+        result, version = written
+        if event is not None and (board_event := event(result)) is not None:
+            board.events.publish(version, board_event)
+
+    try:
+        result, version = await board.commits.run(board.pool.write, write, publish)
+    except (PoolTimeout, PoolClosed) as e:
+        raise HTTPException(HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    board.cache.update(version)
+    return result
+
+
+async def stream_read(
+    request: Request,
+    read: Callable[[Cursor], Iterable[bytes]],
+    media_type: str,
+    headers: dict[str, str] | None = None,
+) -> StreamingResponse:
+    """Stream the chunks `read` produces from a reader cursor as the response.
+
+    The reader is checked out for the whole response, so every chunk comes
+    from the same read transaction and a database swap waits for the stream
+    like for any other read. `read` produces its chunks while the client
+    consumes them, on the server's threadpool rather than the read threads,
+    so a slow client holds a connection but never a read thread.
+    """
+    pool = request_board(request).pool
+    executor: DatabaseExecutor = request.app.state.db_executor
+
+    reader = checkout(pool.read())
     try:
-        yield cur
-    except Exception:
-        cur.connection.rollback()
-        raise
+        cur = await executor.reads.run(reader.__enter__)
+    except (PoolTimeout, PoolClosed) as e:
+        raise HTTPException(HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    def stream() -> Iterator[bytes]:
+        # a background task would not run when `read` raises or the client
+        # leaves, this releases the reader however the stream ends
+        try:
+            yield from read(cur)
+        finally:
+            reader.__exit__(None, None, None)
+
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
+
+
+class JSONBytesResponse(Response):
+    """A response for JSON that is already serialized, skipping validation."""
+
+    media_type = "application/json"
+
+
+async def cached_board_read(
+    request: Request,
+    key: str,
+    load: Callable[[Cursor], bytes],
+) -> Response:
+    """Serve a pre-serialized board read from the cache, loading it on a miss.
+
+    Answers 304 straight from the cache when `If-None-Match` carries the
+    current board version, without checking out a connection. Cache hits are
+    served on the event loop, only misses go to a read thread.
+    """
+    cache = request_board(request).cache
+    if_none_match = request.headers.get("if-none-match")
+
+    etag = cache.etag
+    if etag is not None and etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    version, value = await load_cached_board(request, key, load)
+
+    etag = make_etag(version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return JSONBytesResponse(value, headers=revalidation_headers(etag))
 
 
-CursorDep = Annotated[Cursor, Depends(get_cursor)]
+async def load_cached_board(
+    request: Request,
+    key: str,
+    load: Callable[[Cursor], bytes],
+) -> tuple[int, bytes]:
+    """Return a board read and its version, from the cache or by `load`.
+
+    There is at most one load per key in flight. Misses share it as long as
+    no write was committed since it started; otherwise they wait for it to
+    finish and share the next one. After a burst of writes, every request
+    racing to reload the board would else queue on the read threads doing
+    the same work.
+    """
+    cache = request_board(request).cache
+    while True:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        started = cache.version
+        pending = cache.loads.get(key)
+        if pending is None:
+            task = asyncio.ensure_future(
+                run_read(request, lambda cur: (fetch_board_version(cur), load(cur)))
+            )
+            pending = (started, task)
+            cache.loads[key] = pending
+
+            def forget(_: asyncio.Future, pending=pending) -> None:
+                if cache.loads.get(key) is pending:
+                    del cache.loads[key]
+
+            task.add_done_callback(forget)
+        elif pending[0] != started:
+            # started before the latest write, so it may miss it
+            await asyncio.wait([pending[1]])
+            continue
+
+        # shielded, so a cancelled request does not cancel the others' load
+        version, value = await asyncio.shield(pending[1])
+        cache.put(key, version, value)
+        return version, value
+
+
+def revalidation_headers(etag: str) -> dict[str, str]:
+    # let browsers keep the board but revalidate it on every load
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=HTTP_304_NOT_MODIFIED, headers=revalidation_headers(etag)
+    )
+
+
+JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+SYNCHRONOUS_MODES = {"off", "normal", "full", "extra"}
+TEMP_STORES = {"default", "file", "memory"}
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """SQLite pragmas applied to every connection.
+
+    The defaults enable WAL so readers never block the writer, relax fsyncs to
+    `synchronous=NORMAL` (durable at checkpoints, safe against corruption) and
+    give each connection a larger page cache plus memory-mapped I/O. Each
+    connection also keeps up to `cached_statements` prepared statements, enough
+    for every statement of the repository, so none is parsed twice.
+
+    Checkpointing: SQLite checkpoints automatically once the WAL grows past
+    `wal_autocheckpoint` pages, the WAL file is truncated back to
+    `journal_size_limit` bytes afterwards, and `ConnectionPool.close` runs a
+    final TRUNCATE checkpoint.
+    """
+
+    journal_mode: str = "wal"
+    synchronous: str = "normal"
+    cache_size: int = -64_000  # pages if positive, KiB if negative
+    mmap_size: int = 256 * 1024 * 1024
+    temp_store: str = "memory"
+    busy_timeout: int = 5_000  # ms to wait for a lock before `database is locked`
+    wal_autocheckpoint: int = 1_000
+    journal_size_limit: int = 64 * 1024 * 1024
+    cached_statements: int = 512
+
+    def __post_init__(self) -> None:
+        # pragmas cannot be parameterized, so only allow known keywords
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"invalid journal_mode {self.journal_mode!r}")
+        if self.synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"invalid synchronous {self.synchronous!r}")
+        if self.temp_store not in TEMP_STORES:
+            raise ValueError(f"invalid temp_store {self.temp_store!r}")
+
+    @classmethod
+    def from_env(cls) -> StorageProfile:
+        """Read the profile from `SQLITE_*` env vars, falling back to defaults."""
+        defaults = cls()
+        return cls(
+            journal_mode=os.getenv(
+                "SQLITE_JOURNAL_MODE", defaults.journal_mode
+            ).lower(),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", defaults.synchronous).lower(),
+            cache_size=int(os.getenv("SQLITE_CACHE_SIZE", defaults.cache_size)),
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", defaults.mmap_size)),
+            temp_store=os.getenv("SQLITE_TEMP_STORE", defaults.temp_store).lower(),
+            busy_timeout=int(os.getenv("SQLITE_BUSY_TIMEOUT", defaults.busy_timeout)),
+            wal_autocheckpoint=int(
+                os.getenv("SQLITE_WAL_AUTOCHECKPOINT", defaults.wal_autocheckpoint)
+            ),
+            journal_size_limit=int(
+                os.getenv("SQLITE_JOURNAL_SIZE_LIMIT", defaults.journal_size_limit)
+            ),
+            cached_statements=int(
+                os.getenv("SQLITE_CACHED_STATEMENTS", defaults.cached_statements)
+            ),
+        )
+
+    @classmethod
+    def sqlite_defaults(cls) -> StorageProfile:
+        """The settings a plain `sqlite3.connect` would use."""
+        return cls(
+            journal_mode="delete",
+            synchronous="full",
+            cache_size=-2_000,
+            mmap_size=0,
+            temp_store="default",
+            busy_timeout=5_000,
+            journal_size_limit=-1,
+            cached_statements=128,
+        )
+
+    def apply(self, conn: Connection) -> None:
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA temp_store = {self.temp_store}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute(f"PRAGMA wal_autocheckpoint = {int(self.wal_autocheckpoint)}")
+        conn.execute(f"PRAGMA journal_size_limit = {int(self.journal_size_limit)}")
+
+
+DEFAULT_STORAGE_PROFILE = StorageProfile()
+
+
+def open_pool(
+    db_path: Path,
+    size: int,
+    timeout: float,
+    profile: StorageProfile = DEFAULT_STORAGE_PROFILE,
+    trace: Callable[[str], None] | None = None,
+) -> ConnectionPool:
+    connect = partial(init_conn, profile=profile, trace=trace)
+    return ConnectionPool(db_path, connect, size=size, timeout=timeout)
+
+
+def remove_db_files(db_path: Path) -> None:
+    """Delete a database file together with its WAL and shared-memory files."""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+
+def load_schema_into_db(request: Request, schema: str) -> None:
+    replace_db(request, lambda conn: conn.executescript(schema))
+
+
+def load_snapshot_into_db(
+    request: Request,
+    chain: Sequence[Path],
+    lineage: Lineage | None,
+) -> None:
+    replace_db(request, partial(restore_chain, chain), base=lineage)
+
+
+def replace_db(
+    request: Request,
+    fill: Callable[[Connection], object],
+    base: Lineage | None = None,
+) -> None:
+    """Replace the database with a new one built by `fill`, without downtime.
+
+    The new database is built and migrated in a temporary file next to the
+    pool's database while requests keep using the current one; `fill` gets a plain
+    connection on the empty file. The pool then swaps the files: it waits for
+    in-flight requests, renames the new file over the old one and reopens its
+    connections, while new requests wait for the swap instead of failing.
+
+    The new database starts an empty change log based on `base`, the lineage
+    of the snapshot it was filled from. Subscribers get a `board.replaced`
+    event, ahead of any write to the new database.
+    """
+    board = request_board(request)
+    db_path = board.pool.path
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{db_path.name}.", dir=db_path.parent)
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            fill(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = board.pool.connect(tmp_path)
+        try:
+            migrate(conn.cursor())
+            reset_change_log(conn.cursor(), base)
+            conn.commit()
+        finally:
+            conn.close()
 
+        def swap_in() -> int:
+            # nothing can write anymore, so the current version is final
+            conn = sqlite3.connect(db_path)
+            try:
+                current_version = fetch_board_version(conn.cursor())
+            finally:
+                conn.close()
 
-def load_schema_into_db(request: Request, db_path: Path, schema: str) -> None:
-    request.app.state.cur.close()
-    request.app.state.conn.close()
+            conn = sqlite3.connect(tmp_path)
+            try:
+                # the new board must not reuse a version clients may have seen
+                version = bump_board_version(conn.cursor(), at_least=current_version)
+                conn.commit()
+            finally:
+                conn.close()
 
-    db_path.unlink(missing_ok=True)
+            for suffix in ("-wal", "-shm", "-journal"):
+                Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+            tmp_path.replace(db_path)
+            board.events.publish(
+                version, BoardEvent("board.replaced", {"version": version})
+            )
+            return version
 
-    conn = init_conn(db_path)
-    cur = conn.cursor()
-    cur = init_schema(cur, schema)
+        version = board.pool.swap(swap_in)
+    finally:
+        remove_db_files(tmp_path)
 
-    request.app.state.conn = conn
-    request.app.state.cur = cur
+    board.cache.update(version)
 
 
-def init_conn(path: Path) -> Connection:
-    conn = sqlite3.connect(path, check_same_thread=False)
+def init_conn(
+    path: Path,
+    profile: StorageProfile = DEFAULT_STORAGE_PROFILE,
+    trace: Callable[[str], None] | None = None,
+) -> Connection:
+    conn = sqlite3.connect(
+        path, check_same_thread=False, cached_statements=profile.cached_statements
+    )
     conn.row_factory = sqlite3.Row
+    profile.apply(conn)
+    # set after the pragmas, so only statements run for requests are traced
+    if trace is not None:
+        conn.set_trace_callback(trace)
     return conn
 
 
 def init_schema(cur: Cursor, schema: str) -> Cursor:
-    """Initialize the database schema and return a cursor."""
+    """Initialize the database schema, migrate it and return a cursor."""
     cur.executescript(schema)
     cur.connection.commit()
+    migrate(cur)
     return cur
@@ -1,48 +1,109 @@
+import csv
+import io
 import logging
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
 import sqlite3
+from sqlite3 import Cursor
+from collections.abc import Iterator
+from typing import Annotated, Literal
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import to_json
 from starlette.status import (
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
     HTTP_409_CONFLICT,
+    HTTP_422_UNPROCESSABLE_CONTENT,
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+from src.boards import DEFAULT_MAX_OPEN_BOARDS, Board, BoardExists, Boards
 from src.dev_utils import DB_SNAPSHOTS_PATH, router
+from src.cache import BoardCache, if_match_versions, make_etag
+from src.events import BoardEvent, BoardEvents
+from src.executor import (
+    DEFAULT_MAX_BATCH,
+    DatabaseExecutor,
+    GroupCommit,
+    QueueStats,
+    WorkQueue,
+)
 from src.helpers import (
-    CursorDep,
+    StorageProfile,
+    JSONBytesResponse,
+    cached_board_read,
     init_schema,
+    run_read,
+    stream_read,
     init_conn,
+    load_cached_board,
     load_schema_into_db,
+    open_pool,
+    request_board,
+    run_write,
+    use_board,
+)
+from src.metrics import (
+    PROMETHEUS_MEDIA_TYPE,
+    Metrics,
+    MetricsMiddleware,
+    trace_statement,
 )
+from src.pool import DEFAULT_POOL_SIZE, DEFAULT_POOL_TIMEOUT
 from src.repository import (
+    InvalidStageOrder,
     MultipleRowsUpdated,
     NoFieldsToUpdate,
+    StagesNotFound,
+    TasksNotFound,
+    TaskKey,
+    VersionConflict,
     delete_task_by_id,
-    fetch_all_tasks,
-    fetch_stages_with_tasks,
+    ensure_stages_exist,
+    ensure_version,
+    fetch_all_tasks_json,
+    fetch_board_summary_json,
+    fetch_board_version,
+    fetch_moved_tasks,
+    fetch_stage_tasks_page,
+    fetch_stages_with_tasks_json,
     fetch_task_by_id,
     insert_stage,
+    iter_all_tasks,
     insert_task,
+    insert_tasks,
+    move_tasks,
     patch_task,
+    search_tasks,
+    set_stage_order,
     DEFAULT_SCHEMA,
     update_task_ordering,
 )
 from src.schemas import (
+    BoardCreate,
+    BoardDelta,
+    BoardPublic,
     StageCreate,
     StageDetail,
+    StageOrderUpdate,
+    StageSummary,
+    TaskBulkMove,
     TaskCreate,
+    TaskMatches,
     TaskMoveUpdate,
     TaskNameUpdate,
+    TaskPage,
     TaskPublic,
+    TasksCreated,
 )
 
 logging.basicConfig()
@@ -51,118 +112,542 @@ load_dotenv()
 _db_path = os.getenv("SQLITE_DATABASE_PATH")
 assert _db_path is not None
 DB_PATH = Path(_db_path)
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", DEFAULT_POOL_SIZE))
+POOL_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT))
+WRITE_WINDOW = float(os.getenv("SQLITE_WRITE_WINDOW_MS", "0")) / 1000
+MAX_WRITE_BATCH = int(os.getenv("SQLITE_MAX_WRITE_BATCH", DEFAULT_MAX_BATCH))
+STORAGE_PROFILE = StorageProfile.from_env()
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+_profiles_path = os.getenv("PROFILES_PATH")
+PROFILES_PATH = Path(_profiles_path) if _profiles_path else None
+BOARDS_PATH = Path(os.getenv("BOARDS_PATH", "./boards"))
+MAX_OPEN_BOARDS = int(os.getenv("MAX_OPEN_BOARDS", DEFAULT_MAX_OPEN_BOARDS))
+TRACE = trace_statement if METRICS_ENABLED else None
+
+
+def prepare_db(db_path: Path) -> int:
+    """Create or migrate the database at `db_path`, return its board version."""
+    conn = init_conn(db_path, STORAGE_PROFILE)
+    try:
+        return fetch_board_version(init_schema(conn.cursor(), DEFAULT_SCHEMA))
+    finally:
+        conn.close()
+
+
+def open_board(db_path: Path) -> Board:
+    """Open a board other than the default one, with its own write thread."""
+    version = prepare_db(db_path)
+    pool = open_pool(db_path, POOL_SIZE, POOL_TIMEOUT, STORAGE_PROFILE, trace=TRACE)
+    commits = GroupCommit(WorkQueue("db-write", 1), WRITE_WINDOW, MAX_WRITE_BATCH)
+    return Board(pool, commits, BoardCache(), BoardEvents(version))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    conn = init_conn(DB_PATH)
-    cur = conn.cursor()
-    cur = init_schema(cur, DEFAULT_SCHEMA)
+    version = prepare_db(DB_PATH)
 
-    app.state.conn = conn
-    app.state.cur = cur
+    app.state.pool = open_pool(
+        DB_PATH, POOL_SIZE, POOL_TIMEOUT, STORAGE_PROFILE, trace=TRACE
+    )
+    app.state.db_executor = DatabaseExecutor(POOL_SIZE, WRITE_WINDOW, MAX_WRITE_BATCH)
+    app.state.board_cache = BoardCache()
+    app.state.board_events = BoardEvents(version)
+    app.state.boards = Boards(BOARDS_PATH, open_board, MAX_OPEN_BOARDS)
+    app.state.metrics = Metrics(PROFILES_PATH) if METRICS_ENABLED else None
 
     yield
 
-    cur.close()
-    conn.close()
+    app.state.boards.close()
+    app.state.board_events.close()
+    app.state.db_executor.shutdown()
+    app.state.pool.close()
 
 
 app = FastAPI(title="BuildIt! Backend", lifespan=lifespan)
 
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # the frontend reads the board version from the ETag
+    expose_headers=["ETag"],
 )
 
-app.include_router(router)
+# the routes of a board, served for the default board and under /boards/{id}
+board_router = APIRouter()
 
 
 @app.get("/")
-def hello_world():
+async def hello_world():
     return {"hello": "world"}
 
 
-@app.get("/tasks", response_model=list[StageDetail])
-def get_all_tasks(cur: CursorDep):
-    return fetch_all_tasks(cur)
+@app.get("/executor/stats", response_model=dict[str, QueueStats])
+async def get_executor_stats(request: Request):
+    """Queue depth and throughput of the database write and read threads."""
+    return request.app.state.db_executor.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request):
+    """Request and database metrics in Prometheus text format."""
+    metrics: Metrics | None = request.app.state.metrics
+    if metrics is None:
+        raise HTTPException(HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(
+        metrics.render(request.app.state.db_executor.stats()),
+        media_type=PROMETHEUS_MEDIA_TYPE,
+    )
+
+
+@board_router.get("/events")
+async def get_board_events(
+    request: Request,
+    since: int | None = None,
+    last_event_id: Annotated[int | None, Header()] = None,
+):
+    """Stream board changes as Server-Sent Events, with versions as ids.
+
+    Resumes after `Last-Event-ID`, which browsers send when reconnecting, or
+    else after `since`, the version of the board the client loaded.
+    """
+    events = request_board(request).events
+    return StreamingResponse(
+        events.subscribe(last_event_id if last_event_id is not None else since),
+        media_type="text/event-stream",
+        # keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@board_router.get("/tasks", response_model=list[TaskPublic])
+async def get_all_tasks(request: Request):
+    return await cached_board_read(request, "tasks", fetch_all_tasks_json)
+
+
+@board_router.post("/tasks", status_code=HTTP_201_CREATED, response_model=TaskPublic)
+async def create_task(request: Request, newTask: TaskCreate):
+    return await run_write(
+        request,
+        lambda cur: insert_task(cur, newTask),
+        lambda task: BoardEvent("task.created", task),
+    )
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+EXPORT_CHUNK_SIZE = 1_000
+EXPORT_COLUMNS = list(TaskPublic.model_fields)
+
+
+def export_ndjson(cur: Cursor) -> Iterator[bytes]:
+    for tasks in iter_all_tasks(cur, EXPORT_CHUNK_SIZE):
+        yield b"".join(to_json(task) + b"\n" for task in tasks)
+
+
+def export_csv(cur: Cursor) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for tasks in iter_all_tasks(cur, EXPORT_CHUNK_SIZE):
+        writer.writerows(tasks)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+EXPORTS = {
+    "ndjson": (export_ndjson, NDJSON_MEDIA_TYPE),
+    "csv": (export_csv, "text/csv"),
+}
+
+
+@board_router.get("/tasks/export")
+async def export_tasks(request: Request, format: Literal["ndjson", "csv"] = "ndjson"):
+    """Stream every task as NDJSON or CSV, in board order.
+
+    Tasks are read and encoded a chunk at a time while the client downloads
+    them, so memory use does not grow with the board.
+    """
+    export, media_type = EXPORTS[format]
+    return await stream_read(
+        request,
+        export,
+        media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )
+
+
+TASKS_ADAPTER = TypeAdapter(list[TaskCreate])
+
+
+async def parse_bulk_tasks(request: Request) -> list[TaskCreate]:
+    """Parse a JSON array or an NDJSON stream of `TaskCreate` objects."""
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(NDJSON_MEDIA_TYPE):
+        try:
+            return TASKS_ADAPTER.validate_json(await request.body())
+        except ValidationError as e:
+            raise body_validation_error(e)
+
+    tasks: list[TaskCreate] = []
+    line_number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                tasks.append(parse_ndjson_task(line, line_number))
+    if buffer.strip():
+        tasks.append(parse_ndjson_task(buffer, line_number + 1))
+    return tasks
+
+
+def parse_ndjson_task(line: bytes, line_number: int) -> TaskCreate:
+    try:
+        return TaskCreate.model_validate_json(line)
+    except ValidationError as e:
+        raise body_validation_error(e, line_number)
 
 
-@app.post("/tasks", status_code=HTTP_201_CREATED, response_model=TaskPublic)
-def create_task(cur: CursorDep, newTask: TaskCreate):
-    new_task = insert_task(cur, newTask)
-    cur.connection.commit()
-    return new_task
+def body_validation_error(
+    e: ValidationError, *loc: int | str
+) -> RequestValidationError:
+    return RequestValidationError(
+        [
+            {**error, "loc": ("body", *loc, *error["loc"])}
+            for error in e.errors(include_url=False)
+        ]
+    )
+
+
+@board_router.post(
+    "/tasks/bulk", status_code=HTTP_201_CREATED, response_model=TasksCreated
+)
+async def create_tasks_bulk(
+    request: Request,
+    # parsed before the write is queued, so slow uploads do not block writes
+    tasks: Annotated[list[TaskCreate], Depends(parse_bulk_tasks)],
+):
+    """Create many tasks in one transaction from a JSON array or NDJSON."""
+    return TasksCreated(
+        ids=await run_write(
+            request,
+            lambda cur: insert_tasks(cur, tasks),
+            lambda ids: BoardEvent("tasks.created", {"ids": ids}),
+        )
+    )
 
 
 # FIXME: do this better
 def update_task_or_fail(
-    cur: CursorDep,
+    cur: Cursor,
     task_id: int,
-    task: TaskMoveUpdate | TaskNameUpdate,
+    task: TaskNameUpdate,
+    versions: set[int] | None = None,
 ) -> TaskPublic:
-    """Patch a task and commit, handling exceptions."""
+    """Patch a task, handling exceptions."""
     try:
-        updated_task = patch_task(cur, task_id, task)
+        updated_task = patch_task(cur, task_id, task, versions)
     except NoFieldsToUpdate as e:
         raise HTTPException(HTTP_400_BAD_REQUEST, detail=str(e))
+    except TasksNotFound as e:
+        raise HTTPException(HTTP_404_NOT_FOUND, detail=str(e))
+    except VersionConflict as e:
+        raise version_conflict(e)
     except MultipleRowsUpdated as e:
         raise HTTPException(HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     return updated_task
 
 
-@app.patch("/tasks/{task_id}/move", response_model=list[StageDetail])
-def update_task_move(cur: CursorDep, task_id: int, moved_task: TaskMoveUpdate):
-    old_task = fetch_task_by_id(cur, task_id)
-    if not old_task:
+def version_conflict(e: VersionConflict) -> HTTPException:
+    """A 409 for a stale `If-Match`, with the current version as the ETag."""
+    return HTTPException(
+        HTTP_409_CONFLICT, detail=str(e), headers={"ETag": make_etag(e.version)}
+    )
+
+
+@board_router.patch(
+    "/tasks/{task_id}/move",
+    response_model=list[StageDetail] | BoardDelta,
+)
+async def update_task_move(
+    request: Request,
+    task_id: int,
+    moved_task: TaskMoveUpdate,
+    response: Literal["full", "delta"] = "full",
+    if_match: Annotated[str | None, Header()] = None,
+):
+    """Move a task, answering with the whole board or only the changed tasks."""
+    versions = if_match_versions(if_match)
+
+    def move(cur: Cursor):
+        old_task = fetch_task_by_id(cur, task_id)
+        if not old_task:
+            raise HTTPException(
+                HTTP_404_NOT_FOUND, detail=f"Task with id {task_id} not Found"
+            )
+        try:
+            ensure_version("Task", task_id, old_task.version, versions)
+        except VersionConflict as e:
+            raise version_conflict(e)
+
+        new_task = update_task_ordering(cur, old_task, moved_task)
+        return board_delta(cur, fetch_moved_tasks(cur, old_task, new_task))
+
+    delta = await run_write(request, move, tasks_moved_event)
+    return delta if response == "delta" else await full_board_response(request)
+
+
+def board_delta(cur: Cursor, moved: list[TaskPublic]) -> BoardDelta:
+    return BoardDelta(version=fetch_board_version(cur), tasks=moved)
+
+
+def tasks_moved_event(delta: BoardDelta) -> BoardEvent:
+    return BoardEvent("tasks.moved", delta)
+
+
+async def full_board_response(request: Request) -> JSONBytesResponse:
+    # loaded after the commit through the cache, off the writer, and reused
+    # by the board reads that follow
+    _, board = await load_cached_board(request, "stages", fetch_stages_with_tasks_json)
+    return JSONBytesResponse(board)
+
+
+# registered before PATCH /tasks/{task_id}, which would match "move" first
+@board_router.patch("/tasks/move", response_model=list[StageDetail] | BoardDelta)
+async def update_tasks_move(
+    request: Request,
+    moves: list[TaskBulkMove],
+    response: Literal["full", "delta"] = "full",
+):
+    """Apply several moves in one transaction, in the given order."""
+
+    def move(cur: Cursor):
+        try:
+            moved = move_tasks(cur, moves)
+        except (TasksNotFound, StagesNotFound) as e:
+            raise HTTPException(HTTP_404_NOT_FOUND, detail=str(e))
+        return board_delta(cur, moved)
+
+    delta = await run_write(request, move, tasks_moved_event)
+    return delta if response == "delta" else await full_board_response(request)
+
+
+@board_router.patch("/tasks/{task_id}", response_model=TaskPublic)
+async def update_task(
+    request: Request,
+    task_id: int,
+    renamed_task: TaskNameUpdate,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    versions = if_match_versions(if_match)
+    return await run_write(
+        request,
+        lambda cur: update_task_or_fail(cur, task_id, renamed_task, versions),
+        lambda task: BoardEvent("task.updated", task),
+    )
+
+
+@board_router.get("/stages/tasks", response_model=list[StageDetail])
+async def get_stages_with_tasks(request: Request):
+    return await cached_board_read(request, "stages", fetch_stages_with_tasks_json)
+
+
+@board_router.get("/stages/summary", response_model=list[StageSummary])
+async def get_board_summary(request: Request):
+    """Every stage with its number of tasks, without the tasks themselves."""
+    return await cached_board_read(request, "summary", fetch_board_summary_json)
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1_000
+
+
+def encode_cursor(key: TaskKey) -> str:
+    return "{}:{}".format(*key)
+
+
+def decode_cursor(cursor: str) -> TaskKey:
+    try:
+        position, task_id = cursor.split(":")
+        return int(position), int(task_id)
+    except ValueError:
         raise HTTPException(
-            HTTP_404_NOT_FOUND, detail=f"Task with id {task_id} not Found"
+            HTTP_422_UNPROCESSABLE_CONTENT, detail=f"Invalid cursor {cursor!r}"
         )
 
-    update_task_ordering(cur, old_task, moved_task)
-    update_task_or_fail(cur, task_id, moved_task)
-    cur.connection.commit()
 
-    return fetch_stages_with_tasks(cur, sorted=True)
+@board_router.get("/stages/{stage_id}/tasks", response_model=TaskPage)
+async def get_stage_tasks(
+    request: Request,
+    stage_id: int,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+):
+    """A page of a stage's tasks in board order, for boards too large to load.
+
+    Pass the `next` cursor of a page as `after` to get the page following
+    it. Cursors stay valid while tasks are added, moved or deleted.
+    """
+    key = decode_cursor(after) if after is not None else None
 
+    def read(cur: Cursor) -> TaskPage:
+        try:
+            ensure_stages_exist(cur, [stage_id])
+        except StagesNotFound as e:
+            raise HTTPException(HTTP_404_NOT_FOUND, detail=str(e))
+        tasks, next_key = fetch_stage_tasks_page(cur, stage_id, key, limit)
+        return TaskPage(tasks=tasks, next=encode_cursor(next_key) if next_key else None)
 
-@app.patch("/tasks/{task_id}", response_model=TaskPublic)
-def update_task(cur: CursorDep, task_id: int, renamed_task: TaskNameUpdate):
-    return update_task_or_fail(cur, task_id, renamed_task)
+    return await run_read(request, read)
 
 
-@app.get("/stages/tasks", response_model=list[StageDetail])
-def get_stages_with_tasks(cur: CursorDep):
-    return fetch_stages_with_tasks(cur, sorted=True)
+DEFAULT_SEARCH_RESULTS = 20
 
 
-@app.post("/reset")
+def decode_offset(cursor: str) -> int:
+    if not cursor.isdigit():
+        raise HTTPException(
+            HTTP_422_UNPROCESSABLE_CONTENT, detail=f"Invalid cursor {cursor!r}"
+        )
+    return int(cursor)
+
+
+@board_router.get("/tasks/search", response_model=TaskMatches)
+async def search_tasks_by_name(
+    request: Request,
+    q: Annotated[str, Query(min_length=1)],
+    stage_id: int | None = None,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_SEARCH_RESULTS,
+):
+    """Tasks whose name has every word of `q`, best matches first.
+
+    Words match as prefixes, so results can be shown while typing. Pass the
+    `next` cursor of a page as `after` to get the page following it.
+    """
+    offset = decode_offset(after) if after is not None else 0
+
+    def read(cur: Cursor) -> TaskMatches:
+        if stage_id is not None:
+            try:
+                ensure_stages_exist(cur, [stage_id])
+            except StagesNotFound as e:
+                raise HTTPException(HTTP_404_NOT_FOUND, detail=str(e))
+        tasks, next_offset = search_tasks(cur, q, stage_id, limit, offset)
+        return TaskMatches(
+            tasks=tasks, next=str(next_offset) if next_offset is not None else None
+        )
+
+    return await run_read(request, read)
+
+
+@board_router.put(
+    "/stages/{stage_id}/order",
+    response_model=list[StageDetail] | BoardDelta,
+)
+async def update_stage_order(
+    request: Request,
+    stage_id: int,
+    order: StageOrderUpdate,
+    response: Literal["full", "delta"] = "full",
+    if_match: Annotated[str | None, Header()] = None,
+):
+    """Replace the order of a stage, moving in tasks from other stages."""
+    versions = if_match_versions(if_match)
+
+    def reorder(cur: Cursor):
+        try:
+            moved = set_stage_order(cur, stage_id, order.task_ids, versions)
+        except (TasksNotFound, StagesNotFound) as e:
+            raise HTTPException(HTTP_404_NOT_FOUND, detail=str(e))
+        except VersionConflict as e:
+            raise version_conflict(e)
+        except InvalidStageOrder as e:
+            raise HTTPException(HTTP_422_UNPROCESSABLE_CONTENT, detail=str(e))
+        return board_delta(cur, moved)
+
+    delta = await run_write(request, reorder, tasks_moved_event)
+    return delta if response == "delta" else await full_board_response(request)
+
+
+# replaces the database file, so it stays on the server's threadpool
+@board_router.post("/reset")
 def reset_db(request: Request):
     current = DB_SNAPSHOTS_PATH / "current.sql"
     snapshot = current.read_text() if current.exists() else DEFAULT_SCHEMA
 
-    load_schema_into_db(request, DB_PATH, snapshot)
-    return {"message": f"Successfully reset db {DB_PATH}"}
+    load_schema_into_db(request, snapshot)
+    return {"message": f"Successfully reset db {request_board(request).pool.path}"}
 
 
-@app.delete("/tasks/{task_id}", status_code=HTTP_204_NO_CONTENT)
-def delete_task(cur: CursorDep, task_id: int):
-    rowcount = delete_task_by_id(cur, task_id)
+@board_router.delete("/tasks/{task_id}", status_code=HTTP_204_NO_CONTENT)
+async def delete_task(
+    request: Request,
+    task_id: int,
+    if_match: Annotated[str | None, Header()] = None,
+):
+    versions = if_match_versions(if_match)
+
+    def delete(cur: Cursor) -> int:
+        try:
+            return delete_task_by_id(cur, task_id, versions)
+        except VersionConflict as e:
+            raise version_conflict(e)
+
+    rowcount = await run_write(
+        request,
+        delete,
+        lambda rowcount: (
+            BoardEvent("task.deleted", {"id": task_id}) if rowcount else None
+        ),
+    )
     if rowcount == 0:
         raise HTTPException(HTTP_404_NOT_FOUND, detail="Task not found")
 
     assert rowcount == 1, "Noway4u_sir"
 
 
-@app.post("/stages", status_code=HTTP_201_CREATED)
-def create_stage(cur: CursorDep, stage: StageCreate):
+@board_router.post("/stages", status_code=HTTP_201_CREATED)
+async def create_stage(request: Request, stage: StageCreate):
     try:
-        created_stage = insert_stage(cur, stage)
+        return await run_write(
+            request,
+            lambda cur: StageDetail(**insert_stage(cur, stage).model_dump(), tasks=[]),
+            lambda created: BoardEvent("stage.created", created),
+        )
     except sqlite3.IntegrityError:
         logging.exception("stage name must be unique")
         raise HTTPException(HTTP_409_CONFLICT, detail="Stage name must be unique")
-    cur.connection.commit()
-    return StageDetail(**created_stage.model_dump(), tasks=[])
+
+
+@app.get("/boards", response_model=list[BoardPublic])
+async def get_boards(request: Request):
+    """Every board besides the default one, and whether it is open."""
+    boards: Boards = request.app.state.boards
+    return [
+        BoardPublic(id=board_id, open=boards.is_open(board_id))
+        for board_id in boards.ids()
+    ]
+
+
+@app.post("/boards", status_code=HTTP_201_CREATED, response_model=BoardPublic)
+async def create_board(request: Request, board: BoardCreate):
+    boards: Boards = request.app.state.boards
+    try:
+        boards.create(board.id)
+    except BoardExists as e:
+        raise HTTPException(HTTP_409_CONFLICT, detail=str(e))
+    return BoardPublic(id=board.id, open=False)
+
+
+# included last, so every route of the routers is in place
+for routes in (board_router, router):
+    app.include_router(routes)
+    app.include_router(
+        routes, prefix="/boards/{board_id}", dependencies=[Depends(use_board)]
+    )
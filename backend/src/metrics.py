@@ -0,0 +1,300 @@
+"""Request metrics in Prometheus text format, and opt-in request profiles.
+
+`MetricsMiddleware` times every request by route and attributes the database
+work done for it: statements are counted by a trace callback on every pooled
+connection, rows written from the writer's `total_changes`, and lock waits
+from the time it took to check out a reader; writes share the writer of
+their batch and wait for it in the write queue instead. The counters of the
+request in progress live in a context variable, which the database threads
+see since `WorkQueue` and `GroupCommit` run every call in its caller's
+context.
+
+With metrics disabled, connections get no trace callback and the middleware
+passes requests straight through, so the cost is a context variable lookup
+per connection checkout.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from sqlite3 import Cursor
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.executor import QueueStats
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+PROFILE_HEADER = b"x-profile"
+
+
+class RequestStats:
+    """Database work done for one request, filled in from any thread."""
+
+    __slots__ = ("lock_wait", "rows_written", "statements")
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.rows_written = 0
+        self.lock_wait = 0.0
+
+
+CURRENT_REQUEST: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+def trace_statement(sql: str) -> None:
+    """Trace callback counting the statements run for the current request."""
+    stats = CURRENT_REQUEST.get()
+    # statements run by triggers are traced as `-- TRIGGER name` comments
+    if stats is not None and not sql.startswith("--"):
+        stats.statements += 1
+
+
+@contextmanager
+def checkout(
+    connection: AbstractContextManager[Cursor],
+) -> Iterator[Cursor]:
+    """Enter a pool checkout like `pool.read()` and record the work done in it."""
+    stats = CURRENT_REQUEST.get()
+    if stats is None:
+        with connection as cur:
+            yield cur
+        return
+
+    started = time.perf_counter()
+    with connection as cur:
+        stats.lock_wait += time.perf_counter() - started
+        changes = cur.connection.total_changes
+        try:
+            yield cur
+        finally:
+            stats.rows_written += cur.connection.total_changes - changes
+
+
+@dataclass
+class EndpointMetrics:
+    buckets: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    count: int = 0
+    seconds: float = 0.0
+    statuses: dict[int, int] = field(default_factory=dict)
+    statements: int = 0
+    rows_written: int = 0
+    lock_wait: float = 0.0
+
+    def observe(self, seconds: float, status: int, stats: RequestStats) -> None:
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.seconds += seconds
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.statements += stats.statements
+        self.rows_written += stats.rows_written
+        self.lock_wait += stats.lock_wait
+
+
+class Metrics:
+    """Per-endpoint request metrics, updated and rendered on the event loop.
+
+    With `profiles_path`, a request sent with an `X-Profile` header is run
+    under cProfile and its profile written there, named in the `X-Profile`
+    response header. Profiles cover the whole process, so they include the
+    database threads, and also any other request served meanwhile. One
+    request is profiled at a time, the header is ignored while another one is.
+    """
+
+    def __init__(self, profiles_path: Path | None = None) -> None:
+        self.profiles_path = profiles_path
+        self.endpoints: dict[tuple[str, str], EndpointMetrics] = {}
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        seconds: float,
+        status: int,
+        stats: RequestStats,
+    ) -> None:
+        endpoint = self.endpoints.get((method, route))
+        if endpoint is None:
+            endpoint = self.endpoints[(method, route)] = EndpointMetrics()
+        endpoint.observe(seconds, status, stats)
+
+    def render(self, queues: dict[str, QueueStats]) -> str:
+        """Render the metrics and the database queue stats as Prometheus text."""
+        lines: list[str] = []
+        endpoints = sorted(self.endpoints.items())
+
+        header(
+            lines,
+            "http_request_duration_seconds",
+            "histogram",
+            "Time to serve a request, until its last byte was sent.",
+        )
+        for (method, route), endpoint in endpoints:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, endpoint.buckets):
+                cumulative += count
+                labels = {"method": method, "route": route, "le": str(bound)}
+                sample(
+                    lines, "http_request_duration_seconds_bucket", labels, cumulative
+                )
+            labels = {"method": method, "route": route, "le": "+Inf"}
+            sample(
+                lines, "http_request_duration_seconds_bucket", labels, endpoint.count
+            )
+            labels = {"method": method, "route": route}
+            sample(lines, "http_request_duration_seconds_sum", labels, endpoint.seconds)
+            sample(lines, "http_request_duration_seconds_count", labels, endpoint.count)
+
+        header(lines, "http_responses_total", "counter", "Responses by status code.")
+        for (method, route), endpoint in endpoints:
+            for status, count in sorted(endpoint.statuses.items()):
+                labels = {"method": method, "route": route, "status": str(status)}
+                sample(lines, "http_responses_total", labels, count)
+
+        for name, attribute, help in ENDPOINT_COUNTERS:
+            header(lines, name, "counter", help)
+            for (method, route), endpoint in endpoints:
+                labels = {"method": method, "route": route}
+                sample(lines, name, labels, getattr(endpoint, attribute))
+
+        for name, key, kind, help in QUEUE_METRICS:
+            header(lines, name, kind, help)
+            for queue, stats in sorted(queues.items()):
+                sample(lines, name, {"queue": queue}, stats[key])
+
+        return "\n".join(lines) + "\n"
+
+
+ENDPOINT_COUNTERS = [
+    ("db_statements_total", "statements", "SQL statements run, without triggers."),
+    (
+        "db_rows_written_total",
+        "rows_written",
+        "Rows inserted, updated or deleted, also by triggers.",
+    ),
+    (
+        "db_lock_wait_seconds_total",
+        "lock_wait",
+        "Time spent waiting for a reader connection.",
+    ),
+]
+QUEUE_METRICS: list[tuple[str, Any, str, str]] = [
+    ("db_queue_workers", "workers", "gauge", "Threads of the queue."),
+    ("db_queue_depth", "queued", "gauge", "Calls waiting for a thread."),
+    ("db_queue_running", "running", "gauge", "Calls running on a thread."),
+    ("db_queue_completed_total", "completed", "counter", "Calls completed."),
+    (
+        "db_queue_wait_seconds_total",
+        "wait_seconds_total",
+        "counter",
+        "Time calls spent waiting for a thread.",
+    ),
+]
+
+
+def header(lines: list[str], name: str, kind: str, help: str) -> None:
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def sample(lines: list[str], name: str, labels: dict[str, str], value: float) -> None:
+    rendered = ",".join(f'{key}="{escape(label)}"' for key, label in labels.items())
+    lines.append(f"{name}{{{rendered}}} {value}")
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsMiddleware:
+    """Record the metrics of every HTTP request in `app.state.metrics`.
+
+    Does nothing when `app.state.metrics` is not set. Requests are labelled
+    by route template, so ids in paths do not add series; requests matching
+    no route are labelled `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        metrics: Metrics | None = (
+            getattr(scope["app"].state, "metrics", None)
+            if scope["type"] == "http"
+            else None
+        )
+        if metrics is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        profile: cProfile.Profile | None = None
+        profile_name = None
+        if metrics.profiles_path is not None and has_header(
+            scope["headers"], PROFILE_HEADER
+        ):
+            profile, profile_name = start_profile(scope)
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_name is not None:
+                    headers = message.setdefault("headers", [])
+                    headers.append((PROFILE_HEADER, profile_name.encode()))
+            await send(message)
+
+        stats = RequestStats()
+        token = CURRENT_REQUEST.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            CURRENT_REQUEST.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.observe(scope["method"], route, seconds, status, stats)
+            if profile is not None and profile_name is not None:
+                assert metrics.profiles_path is not None
+                profile.disable()
+                profile.dump_stats(metrics.profiles_path / profile_name)
+
+
+def has_header(headers: Iterable[tuple[bytes, bytes]], name: bytes) -> bool:
+    return any(key == name for key, _ in headers)
+
+
+def start_profile(scope: Scope) -> tuple[cProfile.Profile | None, str | None]:
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return None, None  # another request is being profiled
+    path = scope["path"].strip("/").replace("/", "_") or "root"
+    return profile, f"{time.time_ns()}-{scope['method']}-{path}.prof"
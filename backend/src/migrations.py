@@ -0,0 +1,191 @@
+"""Versioned schema migrations driven by `PRAGMA user_version`.
+
+`DEFAULT_SCHEMA` is version 0. Every entry in `MIGRATIONS` upgrades the
+schema by one version, `migrate` applies the missing ones in order, each in
+its own transaction. Migrations must be idempotent: `.sql` snapshots replayed
+through `init_schema` already contain the migrated tables but come back with
+`user_version = 0`.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from sqlite3 import Cursor
+
+Migration = Callable[[Cursor], None]
+
+
+def add_task_stage_position_index(cur: Cursor) -> None:
+    # covers MAX(position) per stage, neighbour lookups on moves and rebalancing
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS task_stage_position ON task (stage_id, position)"
+    )
+
+
+def add_board_version(cur: Cursor) -> None:
+    # single row counter bumped by every write, used to version responses
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS board_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        """
+    )
+    cur.execute("INSERT OR IGNORE INTO board_version (id, version) VALUES (1, 0)")
+
+
+CHANGE_LOG_TABLES = ("stage", "task")
+TASK_SEARCH = "task_search"
+
+
+def add_change_log(cur: Cursor) -> None:
+    # ids of rows written since the last restore, for differential snapshots;
+    # a row written again is replaced with a new seq, so the log stays bounded
+    # by the number of rows rather than growing with every write
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            UNIQUE (tbl, row_id)
+        )
+        """
+    )
+    # a new generation starts whenever the database is replaced; the base is
+    # the lineage of the snapshot it was restored from and the log seq then
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation TEXT NOT NULL,
+            base_generation TEXT,
+            base_seq INTEGER,
+            base_log_seq INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cur.execute(
+        "INSERT OR IGNORE INTO change_log_state (id, generation) "
+        "VALUES (1, lower(hex(randomblob(16))))"
+    )
+    for table in CHANGE_LOG_TABLES:
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            cur.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_log_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT OR REPLACE INTO change_log (tbl, row_id)
+                    VALUES ('{table}', {row}.id);
+                END
+                """
+            )
+
+
+def add_task_search(cur: Cursor) -> None:
+    # full-text index of task names; with external content the names are not
+    # stored twice but read from `task` by rowid. Prefix indexes make 2 and 3
+    # character prefixes as cheap to look up as whole terms.
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS task_search USING fts5(
+            name,
+            content = 'task',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """
+    )
+    # an external content index has to be told the old name to forget it
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS task_search_insert AFTER INSERT ON task
+        BEGIN
+            INSERT INTO task_search (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS task_search_delete AFTER DELETE ON task
+        BEGIN
+            INSERT INTO task_search (task_search, rowid, name)
+            VALUES ('delete', OLD.id, OLD.name);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS task_search_update AFTER UPDATE OF name ON task
+        BEGIN
+            INSERT INTO task_search (task_search, rowid, name)
+            VALUES ('delete', OLD.id, OLD.name);
+            INSERT INTO task_search (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+        """
+    )
+    rebuild_task_search(cur)
+
+
+def rebuild_task_search(cur: Cursor) -> None:
+    """Index the names of all tasks from scratch.
+
+    Needed after writes that bypass the triggers, like the deletes of
+    `INSERT OR REPLACE`.
+    """
+    cur.execute(f"INSERT INTO {TASK_SEARCH} ({TASK_SEARCH}) VALUES ('rebuild')")
+
+
+VERSIONED_TABLES = ("stage", "task")
+
+
+def add_row_versions(cur: Cursor) -> None:
+    # a counter per row for optimistic concurrency, incremented by the
+    # repository with every write to the row (see `VersionConflict`)
+    for table in VERSIONED_TABLES:
+        columns = {row[1] for row in cur.execute(f"PRAGMA table_info({table})")}
+        if "version" not in columns:
+            cur.execute(
+                f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+            )
+
+
+MIGRATIONS: list[Migration] = [
+    add_task_stage_position_index,
+    add_board_version,
+    add_change_log,
+    add_task_search,
+    add_row_versions,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(cur: Cursor) -> int:
+    return cur.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(cur: Cursor) -> int:
+    """Apply all pending migrations and return the resulting schema version."""
+    version = get_schema_version(cur)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"database schema version {version} is newer than {SCHEMA_VERSION}"
+        )
+
+    conn = cur.connection
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logging.info("migrating database schema to version %d", target)
+        try:
+            cur.execute("BEGIN")
+            migration(cur)
+            cur.execute(f"PRAGMA user_version = {target:d}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return SCHEMA_VERSION
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import queue
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from sqlite3 import Connection, Cursor
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_POOL_TIMEOUT = 5.0
+
+
+class PoolTimeout(TimeoutError):
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        super().__init__(f"No database connection available after {timeout}s")
+
+
+class PoolClosed(RuntimeError):
+    def __init__(self):
+        super().__init__("Connection pool is closed")
+
+
+class ConnectionPool:
+    """A bounded pool of read connections plus a single serialized writer.
+
+    Every caller gets its own cursor and its own transaction. Reads run on one
+    of `size` reader connections inside a read transaction, writes are
+    serialized on the writer connection and committed (or rolled back) when
+    the `write` block exits. Waiting longer than `timeout` seconds for a
+    connection raises `PoolTimeout`. New connections are opened with
+    `connect`, so every connection gets the same setup.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        connect: Callable[[Path], Connection],
+        *,
+        size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_POOL_TIMEOUT,
+    ) -> None:
+        if str(path) == ":memory:":
+            raise ValueError("in-memory databases cannot be shared by a pool")
+        if size < 1:
+            raise ValueError(f"pool size must be at least 1, got {size}")
+
+        self.path = path
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.closed = False
+
+        self._writer = connect(path)
+        self._write_lock = threading.Lock()
+        # cleared while swapping, so new reads wait instead of taking readers
+        self._open = threading.Event()
+        self._open.set()
+        self._readers: queue.LifoQueue[Connection] = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._readers.put(connect(path))
+
+    @contextmanager
+    def read(self) -> Iterator[Cursor]:
+        """Check out a reader connection and yield a cursor in a read transaction."""
+        conn = self._acquire_reader()
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN")
+            yield cur
+        finally:
+            cur.close()
+            conn.rollback()
+            self._readers.put(conn)
+
+    @contextmanager
+    def write(self) -> Iterator[Cursor]:
+        """Take the writer and yield a cursor, committing when the block succeeds."""
+        if not self._write_lock.acquire(timeout=self.timeout):
+            raise PoolTimeout(self.timeout)
+        try:
+            if self.closed:
+                raise PoolClosed
+            cur = self._writer.cursor()
+            try:
+                yield cur
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+            finally:
+                cur.close()
+        finally:
+            self._write_lock.release()
+
+    def swap[T](self, replace: Callable[[], T]) -> T:
+        """Close every connection, call `replace` and reopen them on `path`.
+
+        Waits for the in-flight write and the in-flight reads to finish first.
+        Reads and writes arriving meanwhile wait for the reopened connections
+        instead of failing, unless that takes longer than `timeout`. `replace`
+        runs with no connection open, so it may move a new database file to
+        `path`. The connections are reopened even if closing them or `replace`
+        fails; if reopening fails the pool is left closed. Returns what
+        `replace` returns.
+        """
+        if not self._write_lock.acquire(timeout=self.timeout):
+            raise PoolTimeout(self.timeout)
+        try:
+            if self.closed:
+                raise PoolClosed
+            self._open.clear()
+            try:
+                readers = self._drain_readers()
+                try:
+                    self._close_connections(readers)
+                    return replace()
+                finally:
+                    self._reopen()
+            finally:
+                self._open.set()
+        finally:
+            self._write_lock.release()
+
+    def close(self) -> None:
+        """Wait for in-flight readers and the writer to finish, then close all.
+
+        A final TRUNCATE checkpoint folds the WAL (if any) back into the
+        database file before the connections are closed.
+        """
+        with self._write_lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._close_connections(self._drain_readers())
+
+    def _drain_readers(self) -> list[Connection]:
+        """Take every reader out of the pool, waiting for in-flight reads."""
+        readers: list[Connection] = []
+        try:
+            for _ in range(self.size):
+                readers.append(self._readers.get(timeout=self.timeout))
+        except queue.Empty:
+            for conn in readers:
+                self._readers.put(conn)
+            raise PoolTimeout(self.timeout) from None
+        return readers
+
+    def _reopen(self) -> None:
+        conns: list[Connection] = []
+        try:
+            for _ in range(self.size + 1):
+                conns.append(self.connect(self.path))
+        except BaseException:
+            for conn in conns:
+                conn.close()
+            self.closed = True
+            raise
+        self._writer, *readers = conns
+        for conn in readers:
+            self._readers.put(conn)
+
+    def _close_connections(self, readers: list[Connection]) -> None:
+        for conn in readers:
+            conn.close()
+        try:
+            self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            self._writer.close()
+
+    def _acquire_reader(self) -> Connection:
+        if self.closed:
+            raise PoolClosed
+        if not self._open.wait(timeout=self.timeout):
+            raise PoolTimeout(self.timeout)
+        if self.closed:
+            raise PoolClosed
+        try:
+            return self._readers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(self.timeout) from None
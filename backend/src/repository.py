@@ -1,8 +1,21 @@
 from __future__ import annotations
 
+import re
+from collections.abc import Collection, Iterable, Iterator, Sequence
+from functools import cache
 from sqlite3 import Cursor
-
-from pypika import Query, Table, functions as fn
+from typing import Any
+
+from pydantic_core import to_json
+from pypika import (
+    Case,
+    Parameter,
+    Query,
+    Table,
+    Tuple,
+    analytics as an,
+    functions as fn,
+)
 
 from src.schemas import (
     StageCreate,
@@ -10,6 +23,8 @@ from src.schemas import (
     StagePublic,
     TaskCreate,
     TaskNameUpdate,
+    TaskBulkMove,
+    TaskMatch,
     TaskPublic,
     TaskMoveUpdate,
 )
@@ -41,238 +56,889 @@ class MultipleRowsUpdated(RuntimeError):
         super().__init__(f"Unexpectedly updated {rowcount} rows")
 
 
+class TasksNotFound(LookupError):
+    def __init__(self, ids: Iterable[int]):
+        self.ids = sorted(ids)
+        super().__init__(f"Tasks with ids {self.ids} not found")
+
+
+class StagesNotFound(LookupError):
+    def __init__(self, ids: Iterable[int]):
+        self.ids = sorted(ids)
+        super().__init__(f"Stages with ids {self.ids} not found")
+
+
+class InvalidStageOrder(ValueError):
+    pass
+
+
+class VersionConflict(RuntimeError):
+    """A conditional write found its row at another version than expected.
+
+    Every write to a task increments its `version`, and so does every change
+    to the tasks or the order of a stage to the stage's. Writes given the
+    versions a client last saw only apply if the row is still at one of them.
+    """
+
+    def __init__(self, kind: str, id: int, version: int):
+        self.version = version
+        super().__init__(f"{kind} {id} was changed, it is at version {version} now")
+
+
+def ensure_version(
+    kind: str, id: int, version: int, expected: Collection[int] | None
+) -> None:
+    """Raise VersionConflict unless `expected` is None or contains `version`."""
+    if expected is not None and version not in expected:
+        raise VersionConflict(kind, id, version)
+
+
 Stage_T = Table("stage")
 Task_T = Table("task")
+Board_Version_T = Table("board_version")
+Other_Task_T = Table("task", alias="other")
+
+# `task.position` stores a sparse sort key, not the index shown to clients.
+# New keys are spaced POSITION_GAP apart so a move can usually pick a key
+# between its new neighbours and only rewrite the moved row. The contiguous
+# index exposed as `TaskPublic.position` is derived when reading.
+POSITION_GAP = 1024
+
+# number of tasks in the same stage ordered before the task, ties broken by id
+TASK_INDEX = (
+    Query.from_(Other_Task_T)
+    .select(fn.Count("*"))
+    .where(Other_Task_T.stage_id == Task_T.stage_id)
+    .where(
+        Tuple(Other_Task_T.position, Other_Task_T.id)
+        < Tuple(Task_T.position, Task_T.id)
+    )
+)
+TASK_INDEX_IN_STAGE = (
+    an.RowNumber().over(Task_T.stage_id).orderby(Task_T.position, Task_T.id) - 1
+)
+
+# Statements are built once, with values bound to `?` parameters, so every
+# call runs the same SQL text and reuses the statement prepared by the
+# connection's statement cache instead of parsing it again.
+BIND = Parameter("?")
+
+# the ids of a JSON array, so a single statement serves any number of ids
+JSON_IDS = "SELECT value FROM json_each(?)"
+
+FETCH_BOARD_VERSION = Board_Version_T.select(Board_Version_T.version).get_sql()
+
+
+def fetch_board_version(cur: Cursor) -> int:
+    return cur.execute(FETCH_BOARD_VERSION).fetchone()[0]
+
+
+BUMP_BOARD_VERSION = (
+    Query.update(Board_Version_T)
+    .set(
+        Board_Version_T.version,
+        Case().when(Board_Version_T.version < BIND, BIND).else_(Board_Version_T.version)
+        + 1,
+    )
+    .get_sql()
+)
+
+
+def bump_board_version(cur: Cursor, *, at_least: int = 0) -> int:
+    """Increment the board version and return the new one.
+
+    Every write bumps the version inside its own transaction. `at_least` lets
+    a freshly loaded database continue counting from the one it replaced.
+    """
+    cur.execute(BUMP_BOARD_VERSION, (at_least, at_least))
+    return fetch_board_version(cur)
+
+
+BUMP_STAGE_VERSIONS = f"UPDATE stage SET version = version + 1 WHERE id IN ({JSON_IDS})"
+
+
+def bump_stage_versions(cur: Cursor, stage_ids: Iterable[int]) -> None:
+    """Increment the versions of stages whose tasks or task order changed."""
+    cur.execute(BUMP_STAGE_VERSIONS, (to_json(list(set(stage_ids))),))
+
+
+BOARD_QUERY = (
+    Query.from_(Stage_T)
+    .left_join(Task_T)
+    .on(Task_T.stage_id == Stage_T.id)
+    .select(
+        Stage_T.id.as_("stage_id"),
+        Stage_T.name.as_("stage_name"),
+        Stage_T.version.as_("stage_version"),
+        Task_T.id.as_("task_id"),
+        Task_T.name.as_("task_name"),
+        Task_T.version.as_("task_version"),
+    )
+    .orderby(Stage_T.id)
+    .orderby(Task_T.position)
+    .orderby(Task_T.id)
+    .get_sql()
+)
+
+
+def fetch_board(cur: Cursor) -> list[dict[str, Any]]:
+    """Fetch every stage together with its tasks as plain dicts.
+
+    Stages and tasks are loaded with a single LEFT JOIN ordered by stage id and
+    sort key, so the rows of one stage are adjacent and the board is grouped
+    (and the contiguous task positions counted) in one pass. Stages without
+    any tasks are included with an empty task list. The dicts have the shape
+    of `StageDetail` and are built without validation, the column types are
+    guaranteed by the schema.
+    """
+    board: list[dict[str, Any]] = []
+    stage: dict[str, Any] = {"id": None}
+    tasks: list[dict[str, Any]] = []
+    for (
+        stage_id,
+        stage_name,
+        stage_version,
+        task_id,
+        task_name,
+        task_version,
+    ) in cur.execute(BOARD_QUERY):
+        if stage["id"] != stage_id:
+            tasks = []
+            stage = {
+                "name": stage_name,
+                "id": stage_id,
+                "version": stage_version,
+                "tasks": tasks,
+            }
+            board.append(stage)
+
+        if task_id is None:
+            continue
+
+        tasks.append(
+            {
+                "name": task_name,
+                "stage_id": stage_id,
+                "id": task_id,
+                "position": len(tasks),
+                "version": task_version,
+            }
+        )
+    return board
+
 
+def fetch_stages_with_tasks(cur: Cursor) -> list[StageDetail]:
+    """Fetch every stage together with its tasks, ordered by position."""
+    return [
+        StageDetail.model_construct(
+            name=stage["name"],
+            id=stage["id"],
+            version=stage["version"],
+            tasks=[TaskPublic.model_construct(**task) for task in stage["tasks"]],
+        )
+        for stage in fetch_board(cur)
+    ]
+
+
+def fetch_stages_with_tasks_json(cur: Cursor) -> bytes:
+    """Fetch the board serialized as a JSON `list[StageDetail]`."""
+    return to_json(fetch_board(cur))
 
-def fetch_stages_with_tasks(cur: Cursor, *, sorted: bool = False) -> list[StageDetail]:
-    # stmt = """
-    # SELECT
-    #     s.id AS stage_id,
-    #     s.name AS stage_name,
-    #     t.id AS task_id,
-    #     t.name AS task_name,
-    #     t.position AS task_position
-    # FROM task t
-    # LEFT JOIN stage s ON t.stage_id = s.id
-    # ORDER BY s.id, t.position
-    # """
-    #
-    # stages: list[StageDetail] = []
-    # for row in cur.execute(stmt).fetchall():
-    #     task = TaskPublic(
-    #         id=row["task_id"],
-    #         name=row["task_name"],
-    #         stage_id=row["stage_id"],
-    #         position=row["task_position"],
-    #     )
-    #     for i, stage in enumerate(stages):
-    #         if row["stage_id"] == stage.id:
-    #             stages[i].tasks.append(task)
-    #             break
-    #     else:
-    #         stages.append(
-    #             StageDetail(
-    #                 id=row["stage_id"],
-    #                 name=row["stage_name"],
-    #                 tasks=[task],
-    #             )
-    #         )
-
-    cur = cur.execute(Stage_T.select("*").get_sql())
-    stages = [StagePublic.from_row(row) for row in cur.fetchall()]
-
-    cur = cur.execute(Task_T.select("*").get_sql())
-    tasks = [TaskPublic.from_row(row) for row in cur.fetchall()]
-
-    stage_details: list[StageDetail] = []
-    for stage in stages:
-        stage_tasks = [task for task in tasks if task.stage_id == stage.id]
-        stage = StageDetail(**stage.model_dump(), tasks=stage_tasks)
-        if sorted:
-            stage_details.append(stage.sort_by_position())
-    return stage_details
+
+FETCH_ALL_STAGES = Stage_T.select("*").get_sql()
+FETCH_STAGE_BY_NAME = Stage_T.select("*").where(Stage_T.name == BIND).get_sql()
+FETCH_STAGE_BY_ID = Stage_T.select("*").where(Stage_T.id == BIND).get_sql()
 
 
 def fetch_all_stages(cur: Cursor) -> list[StagePublic]:
-    query = Stage_T.select("*").get_sql()
-    return [StagePublic.from_row(res) for res in cur.execute(query).fetchall()]
+    return [
+        StagePublic.from_row(res) for res in cur.execute(FETCH_ALL_STAGES).fetchall()
+    ]
 
 
 def fetch_stage_by_name(cur: Cursor, name: str) -> StagePublic | None:
-    query = Stage_T.select("*").where(Stage_T.name == name).get_sql()
-    row = cur.execute(query).fetchone()
+    row = cur.execute(FETCH_STAGE_BY_NAME, (name,)).fetchone()
     if not row:
         return None
     return StagePublic.from_row(row)
 
 
 def fetch_stage_by_id(cur: Cursor, id: int) -> StagePublic | None:
-    query = Stage_T.select("*").where(Stage_T.id == id).get_sql()
-    row = cur.execute(query).fetchone()
+    row = cur.execute(FETCH_STAGE_BY_ID, (id,)).fetchone()
     if not row:
         return None
     return StagePublic.from_row(row)
 
 
+FETCH_LAST_TASK_POSITION = (
+    Task_T.select(fn.Max(Task_T.position).as_("next_pos"))
+    .where(Task_T.stage_id == BIND)
+    .get_sql()
+)
+
+
 def fetch_next_task_position(cur: Cursor, stage_id: int) -> int:
-    query = (
-        Task_T.select(fn.Max(Task_T.position).as_("next_pos"))
-        .where(Task_T.stage_id == stage_id)
-        .get_sql()
-    )
-    next_pos = cur.execute(query).fetchone()
-    return next_pos[0] + 1 if next_pos[0] is not None else 0
+    """Return the sort key for a task appended to the end of a stage."""
+    next_pos = cur.execute(FETCH_LAST_TASK_POSITION, (stage_id,)).fetchone()
+    return next_pos[0] + POSITION_GAP if next_pos[0] is not None else 0
+
+
+INSERT_TASK = (
+    Query.into(Task_T)
+    .columns("name", "stage_id", "position")
+    .insert(BIND, BIND, BIND)
+    .get_sql()
+)
 
 
 def insert_task(cur: Cursor, task: TaskCreate) -> TaskPublic:
     next_position = fetch_next_task_position(cur, task.stage_id)
-    query = (
-        Query.into(Task_T)
-        .columns("name", "stage_id", "position")
-        .insert(task.name, task.stage_id, next_position)
-        .get_sql()
-    )
-    cur = cur.execute(query)
+    cur = cur.execute(INSERT_TASK, (task.name, task.stage_id, next_position))
 
     last_id = cur.lastrowid
     if not last_id:
         raise RuntimeError(f"error inserting row {task} into {Task_T}")
+    bump_stage_versions(cur, [task.stage_id])
+    bump_board_version(cur)
     new_task = fetch_task_by_id(cur, last_id)
     assert new_task is not None
     return new_task
 
 
+INSERT_TASKS_BATCH_SIZE = 500
+
+
+@cache
+def insert_tasks_query(num_rows: int) -> str:
+    row = (BIND,) * 3
+    query = (
+        Query.into(Task_T)
+        .columns("name", "stage_id", "position")
+        .insert(*[row] * num_rows)
+        .get_sql()
+    )
+    return f"{query} RETURNING id"
+
+
+def insert_tasks(cur: Cursor, tasks: Iterable[TaskCreate]) -> list[int]:
+    """Insert many tasks at once and return their ids in input order.
+
+    Every stage's next position is looked up once and then assigned in
+    memory. Rows are inserted with multi-row INSERTs of up to
+    INSERT_TASKS_BATCH_SIZE rows, and the board version is bumped once.
+    """
+    next_positions: dict[int, int] = {}
+    rows: list[tuple[str, int, int]] = []
+    for task in tasks:
+        position = next_positions.get(task.stage_id)
+        if position is None:
+            position = fetch_next_task_position(cur, task.stage_id)
+        rows.append((task.name, task.stage_id, position))
+        next_positions[task.stage_id] = position + POSITION_GAP
+
+    ids: list[int] = []
+    for start in range(0, len(rows), INSERT_TASKS_BATCH_SIZE):
+        batch = rows[start : start + INSERT_TASKS_BATCH_SIZE]
+        params = [value for row in batch for value in row]
+        inserted = cur.execute(insert_tasks_query(len(batch)), params).fetchall()
+        # RETURNING order is unspecified, but ids grow in VALUES order
+        ids.extend(sorted(row[0] for row in inserted))
+
+    if ids:
+        bump_stage_versions(cur, next_positions)
+        bump_board_version(cur)
+    return ids
+
+
+FETCH_ALL_TASKS = Task_T.select(
+    Task_T.id,
+    Task_T.name,
+    Task_T.stage_id,
+    TASK_INDEX_IN_STAGE.as_("position"),
+    Task_T.version,
+).get_sql()
+
+
 def fetch_all_tasks(cur: Cursor) -> list[TaskPublic]:
-    query = Task_T.select("*").get_sql()
-    return [TaskPublic.from_row(row) for row in cur.execute(query).fetchall()]
+    return [TaskPublic.from_row(row) for row in cur.execute(FETCH_ALL_TASKS).fetchall()]
+
+
+# the columns in `TaskPublic` field order, so the JSON matches the model
+FETCH_ALL_TASKS_JSON = Task_T.select(
+    Task_T.name,
+    Task_T.stage_id,
+    Task_T.id,
+    TASK_INDEX_IN_STAGE.as_("position"),
+    Task_T.version,
+).get_sql()
+
+
+def fetch_all_tasks_json(cur: Cursor) -> bytes:
+    """Fetch every task serialized as a JSON `list[TaskPublic]`."""
+    return to_json([dict(row) for row in cur.execute(FETCH_ALL_TASKS_JSON)])
+
+
+EXPORT_TASKS = (
+    Task_T.select(Task_T.name, Task_T.stage_id, Task_T.id, Task_T.version)
+    .orderby(Task_T.stage_id)
+    .orderby(Task_T.position)
+    .orderby(Task_T.id)
+    .get_sql()
+)
+
+
+def iter_all_tasks(cur: Cursor, chunk_size: int) -> Iterator[list[dict[str, Any]]]:
+    """Yield every task in board order, `chunk_size` tasks at a time.
+
+    The tasks are dicts of the shape of `TaskPublic`. Rows are fetched with
+    `fetchmany` while the chunks are consumed, walking the (stage_id,
+    position) index without sorting, and the positions are counted on the
+    way, so only one chunk is ever held in memory.
+    """
+    rows = cur.execute(EXPORT_TASKS)
+    stage_id, position = None, 0
+    while batch := rows.fetchmany(chunk_size):
+        tasks = []
+        for name, task_stage_id, task_id, version in batch:
+            if task_stage_id != stage_id:
+                stage_id, position = task_stage_id, 0
+            tasks.append(
+                {
+                    "name": name,
+                    "stage_id": stage_id,
+                    "id": task_id,
+                    "position": position,
+                    "version": version,
+                }
+            )
+            position += 1
+        yield tasks
 
 
 def fetch_all_tasks_by_stage_id(cur: Cursor, stage_id: int) -> list[TaskPublic]:
-    query = Task_T.select("*").where(Task_T.stage_id == stage_id).get_sql()
-    return [TaskPublic.from_row(row) for row in cur.execute(query).fetchall()]
+    return fetch_tasks_in_window(cur, stage_id, 0)
+
+
+FETCH_TASK_BY_ID = (
+    Task_T.select(
+        Task_T.id,
+        Task_T.name,
+        Task_T.stage_id,
+        TASK_INDEX.as_("position"),
+        Task_T.version,
+    )
+    .where(Task_T.id == BIND)
+    .get_sql()
+)
 
 
 def fetch_task_by_id(cur: Cursor, id: int) -> TaskPublic | None:
-    query = Task_T.select("*").where(Task_T.id == id).get_sql()
-    row = cur.execute(query).fetchone()
+    row = cur.execute(FETCH_TASK_BY_ID, (id,)).fetchone()
     if not row:
         return None
     return TaskPublic.from_row(row)
 
 
+INSERT_STAGE = Query.into(Stage_T).columns("name").insert(BIND).get_sql()
+
+
 def insert_stage(cur: Cursor, stage: StageCreate) -> StagePublic:
-    query = Query.into(Stage_T).columns("name").insert(stage.name).get_sql()
-    cur = cur.execute(query)
+    cur = cur.execute(INSERT_STAGE, (stage.name,))
 
     last_id = cur.lastrowid
     if not last_id:
         raise RuntimeError(f"error inserting row {stage} into {Stage_T}")
+    bump_board_version(cur)
     new_stage = fetch_stage_by_id(cur, last_id)
     assert new_stage is not None
     return new_stage
 
 
-def update_same_stage_positions(
+FETCH_POSITIONS_AT = (
+    Task_T.select(Task_T.position)
+    .where(Task_T.stage_id == BIND)
+    .where(Task_T.id != BIND)
+    .orderby(Task_T.position)
+    .orderby(Task_T.id)
+    .limit(BIND)
+    .offset(BIND)
+    .get_sql()
+)
+FETCH_LAST_POSITION_EXCLUDING = (
+    Task_T.select(fn.Max(Task_T.position))
+    .where(Task_T.stage_id == BIND)
+    .where(Task_T.id != BIND)
+    .get_sql()
+)
+
+
+def fetch_neighbour_positions(
     cur: Cursor,
     stage_id: int,
-    prev_position: int,
-    new_position: int,
-):
-    if prev_position == new_position:
-        return
-
-    # moved forward in same stage
-    if prev_position > new_position:
-        query = (
-            Query.update(Task_T)
-            .set(Task_T.position, Task_T.position + 1)
-            .where(Task_T.stage_id == stage_id)
-            .where(new_position <= Task_T.position)
-            .where(Task_T.position < prev_position)
-            .get_sql()
-        )
-    else:
-        query = (
-            Query.update(Task_T)
-            .set(Task_T.position, Task_T.position - 1)
-            .where(Task_T.stage_id == stage_id)
-            .where(
-                (prev_position < Task_T.position) & (Task_T.position <= new_position)
-            )
-            .get_sql()
-        )
+    index: int,
+    exclude_task_id: int,
+) -> tuple[int | None, int | None]:
+    """Return the sort keys around `index` in a stage, ignoring one task.
+
+    The first value is the key of the task that would end up before `index`,
+    the second one the key of the task that would end up after it. Either is
+    None at the start or end of the stage.
+    """
+    params = (stage_id, exclude_task_id, 1 if index == 0 else 2, max(index - 1, 0))
+    keys = [row[0] for row in cur.execute(FETCH_POSITIONS_AT, params).fetchall()]
+
+    if index == 0:
+        return None, keys[0] if keys else None
+    if keys:
+        return keys[0], keys[1] if len(keys) > 1 else None
+
+    # index is past the end of the stage, so append after the last task
+    params = (stage_id, exclude_task_id)
+    return cur.execute(FETCH_LAST_POSITION_EXCLUDING, params).fetchone()[0], None
+
+
+def position_between(before: int | None, after: int | None) -> int | None:
+    """Return a sort key strictly between two keys, or None if there is no gap."""
+    if before is None and after is None:
+        return 0
+    if before is None:
+        assert after is not None
+        return after - POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
 
-    cur.execute(query)
 
+REBALANCE_STAGE_POSITIONS = """
+UPDATE task SET position = ranked.idx * ?
+FROM (
+    SELECT id, ROW_NUMBER() OVER (ORDER BY position, id) - 1 AS idx
+    FROM task
+    WHERE stage_id = ?
+) AS ranked
+WHERE task.id = ranked.id
+"""
 
-def update_old_stage_positions(
+
+def rebalance_stage_positions(cur: Cursor, stage_id: int) -> None:
+    """Respace the sort keys of a stage POSITION_GAP apart, keeping the order."""
+    cur.execute(REBALANCE_STAGE_POSITIONS, (POSITION_GAP, stage_id))
+
+
+UPDATE_TASK_PLACEMENT = (
+    Query.update(Task_T)
+    .set(Task_T.stage_id, BIND)
+    .set(Task_T.position, BIND)
+    .set(Task_T.version, Task_T.version + 1)
+    .where(Task_T.id == BIND)
+    .get_sql()
+)
+
+
+def update_task_ordering(
+    cur: Cursor,
+    old_task: TaskPublic,
+    moved_task: TaskMoveUpdate,
+) -> TaskPublic:
+    """Move a task to index `moved_task.position` of `moved_task.stage_id`.
+
+    Only the moved row is written: it gets a sort key between its new
+    neighbours. When the neighbours' keys are adjacent the destination stage
+    is rebalanced first, which is the only case touching other rows.
+    """
+    # negative indexes move to the start, like in `move_tasks`
+    index = max(moved_task.position, 0)
+    if old_task.stage_id == moved_task.stage_id and old_task.position == index:
+        return old_task
+
+    before, after = fetch_neighbour_positions(
+        cur, moved_task.stage_id, index, old_task.id
+    )
+    position = position_between(before, after)
+    if position is None:
+        rebalance_stage_positions(cur, moved_task.stage_id)
+        before, after = fetch_neighbour_positions(
+            cur, moved_task.stage_id, index, old_task.id
+        )
+        position = position_between(before, after)
+        assert position is not None, "rebalanced stage must have gaps"
+
+    cur.execute(UPDATE_TASK_PLACEMENT, (moved_task.stage_id, position, old_task.id))
+    bump_stage_versions(cur, {old_task.stage_id, moved_task.stage_id})
+    bump_board_version(cur)
+
+    moved = fetch_task_by_id(cur, old_task.id)
+    assert moved is not None
+    return moved
+
+
+FETCH_TASKS_IN_WINDOW = (
+    Task_T.select(Task_T.id, Task_T.name, Task_T.stage_id, Task_T.version)
+    .where(Task_T.stage_id == BIND)
+    .orderby(Task_T.position)
+    .orderby(Task_T.id)
+    .limit(BIND)
+    .offset(BIND)
+    .get_sql()
+)
+
+
+def fetch_tasks_in_window(
     cur: Cursor,
     stage_id: int,
-    prev_position: int,
-):
-    query = (
-        Query.update(Task_T)
-        .set(Task_T.position, Task_T.position - 1)
-        .where(Task_T.stage_id == stage_id)
-        .where(Task_T.position > prev_position)
-        .get_sql()
+    start: int,
+    stop: int | None = None,
+) -> list[TaskPublic]:
+    """Fetch the tasks of a stage with positions in [start, stop)."""
+    # SQLite needs a LIMIT before an OFFSET, -1 means no limit
+    limit = -1 if stop is None else max(stop - start, 0)
+    rows = cur.execute(FETCH_TASKS_IN_WINDOW, (stage_id, limit, start)).fetchall()
+    return [
+        TaskPublic(**dict(row), position=start + index)
+        for index, row in enumerate(rows)
+    ]
+
+
+# keyset pages continue after the (sort key, id) of the last task they returned
+TaskKey = tuple[int, int]
+# before the key of every task, sort keys are 64-bit integers
+FIRST_TASK_KEY: TaskKey = (-(2**63), 0)
+
+FETCH_STAGE_TASKS_AFTER = (
+    Task_T.select(
+        Task_T.id, Task_T.name, Task_T.stage_id, Task_T.position, Task_T.version
     )
-    cur.execute(query)
+    .where(Task_T.stage_id == BIND)
+    .where(Tuple(Task_T.position, Task_T.id) > Tuple(BIND, BIND))
+    .orderby(Task_T.position)
+    .orderby(Task_T.id)
+    .limit(BIND)
+    .get_sql()
+)
+COUNT_STAGE_TASKS_UP_TO = (
+    Task_T.select(fn.Count("*"))
+    .where(Task_T.stage_id == BIND)
+    .where(Tuple(Task_T.position, Task_T.id) <= Tuple(BIND, BIND))
+    .get_sql()
+)
 
 
-def update_new_stage_positions(
+def fetch_stage_tasks_page(
     cur: Cursor,
     stage_id: int,
-    position: int,
-):
-    query = (
-        Query.update(Task_T)
-        .set(Task_T.position, Task_T.position + 1)
-        .where(Task_T.stage_id == stage_id)
-        .where(Task_T.position >= position)
-        .get_sql()
+    after: TaskKey | None,
+    limit: int,
+) -> tuple[list[TaskPublic], TaskKey | None]:
+    """Fetch up to `limit` tasks of a stage in board order, following `after`.
+
+    Returns the tasks and the key to pass as `after` for the next page, or
+    None on the last page. The page is found through the (stage_id, position)
+    index, however deep it is; only the positions of its tasks count the
+    tasks before it.
+    """
+    after = after or FIRST_TASK_KEY
+    rows = cur.execute(
+        FETCH_STAGE_TASKS_AFTER, (stage_id, *after, limit + 1)
+    ).fetchall()
+    start = (
+        cur.execute(COUNT_STAGE_TASKS_UP_TO, (stage_id, *after)).fetchone()[0]
+        if after != FIRST_TASK_KEY
+        else 0
     )
-    cur.execute(query)
+    tasks = [
+        TaskPublic.model_construct(
+            id=task_id,
+            name=name,
+            stage_id=stage_id,
+            position=start + index,
+            version=version,
+        )
+        for index, (task_id, name, stage_id, _, version) in enumerate(rows[:limit])
+    ]
+    last = rows[limit - 1] if len(rows) > limit else None
+    return tasks, (last[3], last[0]) if last else None
+
+
+BOARD_SUMMARY = (
+    Query.from_(Stage_T)
+    .left_join(Task_T)
+    .on(Task_T.stage_id == Stage_T.id)
+    .select(
+        Stage_T.name,
+        Stage_T.id,
+        Stage_T.version,
+        fn.Count(Task_T.id).as_("task_count"),
+    )
+    .groupby(Stage_T.id)
+    .orderby(Stage_T.id)
+    .get_sql()
+)
 
 
-def update_task_ordering(
+def fetch_board_summary_json(cur: Cursor) -> bytes:
+    """Fetch every stage with its number of tasks as a JSON `list[StageSummary]`."""
+    return to_json([dict(row) for row in cur.execute(BOARD_SUMMARY)])
+
+
+SEARCH_TASKS = """
+SELECT task.id, task.name, task.stage_id
+FROM task_search JOIN task ON task.id = task_search.rowid
+WHERE task_search MATCH ? AND (? IS NULL OR task.stage_id = ?)
+ORDER BY task_search.rank, task.id
+LIMIT ? OFFSET ?
+"""
+
+
+def search_terms(text: str) -> str | None:
+    """Turn free text into an FTS5 query matching every word as a prefix.
+
+    Words are quoted, so nothing the user types is read as query syntax.
+    Returns None when `text` has no words to search for.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text)) or None
+
+
+def search_tasks(
+    cur: Cursor,
+    text: str,
+    stage_id: int | None,
+    limit: int,
+    offset: int = 0,
+) -> tuple[list[TaskMatch], int | None]:
+    """Find the tasks whose name has every word of `text`, best matches first.
+
+    Optionally limited to one stage. Returns up to `limit` tasks starting at
+    `offset` in rank order and the offset of the next page, or None on the
+    last page. Every match is ranked, so the cost grows with the number of
+    matches rather than with `limit`.
+    """
+    terms = search_terms(text)
+    if terms is None:
+        return [], None
+    rows = cur.execute(
+        SEARCH_TASKS, (terms, stage_id, stage_id, limit + 1, offset)
+    ).fetchall()
+    tasks = [TaskMatch(**dict(row)) for row in rows[:limit]]
+    return tasks, offset + limit if len(rows) > limit else None
+
+
+def fetch_moved_tasks(
     cur: Cursor,
     old_task: TaskPublic,
-    moved_task: TaskMoveUpdate,
-):
+    moved_task: TaskPublic,
+) -> list[TaskPublic]:
+    """Fetch every task whose stage or position changed because of a move.
+
+    `old_task` and `moved_task` are the task before and after
+    `update_task_ordering`. Tasks between the old and the new index shifted by
+    one, and so did the rest of both stages when it changed stages.
+    """
     if old_task.stage_id == moved_task.stage_id:
-        update_same_stage_positions(
-            cur,
-            moved_task.stage_id,
-            old_task.position,
-            moved_task.position,
+        start = min(old_task.position, moved_task.position)
+        stop = max(old_task.position, moved_task.position) + 1
+        return fetch_tasks_in_window(cur, moved_task.stage_id, start, stop)
+
+    return fetch_tasks_in_window(
+        cur, old_task.stage_id, old_task.position
+    ) + fetch_tasks_in_window(cur, moved_task.stage_id, moved_task.position)
+
+
+FETCH_TASK_STAGES = f"SELECT id, stage_id FROM task WHERE id IN ({JSON_IDS})"
+
+
+def fetch_task_stages(cur: Cursor, task_ids: Iterable[int]) -> dict[int, int]:
+    """Map task ids to their stage ids, raising TasksNotFound for unknown ids."""
+    task_ids = set(task_ids)
+    params = (to_json(list(task_ids)),)
+    stages = dict(cur.execute(FETCH_TASK_STAGES, params).fetchall()) if task_ids else {}
+    if missing := task_ids - stages.keys():
+        raise TasksNotFound(missing)
+    return stages
+
+
+FETCH_STAGE_IDS = f"SELECT id FROM stage WHERE id IN ({JSON_IDS})"
+
+
+def ensure_stages_exist(cur: Cursor, stage_ids: Iterable[int]) -> None:
+    stage_ids = set(stage_ids)
+    params = (to_json(list(stage_ids)),)
+    found = (
+        {row[0] for row in cur.execute(FETCH_STAGE_IDS, params)} if stage_ids else set()
+    )
+    if missing := stage_ids - found:
+        raise StagesNotFound(missing)
+
+
+FETCH_STAGE_ORDERS = f"""
+SELECT id, name, stage_id, position, version FROM task
+WHERE stage_id IN ({JSON_IDS})
+ORDER BY stage_id, position, id
+"""
+
+
+class StageOrders:
+    """The task order of some stages, edited in memory and written back at once.
+
+    `orders` maps each loaded stage to its task ids in board order. Callers
+    rearrange those lists and `write` renumbers every loaded stage in a single
+    pass, giving the tasks keys POSITION_GAP apart.
+    """
+
+    def __init__(self, cur: Cursor, stage_ids: Collection[int]):
+        params = (to_json(list(stage_ids)),)
+        self.orders: dict[int, list[int]] = {stage_id: [] for stage_id in stage_ids}
+        # task id -> (name, stage id, index in stage, sort key, version) before
+        # any edit
+        self.tasks: dict[int, tuple[str, int, int, int, int]] = {}
+        for task_id, name, stage_id, position, version in cur.execute(
+            FETCH_STAGE_ORDERS, params
+        ):
+            order = self.orders[stage_id]
+            self.tasks[task_id] = (name, stage_id, len(order), position, version)
+            order.append(task_id)
+
+    def write(self, cur: Cursor) -> list[TaskPublic]:
+        """Renumber the loaded stages and return the tasks that changed place.
+
+        Only rows whose stage or sort key differ from the stored ones are
+        written, and the board version is bumped once if any row was.
+        """
+        updates: list[tuple[int, int, int]] = []
+        stages: set[int] = set()
+        moved: list[TaskPublic] = []
+        for stage_id, order in self.orders.items():
+            for index, task_id in enumerate(order):
+                name, old_stage_id, old_index, old_position, version = self.tasks[
+                    task_id
+                ]
+                position = index * POSITION_GAP
+                if (old_stage_id, old_position) != (stage_id, position):
+                    updates.append((stage_id, position, task_id))
+                    stages.update((old_stage_id, stage_id))
+                    version += 1
+                if (old_stage_id, old_index) != (stage_id, index):
+                    moved.append(
+                        TaskPublic.model_construct(
+                            id=task_id,
+                            name=name,
+                            stage_id=stage_id,
+                            position=index,
+                            version=version,
+                        )
+                    )
+
+        if updates:
+            cur.executemany(UPDATE_TASK_PLACEMENT, updates)
+            bump_stage_versions(cur, stages)
+            bump_board_version(cur)
+        return moved
+
+
+def move_tasks(cur: Cursor, moves: Sequence[TaskBulkMove]) -> list[TaskPublic]:
+    """Apply several moves in order and renumber each affected stage once.
+
+    Every move has the semantics of `update_task_ordering` applied to the
+    board left by the previous moves. Returns the tasks that changed place.
+    """
+    stages = fetch_task_stages(cur, (move.task_id for move in moves))
+    ensure_stages_exist(cur, (move.stage_id for move in moves))
+
+    board = StageOrders(cur, {*stages.values(), *(m.stage_id for m in moves)})
+    for move in moves:
+        board.orders[stages[move.task_id]].remove(move.task_id)
+        order = board.orders[move.stage_id]
+        order.insert(min(max(move.position, 0), len(order)), move.task_id)
+        stages[move.task_id] = move.stage_id
+    return board.write(cur)
+
+
+def set_stage_order(
+    cur: Cursor,
+    stage_id: int,
+    task_ids: Sequence[int],
+    versions: Collection[int] | None = None,
+) -> list[TaskPublic]:
+    """Give a stage exactly the tasks `task_ids`, in that order.
+
+    The ids must include every task of the stage. Ids of tasks in other stages
+    move those tasks into this one. Returns the tasks that changed place.
+    Given `versions`, the stage must still be at one of them.
+    """
+    if len(set(task_ids)) != len(task_ids):
+        raise InvalidStageOrder("Task ids must be unique")
+    stage = fetch_stage_by_id(cur, stage_id)
+    if stage is None:
+        raise StagesNotFound([stage_id])
+    ensure_version("Stage", stage_id, stage.version, versions)
+    stages = fetch_task_stages(cur, task_ids)
+
+    board = StageOrders(cur, {stage_id, *stages.values()})
+    if missing := set(board.orders[stage_id]) - set(task_ids):
+        raise InvalidStageOrder(
+            f"Order must list every task of stage {stage_id}, missing {sorted(missing)}"
         )
-    else:
-        update_old_stage_positions(cur, old_task.stage_id, old_task.position)
-        update_new_stage_positions(cur, moved_task.stage_id, moved_task.position)
+    for task_id, old_stage_id in stages.items():
+        if old_stage_id != stage_id:
+            board.orders[old_stage_id].remove(task_id)
+    board.orders[stage_id] = list(task_ids)
+    return board.write(cur)
+
+
+@cache
+def patch_task_query(columns: tuple[str, ...]) -> str:
+    """The UPDATE of a task setting `columns`, one statement per set of columns.
+
+    Columns come from the fields of the patch model, never from clients.
+    """
+    query = Query.update(Task_T)
+    for column in columns:
+        query = query.set(column, BIND)
+    query = query.set(Task_T.version, Task_T.version + 1)
+    return f"{query.where(Task_T.id == BIND).get_sql()} AND {VERSION_MATCHES}"
+
+
+# true if no versions are given (NULL) or the row is at one of them
+VERSION_MATCHES = f"(? IS NULL OR version IN ({JSON_IDS}))"
+
+
+def version_params(versions: Collection[int] | None) -> tuple[str | None, ...]:
+    """The parameters of VERSION_MATCHES."""
+    versions_json = to_json(list(versions)).decode() if versions is not None else None
+    return versions_json, versions_json
+
+
+FETCH_TASK_VERSION = Task_T.select(Task_T.version).where(Task_T.id == BIND).get_sql()
+
+
+def task_version_conflict(cur: Cursor, task_id: int) -> LookupError | VersionConflict:
+    """Why a conditional write to a task wrote nothing: gone or changed."""
+    row = cur.execute(FETCH_TASK_VERSION, (task_id,)).fetchone()
+    if row is None:
+        return TasksNotFound([task_id])
+    return VersionConflict("Task", task_id, row[0])
 
 
 def patch_task(
     cur: Cursor,
     task_id: int,
-    patched_task: TaskMoveUpdate | TaskNameUpdate,
+    patched_task: TaskNameUpdate,
+    versions: Collection[int] | None = None,
 ) -> TaskPublic:
+    """Update the given fields of a task, if it is at one of `versions`."""
     fields = patched_task.model_dump(exclude_unset=True, exclude={"id"})
     if not fields:
         raise NoFieldsToUpdate
 
-    update_query = Query.update(Task_T).where(Task_T.id == task_id)
-    for k, v in fields.items():
-        update_query = update_query.set(k, v)
-
-    update_query = update_query.get_sql()
-    cur = cur.execute(update_query)
+    params = (*fields.values(), task_id, *version_params(versions))
+    cur = cur.execute(patch_task_query(tuple(fields)), params)
 
     if cur.rowcount > 1:
         raise MultipleRowsUpdated(cur.rowcount)
-
-    assert cur.rowcount == 1, "Rowcount must be 1 here"
+    if cur.rowcount == 0:
+        raise task_version_conflict(cur, task_id)
+    bump_board_version(cur)
 
     updated_task = fetch_task_by_id(cur, task_id)
     assert updated_task is not None
@@ -280,8 +946,23 @@ def patch_task(
     return updated_task
 
 
-def delete_task_by_id(cur: Cursor, task_id: int) -> int:
-    cur = cur.execute(
-        Query.from_(Task_T).delete().where(Task_T.id == task_id).get_sql()
-    )
-    return cur.rowcount
+DELETE_TASK_BY_ID = (
+    f"{Query.from_(Task_T).delete().where(Task_T.id == BIND).get_sql()}"
+    f" AND {VERSION_MATCHES} RETURNING stage_id"
+)
+
+
+def delete_task_by_id(
+    cur: Cursor, task_id: int, versions: Collection[int] | None = None
+) -> int:
+    """Delete a task if it is at one of `versions`, returning the rows deleted."""
+    rows = cur.execute(DELETE_TASK_BY_ID, (task_id, *version_params(versions)))
+    stage_ids = [row[0] for row in rows.fetchall()]
+    if stage_ids:
+        bump_stage_versions(cur, stage_ids)
+        bump_board_version(cur)
+    elif versions is not None:
+        conflict = task_version_conflict(cur, task_id)
+        if isinstance(conflict, VersionConflict):
+            raise conflict
+    return len(stage_ids)
@@ -13,6 +13,7 @@ class StageCreate(BaseSchema):
 
 class StagePublic(StageCreate):
     id: int
+    version: int
 
     @classmethod
     def from_row(cls, row: sqlite3.Row) -> StagePublic:
@@ -27,12 +28,17 @@ class TaskCreate(BaseSchema):
 class TaskPublic(TaskCreate):
     id: int
     position: int
+    version: int
 
     @classmethod
     def from_row(cls, row: sqlite3.Row) -> TaskPublic:
         return cls(**dict(row))
 
 
+class TasksCreated(BaseSchema):
+    ids: list[int]
+
+
 class TaskNameUpdate(BaseSchema):
     name: str
 
@@ -42,6 +48,14 @@ class TaskMoveUpdate(BaseSchema):
     position: int = Field(alias="to_index")
 
 
+class TaskBulkMove(TaskMoveUpdate):
+    task_id: int
+
+
+class StageOrderUpdate(BaseSchema):
+    task_ids: list[int]
+
+
 class StageDetail(StagePublic):
     tasks: list[TaskPublic] = field(default_factory=list)
 
@@ -52,3 +66,50 @@ class StageDetail(StagePublic):
     def sort_by_position(self) -> Self:
         self.tasks.sort(key=lambda t: t.position)
         return self
+
+
+class StageSummary(StagePublic):
+    task_count: int
+
+
+class TaskPage(BaseSchema):
+    """A window of a stage's tasks and the cursor of the next one, if any."""
+
+    tasks: list[TaskPublic]
+    next: str | None
+
+
+class TaskMatch(TaskCreate):
+    """A task found by search, without its position.
+
+    The position of a task counts the tasks before it in its stage, which is
+    too slow to do for every match on large boards.
+    """
+
+    id: int
+
+
+class TaskMatches(BaseSchema):
+    """A page of search results, best first, and the cursor of the next one."""
+
+    tasks: list[TaskMatch]
+    next: str | None
+
+
+class BoardDelta(BaseSchema):
+    """The tasks changed by a write, tagged with the resulting board version."""
+
+    version: int
+    tasks: list[TaskPublic]
+
+
+# lowercase, so ids name the same file on case-insensitive file systems
+BOARD_ID_PATTERN = r"[a-z0-9][a-z0-9_-]{0,62}"
+
+
+class BoardCreate(BaseSchema):
+    id: str = Field(pattern=f"^{BOARD_ID_PATTERN}$")
+
+
+class BoardPublic(BoardCreate):
+    open: bool
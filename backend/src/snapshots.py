@@ -0,0 +1,246 @@
+"""Snapshots of the database, taken and restored in process.
+
+Binary snapshots (`.db`, optionally gzipped as `.db.gz`) are page-level
+copies made with the sqlite3 online backup API. Text snapshots (`.sql`) are
+SQL dumps, kept so existing snapshots can still be imported and exported.
+Differential snapshots (`.diff`) are JSON files holding only the rows changed
+since a parent snapshot, restored by replaying the chain onto its base.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import sqlite3
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from sqlite3 import Connection
+from typing import Any, Literal, TextIO, TypedDict
+
+from src.changelog import apply_changes
+from src.migrations import TASK_SEARCH, migrate, rebuild_task_search
+
+FullSnapshotFormat = Literal["db", "db.gz", "sql"]
+SnapshotFormat = FullSnapshotFormat | Literal["diff"]
+SNAPSHOT_FORMATS: tuple[SnapshotFormat, ...] = ("db.gz", "db", "sql", "diff")
+
+GZIP_LEVEL = 6
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# row inserts as written by `iterdump` and by the sqlite3 CLI `.dump`
+SQL_INSERT = re.compile(rb'INSERT INTO "?(stage|task)"? VALUES')
+CHANGE_LOG_INSERT = 'INSERT INTO "change_log" '
+# `iterdump` writes the search index as raw rows of its shadow tables
+SEARCH_INDEX_LINES = (
+    "INSERT INTO sqlite_master(type,name,tbl_name,rootpage,sql)"
+    f"VALUES('table','{TASK_SEARCH}',",
+    f'INSERT INTO "{TASK_SEARCH}',
+    f"CREATE TABLE '{TASK_SEARCH}_",
+)
+
+
+class SnapshotStats(TypedDict):
+    size: int
+    sha256: str
+    stages: int
+    tasks: int
+
+
+def snapshot_format(path: Path) -> SnapshotFormat | None:
+    for fmt in SNAPSHOT_FORMATS:
+        if path.name.endswith(f".{fmt}"):
+            return fmt
+    return None
+
+
+@contextmanager
+def scratch_path(path: Path) -> Iterator[Path]:
+    """Yield `path` and remove whatever was written there afterwards."""
+    try:
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """Yield a temporary path that replaces `path` once the block succeeds.
+
+    Readers of `path` never see a partially written snapshot.
+    """
+    with scratch_path(path.with_name(f".{path.name}.tmp")) as tmp:
+        yield tmp
+        tmp.replace(path)
+
+
+def backup_db(conn: Connection, path: Path) -> None:
+    """Copy the database of `conn` into a `.db` or `.db.gz` snapshot.
+
+    The copy runs in a single backup step, so it sees one consistent
+    database state. In WAL mode writers are not blocked meanwhile.
+    """
+    fmt = snapshot_format(path)
+    if fmt not in ("db", "db.gz"):
+        raise ValueError(f"{path} is not a binary snapshot")
+
+    with atomic_path(path) as tmp:
+        if fmt == "db":
+            copy_db(conn, tmp)
+            return
+        with scratch_path(path.with_name(f".{path.name}.db")) as tmp_db:
+            copy_db(conn, tmp_db)
+            with tmp_db.open("rb") as src, gzip.open(tmp, "wb", GZIP_LEVEL) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def copy_db(conn: Connection, path: Path) -> None:
+    target = sqlite3.connect(path)
+    try:
+        conn.backup(target)
+        # the copy inherits WAL mode, keep snapshots single self-contained files
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+
+
+def dump_sql(conn: Connection, file: TextIO) -> None:
+    """Write the database of `conn` as SQL text, including its schema version.
+
+    `iterdump` does not include `PRAGMA user_version`, which is appended so
+    loading the dump does not rerun migrations it already contains. Rows of
+    the change log are left out, restoring a snapshot clears it anyway. So is
+    the search index, which is created again and rebuilt from the tasks.
+    """
+    for line in conn.iterdump():
+        if not line.startswith((CHANGE_LOG_INSERT, *SEARCH_INDEX_LINES)):
+            file.write(f"{line}\n")
+    search_index = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = ?", (TASK_SEARCH,)
+    ).fetchone()
+    if search_index is not None:
+        file.write(f"{search_index[0]};\n")
+        file.write(f"INSERT INTO {TASK_SEARCH} ({TASK_SEARCH}) VALUES ('rebuild');\n")
+    user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    file.write(f"PRAGMA user_version = {user_version};\n")
+
+
+def restore_db(path: Path, conn: Connection) -> None:
+    """Replace the database of `conn` with the snapshot at `path`.
+
+    Binary snapshots are copied page by page. SQL snapshots are executed, so
+    `conn` should be on an empty database for them. Differential snapshots
+    need their chain, see `restore_chain`.
+    """
+    fmt = snapshot_format(path)
+    if fmt == "sql":
+        conn.executescript(path.read_text(encoding="utf-8"))
+    elif fmt == "db":
+        restore_from_file(path, conn)
+    elif fmt == "db.gz":
+        with scratch_path(path.with_name(f".{path.name}.db")) as tmp:
+            with gzip.open(path, "rb") as src, tmp.open("wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            restore_from_file(tmp, conn)
+    elif fmt == "diff":
+        raise ValueError(f"{path} is a differential snapshot")
+    else:
+        raise ValueError(f"{path} is not a snapshot")
+
+
+def restore_chain(chain: Sequence[Path], conn: Connection) -> None:
+    """Restore a full snapshot and replay the differential ones built on it.
+
+    The base is migrated first, so the diffs apply to the current schema.
+    Replayed rows replace existing ones without firing delete triggers, so
+    the search index is rebuilt afterwards.
+    """
+    base, *diffs = chain
+    restore_db(base, conn)
+    cur = conn.cursor()
+    migrate(cur)
+    for path in diffs:
+        apply_changes(cur, read_diff(path)["changes"])
+    if diffs:
+        rebuild_task_search(cur)
+
+
+def write_diff(path: Path, diff: dict[str, Any]) -> None:
+    with atomic_path(path) as tmp:
+        tmp.write_text(json.dumps(diff), encoding="utf-8")
+
+
+def read_diff(path: Path) -> dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def restore_from_file(path: Path, conn: Connection) -> None:
+    source = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+
+
+def snapshot_stats(path: Path) -> SnapshotStats:
+    """Size, checksum and row counts of a snapshot.
+
+    Binary snapshots are counted with a query on an immutable connection,
+    SQL snapshots by their INSERT statements while hashing them. Differential
+    snapshots count the rows they change.
+    """
+    fmt = snapshot_format(path)
+    if fmt == "sql":
+        digest = hashlib.sha256()
+        counts = {"stage": 0, "task": 0}
+        with path.open("rb") as f:
+            for line in f:
+                digest.update(line)
+                if match := SQL_INSERT.match(line):
+                    counts[match[1].decode()] += 1
+        sha256 = digest.hexdigest()
+    elif fmt == "db":
+        sha256 = file_sha256(path)
+        counts = count_rows(path)
+    elif fmt == "db.gz":
+        sha256 = file_sha256(path)
+        with scratch_path(path.with_name(f".{path.name}.db")) as tmp:
+            with gzip.open(path, "rb") as src, tmp.open("wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            counts = count_rows(tmp)
+    elif fmt == "diff":
+        sha256 = file_sha256(path)
+        changes = read_diff(path)["changes"]
+        counts = {
+            table: len(changes["upserts"][table]) + len(changes["deletes"][table])
+            for table in ("stage", "task")
+        }
+    else:
+        raise ValueError(f"{path} is not a snapshot")
+
+    return SnapshotStats(
+        size=path.stat().st_size,
+        sha256=sha256,
+        stages=counts["stage"],
+        tasks=counts["task"],
+    )
+
+
+def file_sha256(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def count_rows(path: Path) -> dict[str, int]:
+    # immutable: no locking and no -wal/-shm files next to the snapshot
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?immutable=1", uri=True)
+    try:
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("stage", "task")
+        }
+    finally:
+        conn.close()
@@ -0,0 +1,124 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_201_CREATED,
+    HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT,
+    HTTP_422_UNPROCESSABLE_CONTENT,
+)
+
+from src import dev_utils
+from src.boards import BoardNotFound, Boards
+from src.main import app, open_board
+
+
+def add_task(client: TestClient, prefix: str, name: str) -> None:
+    stage = client.post(f"{prefix}/stages", json={"name": "Todo"}).json()
+    response = client.post(
+        f"{prefix}/tasks", json={"name": name, "stage_id": stage["id"]}
+    )
+    assert response.status_code == HTTP_201_CREATED
+
+
+def task_names(client: TestClient, prefix: str) -> list[str]:
+    response = client.get(f"{prefix}/tasks")
+    assert response.status_code == HTTP_200_OK
+    return [task["name"] for task in response.json()]
+
+
+def test_boards_are_separate_databases(client: TestClient) -> None:
+    for board_id in ("one", "two"):
+        assert client.post("/boards", json={"id": board_id}).status_code == (
+            HTTP_201_CREATED
+        )
+
+    add_task(client, "/boards/one", "a")
+    add_task(client, "/boards/two", "b")
+    add_task(client, "", "c")
+
+    assert task_names(client, "/boards/one") == ["a"]
+    assert task_names(client, "/boards/two") == ["b"]
+    assert task_names(client, "") == ["c"]
+    assert app.state.boards.path("one").exists()
+
+
+def test_board_ids(client: TestClient) -> None:
+    client.post("/boards", json={"id": "one"})
+
+    assert client.post("/boards", json={"id": "one"}).status_code == HTTP_409_CONFLICT
+    assert client.post("/boards", json={"id": "../one"}).status_code == (
+        HTTP_422_UNPROCESSABLE_CONTENT
+    )
+    assert client.get("/boards/two/tasks").status_code == HTTP_404_NOT_FOUND
+    assert client.get("/boards/ONE/tasks").status_code == HTTP_404_NOT_FOUND
+
+
+def test_least_recently_used_boards_are_closed(client: TestClient) -> None:
+    # the fixture keeps at most two boards open
+    for board_id in ("one", "two", "three"):
+        client.post("/boards", json={"id": board_id})
+        add_task(client, f"/boards/{board_id}", board_id)
+
+    boards = client.get("/boards").json()
+
+    assert boards == [
+        {"id": "one", "open": False},
+        {"id": "three", "open": True},
+        {"id": "two", "open": True},
+    ]
+    # reopened on the next request, with its tasks
+    assert task_names(client, "/boards/one") == ["one"]
+    assert not app.state.boards.is_open("two")
+
+
+def test_boards_in_use_stay_open(tmp_path: Path) -> None:
+    boards = Boards(tmp_path, open_board, max_open=1)
+    for board_id in ("one", "two"):
+        boards.create(board_id)
+
+    async def main() -> None:
+        one = await boards.acquire("one")
+        await boards.acquire("two")
+        await boards.release("two")
+        assert (boards.is_open("one"), boards.is_open("two")) == (True, False)
+
+        # concurrent requests share one opening
+        two, again = await asyncio.gather(boards.acquire("two"), boards.acquire("two"))
+        assert two is again
+        await boards.release("one")
+        assert not boards.is_open("one") and one.pool.closed
+        await boards.release("two")
+        await boards.release("two")
+
+        with pytest.raises(BoardNotFound):
+            await boards.acquire("three")
+
+    asyncio.run(main())
+    boards.close()
+
+
+def test_snapshots_move_between_boards(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    snapshots_path = tmp_path / "snapshots"
+    snapshots_path.mkdir()
+    monkeypatch.setattr(dev_utils, "DB_SNAPSHOTS_PATH", snapshots_path)
+    monkeypatch.setattr(dev_utils, "CURRENT_SNAPSHOT_PATH", snapshots_path / ".current")
+    for board_id in ("one", "two"):
+        client.post("/boards", json={"id": board_id})
+    add_task(client, "/boards/one", "a")
+
+    response = client.post(
+        "/boards/one/dev/snapshots/save",
+        json={"name": "one", "comment": "board one", "format": "sql"},
+    )
+    assert response.status_code == HTTP_201_CREATED
+    response = client.post("/boards/two/dev/snapshots/load", json={"name": "one.sql"})
+    assert response.status_code == HTTP_200_OK
+
+    assert task_names(client, "/boards/two") == ["a"]
+    assert task_names(client, "") == []
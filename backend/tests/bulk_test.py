@@ -0,0 +1,130 @@
+import json
+from sqlite3 import Cursor
+from typing import Callable
+
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_201_CREATED, HTTP_422_UNPROCESSABLE_CONTENT
+
+from src.main import app
+from src.repository import (
+    fetch_all_tasks_by_stage_id,
+    fetch_board_version,
+    insert_tasks,
+)
+from src.schemas import StagePublic, TaskCreate, TaskPublic
+
+
+def test_insert_tasks_appends_per_stage(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, existing = setup_stage_tasks("Todo", "a")
+    done, _ = setup_stage_tasks("Done")
+    version = fetch_board_version(cur)
+
+    ids = insert_tasks(
+        cur,
+        [
+            TaskCreate(name="b", stage_id=todo.id),
+            TaskCreate(name="c", stage_id=done.id),
+            TaskCreate(name="d", stage_id=todo.id),
+        ],
+    )
+
+    todo_tasks = fetch_all_tasks_by_stage_id(cur, todo.id)
+    done_tasks = fetch_all_tasks_by_stage_id(cur, done.id)
+    assert [t.id for t in todo_tasks] == [existing[0].id, ids[0], ids[2]]
+    assert [t.name for t in todo_tasks] == ["a", "b", "d"]
+    assert [t.id for t in done_tasks] == [ids[1]]
+    assert fetch_board_version(cur) == version + 1
+
+
+def test_insert_tasks_spans_multiple_batches(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo")
+    names = [f"Task {i}" for i in range(1_234)]
+
+    ids = insert_tasks(
+        cur, [TaskCreate(name=name, stage_id=stage.id) for name in names]
+    )
+
+    tasks = fetch_all_tasks_by_stage_id(cur, stage.id)
+    assert [t.id for t in tasks] == ids
+    assert [t.name for t in tasks] == names
+
+
+def test_bulk_create_from_json_array(
+    client: TestClient,
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo")
+
+    response = client.post(
+        "/tasks/bulk",
+        json=[{"name": "a", "stage_id": stage.id}, {"name": "b", "stage_id": stage.id}],
+    )
+
+    assert response.status_code == HTTP_201_CREATED
+    ids = response.json()["ids"]
+    assert [t.id for t in fetch_all_tasks_by_stage_id(cur, stage.id)] == ids
+
+
+def test_bulk_create_from_ndjson(
+    client: TestClient,
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo")
+    lines = [json.dumps({"name": f"Task {i}", "stage_id": stage.id}) for i in range(3)]
+
+    response = client.post(
+        "/tasks/bulk",
+        content="\n".join(lines) + "\n\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == HTTP_201_CREATED
+    tasks = fetch_all_tasks_by_stage_id(cur, stage.id)
+    assert [t.name for t in tasks] == ["Task 0", "Task 1", "Task 2"]
+
+
+def test_bulk_create_reports_invalid_ndjson_line(
+    client: TestClient,
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo")
+    body = "\n".join(
+        [json.dumps({"name": "ok", "stage_id": stage.id}), json.dumps({"name": "x"})]
+    )
+
+    response = client.post(
+        "/tasks/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == HTTP_422_UNPROCESSABLE_CONTENT
+    assert response.json()["detail"][0]["loc"] == ["body", 2, "stage_id"]
+    assert fetch_all_tasks_by_stage_id(cur, stage.id) == []
+
+
+def test_bulk_create_parses_body_before_taking_writer(
+    client: TestClient,
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo")
+
+    # with the writer busy, an invalid body must still be rejected right away
+    with app.state.pool.write():
+        response = client.post(
+            "/tasks/bulk",
+            content=json.dumps({"name": "x"}),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+    assert response.status_code == HTTP_422_UNPROCESSABLE_CONTENT
@@ -0,0 +1,157 @@
+import asyncio
+import threading
+from sqlite3 import Cursor
+from typing import Callable
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+from starlette.types import Message, Receive, Scope, Send
+
+from src.cache import BoardCache, etag_matches, if_match_versions
+from src.helpers import load_cached_board
+from src.main import app
+from src.repository import fetch_board_version
+from src.schemas import StagePublic, TaskPublic
+
+
+def test_cache_ignores_stale_loads() -> None:
+    cache = BoardCache()
+    cache.update(3)
+
+    cache.put("stages", 2, ["stale"])
+    assert cache.get("stages") is None
+
+    cache.put("stages", 3, ["fresh"])
+    assert cache.get("stages") == (3, ["fresh"])
+
+    cache.update(4)
+    assert cache.get("stages") is None
+
+
+def test_etag_matches() -> None:
+    assert etag_matches('"3"', '"3"')
+    assert etag_matches('W/"3", "4"', '"3"')
+    assert etag_matches("*", '"3"')
+    assert not etag_matches('"2"', '"3"')
+    assert not etag_matches(None, '"3"')
+
+
+def test_if_match_versions() -> None:
+    assert if_match_versions(None) is None
+    assert if_match_versions("*") is None
+    assert if_match_versions('"3", "4"') == {3, 4}
+    # If-Match compares strongly
+    assert if_match_versions('W/"3"') == set()
+    assert if_match_versions('"x"') == set()
+
+
+def test_board_read_returns_etag_and_304(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a", "b")
+
+    response = client.get("/stages/tasks")
+    assert response.status_code == HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    response = client.get("/stages/tasks", headers={"If-None-Match": etag})
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+
+
+def test_etag_is_exposed_to_the_frontend(client: TestClient) -> None:
+    response = client.get("/stages/tasks", headers={"Origin": "http://localhost:5173"})
+
+    assert "ETag" in response.headers["Access-Control-Expose-Headers"]
+
+
+def test_cached_board_is_served_without_database(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a", "b")
+    board = client.get("/stages/tasks").json()
+    etag = client.get("/tasks").headers["ETag"]
+
+    app.state.pool.close()
+
+    assert client.get("/stages/tasks").json() == board
+    response = client.get("/tasks", headers={"If-None-Match": etag})
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+
+
+def test_writes_invalidate_cached_board(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo", "a")
+    response = client.get("/stages/tasks")
+    etag = response.headers["ETag"]
+
+    client.post("/tasks", json={"name": "b", "stage_id": stage.id})
+
+    response = client.get("/stages/tasks", headers={"If-None-Match": etag})
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["ETag"] != etag
+    assert [task["name"] for task in response.json()[0]["tasks"]] == ["a", "b"]
+
+
+def test_revalidation_after_write_response_is_not_stale(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo", "a")
+    etag = client.get("/stages/tasks").headers["ETag"]
+    revalidated: list[int] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        async def revalidate_on_start(message: Message) -> None:
+            if message["type"] == "http.response.start" and scope["method"] == "POST":
+                # the client has its answer, so it may revalidate right away
+                response = client.get("/stages/tasks", headers={"If-None-Match": etag})
+                revalidated.append(response.status_code)
+            await send(message)
+
+        await client.app(scope, receive, revalidate_on_start)
+
+    TestClient(app).post("/tasks", json={"name": "b", "stage_id": stage.id})
+
+    assert revalidated == [HTTP_200_OK]
+
+
+def test_concurrent_misses_share_one_load(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a")
+    request = Request({"type": "http", "app": app})
+    loads: list[int] = []
+    release = threading.Event()
+
+    def load(cur: Cursor) -> bytes:
+        loads.append(fetch_board_version(cur))
+        release.wait()
+        return b"[]"
+
+    async def main() -> list[tuple[int, bytes]]:
+        first = [
+            asyncio.ensure_future(load_cached_board(request, "k", load))
+            for _ in range(5)
+        ]
+        while not loads:
+            await asyncio.sleep(0.001)
+        # after a write, the running load may miss it and is not shared
+        app.state.board_cache.update(100)
+        after_write = asyncio.ensure_future(load_cached_board(request, "k", load))
+        await asyncio.sleep(0.01)
+        assert len(loads) == 1
+
+        release.set()
+        return await asyncio.gather(*first, after_write)
+
+    results = asyncio.run(main())
+
+    assert len(loads) == 2
+    assert len({version for version, _ in results[:5]}) == 1
@@ -0,0 +1,67 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from src import catalog
+from src.catalog import SnapshotCatalog
+
+
+class CountingDescribe:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def __call__(self, path: Path) -> dict[str, Any]:
+        self.calls.append(path.name)
+        return {"name": path.name, "text": path.read_text()}
+
+
+@pytest.fixture(autouse=True)
+def no_racy_window(monkeypatch: pytest.MonkeyPatch) -> None:
+    # files written by the tests are younger than the racy window
+    monkeypatch.setattr(catalog, "RACY_WINDOW_NS", -(10**12))
+
+
+def test_catalog_only_describes_new_and_changed_files(tmp_path: Path) -> None:
+    (tmp_path / "a.sql").write_text("a")
+    (tmp_path / "b.sql").write_text("b")
+    (tmp_path / "notes.txt").write_text("not a snapshot")
+    describe = CountingDescribe()
+    snapshots = SnapshotCatalog(tmp_path, describe)
+
+    assert [e["name"] for e in snapshots.entries()] == ["a.sql", "b.sql"]
+    assert snapshots.entries() == snapshots.entries()
+    assert describe.calls == ["a.sql", "b.sql"]
+
+    (tmp_path / "a.sql").unlink()
+    (tmp_path / "c.db").write_text("c")
+    (tmp_path / "b.sql").write_text("b, changed")
+
+    assert snapshots.entries() == [
+        {"name": "b.sql", "text": "b, changed"},
+        {"name": "c.db", "text": "c"},
+    ]
+    assert describe.calls == ["a.sql", "b.sql", "b.sql", "c.db"]
+
+
+def test_catalog_skips_scan_while_directory_is_unchanged(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "a.sql").write_text("a")
+    snapshots = SnapshotCatalog(tmp_path, CountingDescribe())
+    snapshots.entries()
+
+    def fail_scan(*args: object) -> dict[str, Any]:
+        raise AssertionError("directory was rescanned")
+
+    monkeypatch.setattr(snapshots, "_scan", fail_scan)
+    assert snapshots.get("a.sql") == {"name": "a.sql", "text": "a"}
+
+
+def test_catalog_index_is_persisted(tmp_path: Path) -> None:
+    (tmp_path / "a.sql").write_text("a")
+    SnapshotCatalog(tmp_path, CountingDescribe()).entries()
+
+    describe = CountingDescribe()
+    assert SnapshotCatalog(tmp_path, describe).get("a.sql") is not None
+    assert describe.calls == []
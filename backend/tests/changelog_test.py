@@ -0,0 +1,108 @@
+from pathlib import Path
+from sqlite3 import Cursor
+from typing import Callable
+
+import pytest
+
+from src.changelog import (
+    NotAnAncestor,
+    apply_changes,
+    fetch_changes,
+    fetch_lineage,
+    fetch_log_seq_at,
+    reset_change_log,
+)
+from src.helpers import init_conn, init_schema
+from src.repository import DEFAULT_SCHEMA, delete_task_by_id
+from src.schemas import StagePublic, TaskPublic
+from src.snapshots import backup_db, restore_db
+
+
+def rows(cur: Cursor) -> list[tuple]:
+    return [
+        tuple(row)
+        for table in ("stage", "task")
+        for row in cur.execute(f"SELECT * FROM {table} ORDER BY id")
+    ]
+
+
+def test_changes_bring_a_copy_up_to_date(
+    cur: Cursor,
+    tmp_path: Path,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, tasks = setup_stage_tasks("Todo", "a", "b")
+    backup_db(cur.connection, tmp_path / "base.db")
+    base = fetch_lineage(cur)
+
+    setup_stage_tasks("Done", "c")
+    cur.execute("UPDATE task SET name = 'renamed' WHERE id = ?", (tasks[0].id,))
+    delete_task_by_id(cur, tasks[1].id)
+    cur.execute("UPDATE stage SET name = 'Doing' WHERE id = ?", (stage.id,))
+    cur.connection.commit()
+
+    changes = fetch_changes(cur, fetch_log_seq_at(cur, base))
+    assert changes["deletes"] == {"stage": [], "task": [tasks[1].id]}
+    assert len(changes["upserts"]["task"]) == 2
+
+    conn = init_conn(tmp_path / "copy.db")
+    restore_db(tmp_path / "base.db", conn)
+    apply_changes(conn.cursor(), changes)
+    conn.commit()
+    assert rows(conn.cursor()) == rows(cur)
+
+    # the copy keeps counting ids where the original is
+    new_ids = [
+        c.execute(
+            "INSERT INTO task (name, stage_id, position) VALUES ('x', 1, 0)"
+        ).lastrowid
+        for c in (cur, conn.cursor())
+    ]
+    assert new_ids[0] == new_ids[1]
+    conn.close()
+
+
+def test_reset_change_log_bases_the_log_on_a_snapshot(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a")
+    before = fetch_lineage(cur)
+    snapshot = {"generation": "other", "seq": 7}
+
+    reset_change_log(cur, snapshot)
+    cur.connection.commit()
+    setup_stage_tasks("Done", "b")
+
+    assert fetch_lineage(cur)["generation"] != before["generation"]
+    changes = fetch_changes(cur, fetch_log_seq_at(cur, snapshot))
+    assert [row[1] for row in changes["upserts"]["task"]] == ["b"]
+    with pytest.raises(NotAnAncestor):
+        fetch_log_seq_at(cur, before)
+
+
+def test_writes_are_logged_from_the_start(tmp_path: Path) -> None:
+    conn = init_conn(tmp_path / "test.db")
+    cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+    assert cur.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 0
+    cur.execute("INSERT INTO stage (name) VALUES ('Todo')")
+    logged = cur.execute("SELECT tbl, row_id FROM change_log").fetchall()
+    assert [tuple(row) for row in logged] == [("stage", 1)]
+    conn.close()
+
+
+def test_rewritten_rows_are_logged_once(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, [task] = setup_stage_tasks("Todo", "a")
+    since = fetch_lineage(cur)["seq"]
+    for name in ("b", "c", "d"):
+        cur.execute("UPDATE task SET name = ? WHERE id = ?", (name, task.id))
+    cur.connection.commit()
+
+    assert cur.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 2
+    changes = fetch_changes(cur, since)
+    assert changes["upserts"]["task"] == [
+        [task.id, "d", task.stage_id, 0, task.version]
+    ]
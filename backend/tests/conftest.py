@@ -0,0 +1,85 @@
+from pathlib import Path
+from sqlite3 import Cursor
+from typing import Callable, Generator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.boards import Boards
+from src.cache import BoardCache
+from src.events import BoardEvents
+from src.executor import DatabaseExecutor
+from src.helpers import open_pool
+from src.main import app, init_schema, init_conn, open_board
+from src.repository import (
+    fetch_board_version,
+    insert_stage,
+    insert_task,
+    DEFAULT_SCHEMA,
+)
+from src.schemas import StageCreate, StagePublic, TaskCreate, TaskPublic
+
+
+@pytest.fixture(name="db_path")
+def db_path_fixture(tmp_path: Path) -> Path:
+    return tmp_path / "test.db"
+
+
+@pytest.fixture(name="client")
+def client_fixture(cur: Cursor, db_path: Path) -> Generator[TestClient, None, None]:
+    app.state.pool = open_pool(db_path, size=2, timeout=1)
+    app.state.db_executor = DatabaseExecutor(readers=2)
+    app.state.board_cache = BoardCache()
+    app.state.board_events = BoardEvents(fetch_board_version(cur))
+    app.state.boards = Boards(db_path.parent / "boards", open_board, max_open=2)
+    app.state.metrics = None
+
+    yield TestClient(app)
+
+    app.state.boards.close()
+    app.state.db_executor.shutdown()
+    app.state.pool.close()
+
+
+@pytest.fixture(name="cur")
+def cursor_fixture(db_path: Path) -> Generator[Cursor, None, None]:
+    conn = init_conn(db_path)
+    cur = conn.cursor()
+    cur = init_schema(cur, DEFAULT_SCHEMA)
+
+    yield cur
+
+    cur.close()
+    conn.close()
+
+
+@pytest.fixture(name="setup_stage_tasks")
+def setup_stage_tasks_fixture(
+    cur: Cursor,
+) -> Callable[..., tuple[StagePublic, list[TaskPublic]]]:
+    def _create(stage_name: str, *task_names: str):
+        stage = insert_stage(cur, StageCreate(name=stage_name))
+        tasks = [
+            insert_task(cur, TaskCreate(name=name, stage_id=stage.id))
+            for name in task_names
+        ]
+        cur.connection.commit()
+        return stage, tasks
+
+    return _create
+
+
+@pytest.fixture(name="setup_stage_with_n_tasks")
+def setup_stage_with_n_tasks_fixture(
+    cur: Cursor,
+) -> Callable[..., tuple[StagePublic, list[TaskPublic]]]:
+    def _create(stage_name: str, num_tasks: int):
+        stage = insert_stage(cur, StageCreate(name=stage_name))
+        tasks = [
+            insert_task(cur, TaskCreate(name=f"Task {i + 1}", stage_id=stage.id))
+            for i in range(num_tasks)
+        ]
+        cur.connection.commit()
+        return stage, tasks
+
+    return _create
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+from typing import Callable
+
+from fastapi.testclient import TestClient
+
+from src.events import KEEP_ALIVE, BoardEvent, BoardEvents
+from src.main import app
+from src.schemas import StagePublic, TaskPublic
+
+
+def parse_events(stream: bytes) -> list[tuple[int, str, dict]]:
+    events = []
+    for frame in stream.decode().split("\n\n"):
+        if not frame or frame.startswith(":"):
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def take(events: BoardEvents, since: int | None, count: int) -> bytes:
+    stream = events.subscribe(since)
+    frames = [await anext(stream) for _ in range(count)]
+    await stream.aclose()
+    return b"".join(frames)
+
+
+def test_subscribers_resume_from_their_version() -> None:
+    events = BoardEvents(version=10, history=3)
+    for version in range(11, 15):
+        events.publish(version, BoardEvent("task.deleted", {"id": version}))
+
+    # 11 fell out of the history, so 12 to 14 can only be replayed after 11
+    replayed = parse_events(asyncio.run(take(events, 11, 1)))
+    assert [version for version, _, _ in replayed] == [12, 13, 14]
+
+    assert parse_events(asyncio.run(take(events, 10, 1))) == [
+        (14, "reset", {"version": 14})
+    ]
+
+
+def test_publish_skipping_versions_drops_the_history() -> None:
+    events = BoardEvents(version=1)
+    events.publish(2, BoardEvent("task.deleted", {"id": 1}))
+    events.publish(5, BoardEvent("task.deleted", {"id": 2}))
+    events.publish(4, BoardEvent("task.deleted", {"id": 3}))
+
+    assert events.version == 5
+    assert parse_events(asyncio.run(take(events, 2, 1)))[0][1] == "reset"
+    assert parse_events(asyncio.run(take(events, 4, 1))) == [
+        (5, "task.deleted", {"id": 2})
+    ]
+
+
+def test_publish_from_another_thread_wakes_every_subscriber() -> None:
+    events = BoardEvents(version=0)
+
+    async def main() -> list[bytes]:
+        subscribers = [asyncio.ensure_future(take(events, None, 1)) for _ in range(100)]
+        await asyncio.sleep(0)
+        publisher = threading.Thread(
+            target=events.publish, args=(1, BoardEvent("task.deleted", {"id": 1}))
+        )
+        publisher.start()
+        publisher.join()
+        return await asyncio.wait_for(asyncio.gather(*subscribers), timeout=1)
+
+    streams = asyncio.run(main())
+    assert {stream for stream in streams} == {
+        b'id: 1\nevent: task.deleted\ndata: {"id":1}\n\n'
+    }
+
+
+def test_idle_subscribers_get_keep_alives(monkeypatch) -> None:
+    monkeypatch.setattr("src.events.KEEP_ALIVE_SECONDS", 0.01)
+    assert asyncio.run(take(BoardEvents(version=0), None, 1)) == KEEP_ALIVE
+
+
+def test_writes_publish_events_in_order(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, (a, b) = setup_stage_tasks("Todo", "a", "b")
+    since = int(client.get("/stages/tasks").headers["ETag"].strip('"'))
+
+    created = client.post("/tasks", json={"name": "c", "stage_id": stage.id}).json()
+    client.patch(f"/tasks/{a.id}", json={"name": "A"})
+    client.patch(f"/tasks/{b.id}/move", json={"stage_id": stage.id, "to_index": 0})
+    client.delete(f"/tasks/{created['id']}")
+    client.delete(f"/tasks/{created['id']}")  # not found, nothing is published
+    new_stage = client.post("/stages", json={"name": "Done"}).json()
+
+    app.state.board_events.close()  # ends the stream once it is replayed
+    response = client.get("/events", params={"since": since})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.content)
+    versions = [version for version, _, _ in events]
+    assert versions == list(range(since + 1, since + 6))
+    assert [name for _, name, _ in events] == [
+        "task.created",
+        "task.updated",
+        "tasks.moved",
+        "task.deleted",
+        "stage.created",
+    ]
+    assert events[0][2] == created
+    assert events[1][2] == {**a.model_dump(), "name": "A", "version": 2}
+    moved = events[2][2]
+    assert moved["version"] == versions[2]
+    assert [task["id"] for task in moved["tasks"]] == [b.id, a.id]
+    assert events[3][2] == {"id": created["id"]}
+    assert events[4][2] == new_stage
+
+
+def test_last_event_id_takes_precedence_over_since(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo")
+    since = int(client.get("/stages/tasks").headers["ETag"].strip('"'))
+    for name in ("a", "b"):
+        client.post("/tasks", json={"name": name, "stage_id": stage.id})
+
+    app.state.board_events.close()
+    response = client.get(
+        "/events", params={"since": since}, headers={"Last-Event-ID": str(since + 1)}
+    )
+
+    assert [version for version, _, _ in parse_events(response.content)] == [since + 2]
+
+
+def test_reset_publishes_board_replaced(client: TestClient) -> None:
+    since = app.state.board_events.version
+
+    client.post("/reset")
+
+    app.state.board_events.close()
+    response = client.get("/events", params={"since": since})
+    assert parse_events(response.content) == [
+        (since + 1, "board.replaced", {"version": since + 1})
+    ]
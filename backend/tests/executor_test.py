@@ -0,0 +1,139 @@
+import asyncio
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from sqlite3 import Cursor
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK
+
+from src.executor import GroupCommit, WorkQueue
+from src.helpers import open_pool
+from src.main import app
+from src.schemas import StagePublic, TaskPublic
+
+
+def test_work_queue_counts_queued_calls() -> None:
+    queue = WorkQueue("test", 1)
+    release = threading.Event()
+
+    async def main() -> list[int]:
+        blocked = asyncio.ensure_future(queue.run(release.wait))
+        waiting = [asyncio.ensure_future(queue.run(lambda: 1)) for _ in range(3)]
+        while queue.stats()["running"] == 0:
+            await asyncio.sleep(0.001)
+        assert queue.stats()["queued"] == 3
+
+        release.set()
+        await blocked
+        return await asyncio.gather(*waiting)
+
+    assert asyncio.run(main()) == [1, 1, 1]
+    stats = queue.stats()
+    assert (stats["queued"], stats["running"], stats["completed"]) == (0, 0, 4)
+    assert stats["max_queued"] == 3
+    queue.shutdown()
+
+
+def test_reads_are_served_while_the_writer_is_busy(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a")
+
+    with app.state.pool.write():
+        response = client.get("/stages/tasks")
+
+    assert response.status_code == HTTP_200_OK
+    assert [t["name"] for t in response.json()[0]["tasks"]] == ["a"]
+
+
+def test_executor_stats(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_tasks("Todo")
+    client.post("/tasks", json={"name": "a", "stage_id": stage.id})
+    client.get("/stages/tasks")
+
+    stats = client.get("/executor/stats").json()
+
+    assert stats["write"]["workers"] == 1
+    assert stats["write"]["completed"] == 1
+    assert stats["read"]["completed"] == 1
+    assert stats["read"]["queued"] == 0
+
+
+def test_group_commit_batches_waiting_writes(tmp_path: Path) -> None:
+    pool = open_pool(tmp_path / "batch.db", size=1, timeout=1)
+    with pool.write() as cur:
+        cur.execute("CREATE TABLE t (x INTEGER)")
+    queue = WorkQueue("test", 1)
+    commits = GroupCommit(queue)
+    transactions = 0
+    release = threading.Event()
+
+    @contextmanager
+    def transaction() -> Iterator[Cursor]:
+        nonlocal transactions
+        transactions += 1
+        with pool.write() as cur:
+            yield cur
+
+    def insert(x: int) -> Callable[[Cursor], int]:
+        def write(cur: Cursor) -> int:
+            rowcount = cur.execute("INSERT INTO t VALUES (?)", (x,)).rowcount
+            if x == 2:
+                raise ValueError("rejected")
+            return rowcount
+
+        return write
+
+    async def main() -> list[int | BaseException]:
+        blocked = asyncio.ensure_future(queue.run(release.wait))
+        writes = [
+            asyncio.ensure_future(commits.run(transaction, insert(x))) for x in range(5)
+        ]
+        while queue.stats()["queued"] < 5:
+            await asyncio.sleep(0.001)
+        release.set()
+        await blocked
+        return await asyncio.gather(*writes, return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert results[:2] == [1, 1] and results[3:] == [1, 1]
+    assert isinstance(results[2], ValueError)
+    # all five waited for the blocked thread, so they shared one commit
+    assert transactions == 1
+    with pool.read() as cur:
+        assert [row[0] for row in cur.execute("SELECT x FROM t")] == [0, 1, 3, 4]
+    queue.shutdown()
+    pool.close()
+
+
+def test_group_commit_rejects_empty_batches() -> None:
+    with pytest.raises(ValueError):
+        GroupCommit(WorkQueue("test", 1), max_batch=0)
+
+
+def test_rename_is_committed_before_the_response(
+    client: TestClient,
+    db_path: Path,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, (task,) = setup_stage_tasks("Todo", "a")
+
+    response = client.patch(f"/tasks/{task.id}", json={"name": "renamed"})
+
+    assert response.status_code == HTTP_200_OK
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT name FROM task WHERE id = ?", (task.id,)).fetchone()
+    finally:
+        conn.close()
+    assert row == ("renamed",)
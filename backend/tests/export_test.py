@@ -0,0 +1,131 @@
+import asyncio
+import csv
+import io
+import json
+import tracemalloc
+from sqlite3 import Cursor
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK
+from starlette.types import Message
+
+from src import main
+from src.main import app
+from src.schemas import StagePublic, TaskPublic
+
+
+def test_export_ndjson_and_csv(
+    client: TestClient,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, tasks = setup_stage_with_n_tasks("Todo", 3)
+    setup_stage_with_n_tasks("Done", 2)
+    client.patch(
+        f"/tasks/{tasks[2].id}/move", json={"stage_id": todo.id, "to_index": 0}
+    )
+    board = [
+        task for stage in client.get("/stages/tasks").json() for task in stage["tasks"]
+    ]
+
+    response = client.get("/tasks/export")
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == board
+
+    response = client.get("/tasks/export", params={"format": "csv"})
+    assert response.headers["content-disposition"].endswith('filename="tasks.csv"')
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert rows == [{key: str(value) for key, value in task.items()} for task in board]
+
+    # the reader went back to the pool, both readers can be taken at once
+    with app.state.pool.read(), app.state.pool.read():
+        pass
+
+
+def test_failed_export_releases_its_reader(
+    client: TestClient,
+    monkeypatch: pytest.MonkeyPatch,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_with_n_tasks("Todo", 3)
+    iter_all_tasks = main.iter_all_tasks
+
+    def fail_after_first_chunk(cur: Cursor, size: int):
+        chunks = iter_all_tasks(cur, 1)
+        yield next(chunks)
+        raise RuntimeError("export failed")
+
+    monkeypatch.setattr(main, "iter_all_tasks", fail_after_first_chunk)
+    # more exports than the pool has readers
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            client.get("/tasks/export")
+
+    assert client.get("/stages/tasks").status_code == HTTP_200_OK
+    with app.state.pool.read(), app.state.pool.read():
+        pass
+
+
+async def export_size(path: str, query: bytes) -> int:
+    """Run the export through the app, counting and dropping the body."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "root_path": "",
+        "headers": [],
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+        "app": app,
+    }
+    requested = False
+    size = 0
+
+    async def receive() -> Message:
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # the client never leaves
+        raise AssertionError
+
+    async def send(message: Message) -> None:
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return size
+
+
+NUM_TASKS = 1_000_000
+
+
+def test_export_memory_stays_flat(client: TestClient, cur: Cursor) -> None:
+    cur.execute("INSERT INTO stage (name) VALUES ('Huge')")
+    cur.execute(
+        """
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO task (name, stage_id, position) SELECT 'Task ' || i, 1, i FROM n
+        """,
+        (NUM_TASKS - 1,),
+    )
+    cur.connection.commit()
+
+    tracemalloc.start()
+    try:
+        size = asyncio.run(export_size("/tasks/export", b"format=ndjson"))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert size > 50_000_000
+    # a small fraction of the output, which is never held as a whole
+    assert peak < 5_000_000
@@ -0,0 +1,71 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_201_CREATED
+from starlette.types import Message, Receive, Scope, Send
+
+from src.helpers import StorageProfile, init_conn, open_pool
+
+
+def test_init_conn_applies_storage_profile(tmp_path: Path) -> None:
+    profile = StorageProfile(cache_size=-8_000, busy_timeout=1_234)
+    conn = init_conn(tmp_path / "test.db", profile)
+
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -8_000
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1_234
+    assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+    conn.close()
+
+
+def test_pool_connections_use_storage_profile(tmp_path: Path) -> None:
+    profile = StorageProfile(busy_timeout=4_321)
+    pool = open_pool(tmp_path / "test.db", size=1, timeout=1, profile=profile)
+
+    with pool.read() as cur:
+        assert cur.execute("PRAGMA busy_timeout").fetchone()[0] == 4_321
+    with pool.write() as cur:
+        assert cur.execute("PRAGMA busy_timeout").fetchone()[0] == 4_321
+
+    pool.close()
+    assert not (tmp_path / "test.db-wal").exists() or (
+        (tmp_path / "test.db-wal").stat().st_size == 0
+    )
+
+
+def test_storage_profile_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SQLITE_JOURNAL_MODE", "DELETE")
+    monkeypatch.setenv("SQLITE_MMAP_SIZE", "0")
+
+    profile = StorageProfile.from_env()
+
+    assert profile.journal_mode == "delete"
+    assert profile.mmap_size == 0
+    assert profile.synchronous == StorageProfile().synchronous
+
+
+def test_storage_profile_rejects_unknown_pragma_values() -> None:
+    with pytest.raises(ValueError):
+        StorageProfile(journal_mode="wal; DROP TABLE task")
+
+
+def test_write_is_committed_before_response(client: TestClient, db_path: Path) -> None:
+    committed: list[list[tuple[str]]] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        async def check_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                conn = sqlite3.connect(db_path)
+                committed.append(conn.execute("SELECT name FROM stage").fetchall())
+                conn.close()
+            await send(message)
+
+        await client.app(scope, receive, check_send)
+
+    response = TestClient(app).post("/stages", json={"name": "Todo"})
+
+    assert response.status_code == HTTP_201_CREATED
+    assert committed == [[("Todo",)]]
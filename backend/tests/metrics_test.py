@@ -0,0 +1,126 @@
+import pstats
+import re
+from collections.abc import Generator
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+
+from src.helpers import open_pool
+from src.main import app
+from src.metrics import Metrics, trace_statement
+from src.schemas import StagePublic, TaskPublic
+
+LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+
+@pytest.fixture(name="metrics_client")
+def metrics_client_fixture(
+    client: TestClient, db_path: Path, tmp_path: Path
+) -> Generator[TestClient, None, None]:
+    app.state.pool.close()
+    app.state.pool = open_pool(db_path, size=2, timeout=1, trace=trace_statement)
+    profiles_path = tmp_path / "profiles"
+    profiles_path.mkdir()
+    app.state.metrics = Metrics(profiles_path)
+
+    yield client
+
+    app.state.metrics = None
+
+
+def scrape(client: TestClient) -> dict[tuple[str, frozenset], float]:
+    response = client.get("/metrics")
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line.startswith("#"):
+            continue
+        series, value = line.rsplit(" ", 1)
+        name, _, labels = series.partition("{")
+        samples[(name, frozenset(LABEL.findall(labels)))] = float(value)
+    return samples
+
+
+def labels(**labels: str) -> frozenset:
+    return frozenset(labels.items())
+
+
+def test_requests_are_counted_by_route(
+    metrics_client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, (a, _) = setup_stage_tasks("Todo", "a", "b")
+
+    metrics_client.patch(
+        f"/tasks/{a.id}/move", json={"stage_id": stage.id, "to_index": 1}
+    )
+    # both served from the board the move loaded for its response
+    metrics_client.get("/stages/tasks")
+    metrics_client.get("/stages/tasks")
+    metrics_client.get("/nope/1")
+    metrics_client.get("/nope/2")
+
+    samples = scrape(metrics_client)
+    move = labels(method="PATCH", route="/tasks/{task_id}/move")
+    board = labels(method="GET", route="/stages/tasks")
+    assert samples[("http_request_duration_seconds_count", move)] == 1
+    assert (
+        samples[("http_request_duration_seconds_bucket", move | {("le", "+Inf")})] == 1
+    )
+    assert samples[("http_responses_total", move | {("status", "200")})] == 1
+    assert samples[("db_statements_total", move)] > 1
+    # the task, the board version and the change log rows
+    assert samples[("db_rows_written_total", move)] >= 3
+    assert samples[("db_lock_wait_seconds_total", move)] >= 0
+
+    assert samples[("http_request_duration_seconds_count", board)] == 2
+    assert samples[("db_statements_total", board)] == 0
+
+    unmatched = labels(method="GET", route="unmatched", status="404")
+    assert samples[("http_responses_total", unmatched)] == 2
+
+    assert samples[("db_queue_workers", labels(queue="write"))] == 1
+    assert samples[("db_queue_completed_total", labels(queue="write"))] == 1
+
+
+def test_cache_hits_run_no_statements(
+    metrics_client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a")
+    board = labels(method="GET", route="/stages/tasks")
+
+    metrics_client.get("/stages/tasks")
+    loaded = scrape(metrics_client)[("db_statements_total", board)]
+    metrics_client.get("/stages/tasks")
+
+    assert loaded > 0
+    assert scrape(metrics_client)[("db_statements_total", board)] == loaded
+
+
+def test_profile_header_writes_a_profile(
+    metrics_client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a")
+
+    response = metrics_client.get("/stages/tasks", headers={"X-Profile": "1"})
+
+    assert response.status_code == HTTP_200_OK
+    path = app.state.metrics.profiles_path / response.headers["X-Profile"]
+    functions = {function for _, _, function in pstats.Stats(str(path)).stats}
+    # run on a database read thread, which the profile covers too
+    assert "fetch_stages_with_tasks_json" in functions
+
+    assert "X-Profile" not in metrics_client.get("/stages/tasks").headers
+
+
+def test_metrics_disabled(client: TestClient) -> None:
+    response = client.get("/", headers={"X-Profile": "1"})
+
+    assert "X-Profile" not in response.headers
+    assert client.get("/metrics").status_code == HTTP_404_NOT_FOUND
@@ -0,0 +1,119 @@
+from collections.abc import Callable
+from pathlib import Path
+from sqlite3 import Cursor
+from typing import Generator
+
+import pytest
+
+from src.helpers import init_conn, init_schema
+from src.migrations import SCHEMA_VERSION, get_schema_version, migrate
+from src.repository import (
+    DEFAULT_SCHEMA,
+    fetch_all_tasks_by_stage_id,
+    fetch_neighbour_positions,
+    fetch_next_task_position,
+    fetch_stages_with_tasks,
+    fetch_task_by_id,
+    rebalance_stage_positions,
+)
+
+
+@pytest.fixture(name="cur")
+def cursor_fixture(tmp_path: Path) -> Generator[Cursor, None, None]:
+    conn = init_conn(tmp_path / "test.db")
+    cur = init_schema(conn.cursor(), DEFAULT_SCHEMA)
+
+    yield cur
+
+    cur.close()
+    conn.close()
+
+
+def index_names(cur: Cursor) -> set[str]:
+    rows = cur.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    return {row[0] for row in rows}
+
+
+def query_plans(cur: Cursor, fn: Callable[[], object]) -> list[str]:
+    """Run `fn` and return the query plan details of every statement it ran."""
+    statements: list[str] = []
+    cur.connection.set_trace_callback(statements.append)
+    try:
+        fn()
+    finally:
+        cur.connection.set_trace_callback(None)
+
+    return [
+        row["detail"]
+        for stmt in statements
+        for row in cur.execute(f"EXPLAIN QUERY PLAN {stmt}").fetchall()
+    ]
+
+
+def test_init_schema_migrates_to_latest_version(cur: Cursor) -> None:
+    assert get_schema_version(cur) == SCHEMA_VERSION
+    assert "task_stage_position" in index_names(cur)
+
+
+def test_migrate_upgrades_existing_database(tmp_path: Path) -> None:
+    conn = init_conn(tmp_path / "old.db")
+    cur = conn.cursor()
+    cur.executescript(DEFAULT_SCHEMA)
+    assert get_schema_version(cur) == 0
+
+    assert migrate(cur) == SCHEMA_VERSION
+    assert get_schema_version(cur) == SCHEMA_VERSION
+    assert "task_stage_position" in index_names(cur)
+    conn.close()
+
+
+def test_migrate_is_idempotent_for_replayed_snapshots(cur: Cursor) -> None:
+    cur.execute("PRAGMA user_version = 0")
+
+    assert migrate(cur) == SCHEMA_VERSION
+
+
+def test_migrate_starts_existing_rows_at_version_one(tmp_path: Path) -> None:
+    conn = init_conn(tmp_path / "old.db")
+    cur = conn.cursor()
+    cur.executescript(DEFAULT_SCHEMA)
+    cur.execute("INSERT INTO stage (name) VALUES ('Todo')")
+    cur.execute("INSERT INTO task (name, stage_id, position) VALUES ('a', 1, 0)")
+    conn.commit()
+
+    migrate(cur)
+
+    task = fetch_task_by_id(cur, 1)
+    assert task is not None and task.version == 1
+    assert [stage.version for stage in fetch_stages_with_tasks(cur)] == [1]
+    conn.close()
+
+
+def test_migrate_rejects_newer_schema(cur: Cursor) -> None:
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+
+    with pytest.raises(RuntimeError):
+        migrate(cur)
+
+
+@pytest.mark.parametrize(
+    "fn",
+    [
+        lambda cur: fetch_next_task_position(cur, 1),
+        lambda cur: fetch_all_tasks_by_stage_id(cur, 1),
+        lambda cur: fetch_stages_with_tasks(cur),
+        lambda cur: fetch_neighbour_positions(cur, 1, 0, 1),
+        lambda cur: fetch_neighbour_positions(cur, 1, 3, 1),
+        lambda cur: fetch_task_by_id(cur, 1),
+        lambda cur: rebalance_stage_positions(cur, 1),
+    ],
+)
+def test_task_queries_use_stage_position_index(
+    cur: Cursor, fn: Callable[[Cursor], object]
+) -> None:
+    plans = query_plans(cur, lambda: fn(cur))
+
+    assert plans
+    assert not [plan for plan in plans if plan.startswith("SCAN task")]
+    assert not [plan for plan in plans if "TEMP B-TREE" in plan]
+    assert [plan for plan in plans if "task_stage_position" in plan]
@@ -0,0 +1,105 @@
+from typing import Callable
+
+from fastapi.testclient import TestClient
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_CONTENT,
+)
+
+from src.schemas import StagePublic, TaskPublic
+
+
+def fetch_pages(client: TestClient, stage_id: int, limit: int) -> list[dict]:
+    pages = []
+    params: dict = {"limit": limit}
+    while True:
+        response = client.get(f"/stages/{stage_id}/tasks", params=params)
+        assert response.status_code == HTTP_200_OK
+        pages.append(response.json())
+        if pages[-1]["next"] is None:
+            return pages
+        params["after"] = pages[-1]["next"]
+
+
+def test_pages_cover_the_stage_in_board_order(
+    client: TestClient,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, tasks = setup_stage_with_n_tasks("Done", 25)
+    setup_stage_with_n_tasks("Todo", 3)
+    # a move makes the stage's sort keys uneven
+    client.patch(
+        f"/tasks/{tasks[19].id}/move", json={"stage_id": stage.id, "to_index": 2}
+    )
+
+    pages = fetch_pages(client, stage.id, 10)
+
+    assert [len(page["tasks"]) for page in pages] == [10, 10, 5]
+    board = client.get("/stages/tasks").json()
+    assert [task for page in pages for task in page["tasks"]] == board[0]["tasks"]
+
+
+def test_cursor_survives_writes_before_it(
+    client: TestClient,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, tasks = setup_stage_with_n_tasks("Done", 6)
+    first = client.get(f"/stages/{stage.id}/tasks", params={"limit": 3}).json()
+
+    client.delete(f"/tasks/{tasks[0].id}")
+    client.patch(
+        f"/tasks/{tasks[1].id}/move", json={"stage_id": stage.id, "to_index": 5}
+    )
+
+    second = client.get(
+        f"/stages/{stage.id}/tasks", params={"limit": 3, "after": first["next"]}
+    ).json()
+
+    assert [(t["id"], t["position"]) for t in second["tasks"]] == [
+        (tasks[3].id, 1),
+        (tasks[4].id, 2),
+        (tasks[5].id, 3),
+    ]
+    assert second["next"] is not None
+
+
+def test_last_page_has_no_cursor(
+    client: TestClient,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, _ = setup_stage_with_n_tasks("Done", 3)
+    empty, _ = setup_stage_with_n_tasks("Empty", 0)
+
+    assert (
+        client.get(f"/stages/{stage.id}/tasks", params={"limit": 3}).json()["next"]
+        is None
+    )
+    assert client.get(f"/stages/{empty.id}/tasks").json() == {
+        "tasks": [],
+        "next": None,
+    }
+
+
+def test_invalid_page_requests(client: TestClient) -> None:
+    assert client.get("/stages/99/tasks").status_code == HTTP_404_NOT_FOUND
+    for params in ({"after": "nope"}, {"limit": 0}, {"limit": 100_000}):
+        response = client.get("/stages/1/tasks", params=params)
+        assert response.status_code == HTTP_422_UNPROCESSABLE_CONTENT
+
+
+def test_board_summary(
+    client: TestClient,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, _ = setup_stage_with_n_tasks("Todo", 4)
+    empty, _ = setup_stage_with_n_tasks("Empty", 0)
+
+    response = client.get("/stages/summary")
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json() == [
+        {"name": "Todo", "id": todo.id, "version": 5, "task_count": 4},
+        {"name": "Empty", "id": empty.id, "version": 1, "task_count": 0},
+    ]
+    assert "ETag" in response.headers
@@ -0,0 +1,157 @@
+import sqlite3
+import threading
+from pathlib import Path
+from sqlite3 import Connection
+from typing import Generator
+
+import pytest
+
+from src.helpers import init_conn, init_schema, open_pool
+from src.pool import ConnectionPool, PoolClosed, PoolTimeout
+from src.repository import DEFAULT_SCHEMA, fetch_all_stages, insert_stage
+from src.schemas import StageCreate
+
+
+@pytest.fixture(name="pool")
+def pool_fixture(tmp_path: Path) -> Generator[ConnectionPool, None, None]:
+    db_path = tmp_path / "pool.db"
+    conn = init_conn(db_path)
+    init_schema(conn.cursor(), DEFAULT_SCHEMA)
+    conn.close()
+
+    pool = open_pool(db_path, size=2, timeout=0.1)
+
+    yield pool
+
+    pool.close()
+
+
+def test_write_is_committed(pool: ConnectionPool) -> None:
+    with pool.write() as cur:
+        insert_stage(cur, StageCreate(name="Todo"))
+
+    with pool.read() as cur:
+        assert [stage.name for stage in fetch_all_stages(cur)] == ["Todo"]
+
+
+def test_write_is_rolled_back_on_error(pool: ConnectionPool) -> None:
+    with pytest.raises(RuntimeError):
+        with pool.write() as cur:
+            insert_stage(cur, StageCreate(name="Todo"))
+            raise RuntimeError
+
+    with pool.read() as cur:
+        assert fetch_all_stages(cur) == []
+
+
+def test_readers_do_not_see_uncommitted_writes(pool: ConnectionPool) -> None:
+    with pool.write() as write_cur:
+        insert_stage(write_cur, StageCreate(name="Todo"))
+        with pool.read() as read_cur:
+            assert fetch_all_stages(read_cur) == []
+
+
+def test_exhausted_pool_times_out(pool: ConnectionPool) -> None:
+    with pool.read(), pool.read():
+        with pytest.raises(PoolTimeout):
+            with pool.read():
+                pass
+
+
+def test_writer_is_serialized(pool: ConnectionPool) -> None:
+    with pool.write():
+        with pytest.raises(PoolTimeout):
+            with pool.write():
+                pass
+
+
+def test_swap_replaces_database_without_failing_reads(
+    pool: ConnectionPool, tmp_path: Path
+) -> None:
+    new_path = tmp_path / "new.db"
+    conn = init_conn(new_path)
+    insert_stage(init_schema(conn.cursor(), DEFAULT_SCHEMA), StageCreate(name="New"))
+    conn.commit()
+    conn.close()
+
+    errors: list[Exception] = []
+    stop = threading.Event()
+
+    def read_until_stopped() -> None:
+        while not stop.is_set():
+            try:
+                with pool.read() as cur:
+                    fetch_all_stages(cur)
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=read_until_stopped) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    try:
+        for _ in range(5):
+            pool.swap(lambda: None)
+        pool.swap(lambda: new_path.replace(pool.path))
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+    assert errors == []
+    with pool.read() as cur:
+        assert [stage.name for stage in fetch_all_stages(cur)] == ["New"]
+
+
+def test_swap_reopens_connections_when_replace_fails(pool: ConnectionPool) -> None:
+    with pool.write() as cur:
+        insert_stage(cur, StageCreate(name="Todo"))
+
+    def replace() -> None:
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        pool.swap(replace)
+
+    with pool.read() as cur:
+        assert [stage.name for stage in fetch_all_stages(cur)] == ["Todo"]
+
+
+def test_swap_reopens_connections_when_closing_fails(
+    pool: ConnectionPool,
+) -> None:
+    close_connections = pool._close_connections
+    replaced = False
+
+    def fail_checkpoint(readers: list[Connection]) -> None:
+        close_connections(readers)
+        raise sqlite3.OperationalError("disk I/O error")
+
+    def replace() -> None:
+        nonlocal replaced
+        replaced = True
+
+    pool._close_connections = fail_checkpoint  # type: ignore[method-assign]
+    with pytest.raises(sqlite3.OperationalError):
+        pool.swap(replace)
+    del pool._close_connections
+
+    assert not replaced and not pool.closed
+    with pool.read() as cur:
+        assert fetch_all_stages(cur) == []
+
+
+def test_swap_closes_pool_when_reopening_fails(pool: ConnectionPool) -> None:
+    def connect(path: Path) -> Connection:
+        raise sqlite3.OperationalError("unable to open database file")
+
+    pool.connect = connect
+    with pytest.raises(sqlite3.OperationalError):
+        pool.swap(lambda: None)
+
+    assert pool.closed
+    with pytest.raises(PoolClosed):
+        with pool.read():
+            pass
+    with pytest.raises(PoolClosed):
+        with pool.write():
+            pass
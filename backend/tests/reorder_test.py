@@ -0,0 +1,149 @@
+from sqlite3 import Cursor
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_CONTENT,
+)
+
+from src.repository import (
+    InvalidStageOrder,
+    TasksNotFound,
+    fetch_all_tasks_by_stage_id,
+    fetch_board_version,
+    move_tasks,
+    set_stage_order,
+)
+from src.schemas import StagePublic, TaskBulkMove, TaskPublic
+
+
+def names(cur: Cursor, stage: StagePublic) -> list[str]:
+    return [t.name for t in fetch_all_tasks_by_stage_id(cur, stage.id)]
+
+
+def test_move_tasks_applies_moves_in_order(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b, c, d) = setup_stage_tasks("Todo", "a", "b", "c", "d")
+    done, (e,) = setup_stage_tasks("Done", "e")
+    version = fetch_board_version(cur)
+
+    moved = move_tasks(
+        cur,
+        [
+            TaskBulkMove(task_id=d.id, stage_id=todo.id, to_index=0),
+            TaskBulkMove(task_id=b.id, stage_id=done.id, to_index=0),
+            TaskBulkMove(task_id=a.id, stage_id=done.id, to_index=99),
+        ],
+    )
+
+    assert names(cur, todo) == ["d", "c"]
+    assert names(cur, done) == ["b", "e", "a"]
+    assert fetch_board_version(cur) == version + 1
+    assert {(t.id, t.stage_id, t.position) for t in moved} == {
+        (d.id, todo.id, 0),
+        (c.id, todo.id, 1),
+        (b.id, done.id, 0),
+        (e.id, done.id, 1),
+        (a.id, done.id, 2),
+    }
+
+
+def test_move_tasks_rejects_unknown_tasks(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a,) = setup_stage_tasks("Todo", "a")
+
+    with pytest.raises(TasksNotFound) as exc_info:
+        move_tasks(
+            cur,
+            [
+                TaskBulkMove(task_id=a.id, stage_id=todo.id, to_index=0),
+                TaskBulkMove(task_id=999, stage_id=todo.id, to_index=0),
+            ],
+        )
+    assert exc_info.value.ids == [999]
+
+
+def test_set_stage_order_moves_tasks_in(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b) = setup_stage_tasks("Todo", "a", "b")
+    done, (c, d) = setup_stage_tasks("Done", "c", "d")
+
+    set_stage_order(cur, todo.id, [b.id, d.id, a.id])
+
+    assert names(cur, todo) == ["b", "d", "a"]
+    assert names(cur, done) == ["c"]
+
+
+def test_set_stage_order_must_list_every_task(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b) = setup_stage_tasks("Todo", "a", "b")
+
+    with pytest.raises(InvalidStageOrder):
+        set_stage_order(cur, todo.id, [b.id])
+    with pytest.raises(InvalidStageOrder):
+        set_stage_order(cur, todo.id, [b.id, a.id, b.id])
+
+
+def test_unchanged_order_writes_nothing(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, tasks = setup_stage_tasks("Todo", "a", "b", "c")
+    version = fetch_board_version(cur)
+    changes = cur.connection.total_changes
+
+    assert set_stage_order(cur, todo.id, [t.id for t in tasks]) == []
+    assert cur.connection.total_changes == changes
+    assert fetch_board_version(cur) == version
+
+
+def test_bulk_move_endpoint(
+    client: TestClient,
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, (a, b) = setup_stage_tasks("Todo", "a", "b")
+    archive, _ = setup_stage_tasks("Archive")
+    moves = [
+        {"task_id": task.id, "stage_id": archive.id, "to_index": 99} for task in (a, b)
+    ]
+
+    response = client.patch("/tasks/move", json=moves, params={"response": "delta"})
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["version"] == fetch_board_version(cur)
+    assert names(cur, archive) == ["a", "b"]
+
+    response = client.patch(
+        "/tasks/move", json=[{"task_id": a.id, "stage_id": 999, "to_index": 0}]
+    )
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+def test_stage_order_endpoint(
+    client: TestClient,
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b, c) = setup_stage_tasks("Todo", "c", "a", "b")
+
+    response = client.put(
+        f"/stages/{todo.id}/order", json={"task_ids": [b.id, c.id, a.id]}
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert [t["name"] for t in response.json()[0]["tasks"]] == ["a", "b", "c"]
+
+    response = client.put(f"/stages/{todo.id}/order", json={"task_ids": [a.id]})
+    assert response.status_code == HTTP_422_UNPROCESSABLE_CONTENT
@@ -1,69 +1,32 @@
-from pathlib import Path
+import json
 from sqlite3 import Cursor
-from typing import Callable, Generator
+from typing import Callable
 
-import pytest
 from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
 from starlette.status import HTTP_200_OK
 
-from src.main import app, init_schema, init_conn
 from src.repository import (
+    fetch_all_tasks,
     fetch_all_tasks_by_stage_id,
+    fetch_all_tasks_json,
+    fetch_stages_with_tasks,
+    fetch_stages_with_tasks_json,
     fetch_task_by_id,
-    insert_stage,
     insert_task,
-    DEFAULT_SCHEMA,
+    patch_task,
+    update_task_ordering,
+    POSITION_GAP,
+)
+from src.schemas import (
+    BoardDelta,
+    StageDetail,
+    StagePublic,
+    TaskCreate,
+    TaskMoveUpdate,
+    TaskNameUpdate,
+    TaskPublic,
 )
-from src.schemas import StageCreate, StagePublic, TaskCreate, TaskPublic
-
-
-@pytest.fixture(name="client")
-def client_fixture(cur: Cursor) -> Generator[TestClient, None, None]:
-    app.state.conn = cur.connection
-    app.state.cur = cur
-
-    yield TestClient(app)
-
-
-@pytest.fixture(name="cur")
-def cursor_fixture() -> Generator[Cursor, None, None]:
-    conn = init_conn(Path(":memory:"))
-    cur = conn.cursor()
-    cur = init_schema(cur, DEFAULT_SCHEMA)
-
-    yield cur
-
-    cur.close()
-    conn.close()
-
-
-@pytest.fixture(name="setup_stage_tasks")
-def setup_stage_tasks_fixture(
-    cur: Cursor,
-) -> Callable[..., tuple[StagePublic, list[TaskPublic]]]:
-    def _create(stage_name: str, *task_names: str):
-        stage = insert_stage(cur, StageCreate(name=stage_name))
-        return stage, [
-            insert_task(cur, TaskCreate(name=name, stage_id=stage.id))
-            for name in task_names
-        ]
-
-    return _create
-
-
-@pytest.fixture(name="setup_stage_with_n_tasks")
-def setup_stage_with_n_tasks_fixture(
-    cur: Cursor,
-) -> Callable[..., tuple[StagePublic, list[TaskPublic]]]:
-    def _create(stage_name: str, num_tasks: int):
-        stage = insert_stage(cur, StageCreate(name=stage_name))
-        tasks = [
-            insert_task(cur, TaskCreate(name=f"Task {i + 1}", stage_id=stage.id))
-            for i in range(num_tasks)
-        ]
-        return stage, tasks
-
-    return _create
 
 
 def test_reorder_task_within_stage(
@@ -131,3 +94,191 @@ def test_reorder_task_new_stage(
     assert set(map(lambda task: task.position, updated_new_tasks)) == set(
         range(0, new_stage_length + 1)
     )
+
+
+def test_fetch_stages_with_tasks_groups_tasks_by_stage(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, todo_tasks = setup_stage_tasks("Todo", "a", "b", "c")
+    empty, _ = setup_stage_tasks("Empty")
+    done, done_tasks = setup_stage_tasks("Done", "d")
+
+    stages = fetch_stages_with_tasks(cur)
+
+    assert [stage.id for stage in stages] == [todo.id, empty.id, done.id]
+    assert stages[0].tasks == todo_tasks
+    assert stages[1].tasks == []
+    assert stages[2].tasks == done_tasks
+
+
+def test_json_fast_path_matches_validated_models(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "a", "b")
+    setup_stage_tasks("Empty")
+    setup_stage_tasks("Done", "c")
+
+    stages = TypeAdapter(list[StageDetail]).validate_json(
+        fetch_stages_with_tasks_json(cur)
+    )
+    tasks = TypeAdapter(list[TaskPublic]).validate_json(fetch_all_tasks_json(cur))
+
+    assert stages == fetch_stages_with_tasks(cur)
+    assert tasks == fetch_all_tasks(cur)
+    assert json.loads(fetch_stages_with_tasks_json(cur))[1] == {
+        "name": "Empty",
+        "id": stages[1].id,
+        "version": 1,
+        "tasks": [],
+    }
+
+
+def move(cur: Cursor, task: TaskPublic, stage_id: int, to_index: int) -> TaskPublic:
+    old_task = fetch_task_by_id(cur, task.id)
+    assert old_task is not None
+    return update_task_ordering(
+        cur, old_task, TaskMoveUpdate(stage_id=stage_id, to_index=to_index)
+    )
+
+
+def test_move_writes_only_the_moved_row(
+    cur: Cursor,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, tasks = setup_stage_with_n_tasks("Todo", 100)
+
+    changes = cur.connection.total_changes
+    moved = move(cur, tasks[90], stage.id, 3)
+
+    # the moved row, its stage's version, their change log entries and the
+    # board version
+    assert cur.connection.total_changes - changes == 5
+    assert moved.position == 3
+    assert [t.id for t in fetch_all_tasks_by_stage_id(cur, stage.id)][2:5] == [
+        tasks[2].id,
+        tasks[90].id,
+        tasks[3].id,
+    ]
+
+
+def test_move_rebalances_stage_when_gap_runs_out(
+    cur: Cursor,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, tasks = setup_stage_with_n_tasks("Todo", 3)
+    expected = [task.id for task in tasks]
+
+    # keep moving the last task between the first two until keys collide
+    for _ in range(POSITION_GAP.bit_length() + 2):
+        last = fetch_all_tasks_by_stage_id(cur, stage.id)[-1]
+        move(cur, last, stage.id, 1)
+        expected.insert(1, expected.pop())
+
+    updated = fetch_all_tasks_by_stage_id(cur, stage.id)
+    assert [task.id for task in updated] == expected
+    assert [task.position for task in updated] == [0, 1, 2]
+
+
+def test_move_keeps_positions_contiguous(
+    cur: Cursor,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, todo_tasks = setup_stage_with_n_tasks("Todo", 4)
+    done, _ = setup_stage_with_n_tasks("Done", 2)
+
+    move(cur, todo_tasks[0], done.id, 10)
+    move(cur, todo_tasks[3], done.id, 0)
+    moved = move(cur, todo_tasks[1], todo.id, 1)
+
+    assert moved.position == 1
+    assert [t.id for t in fetch_all_tasks_by_stage_id(cur, todo.id)] == [
+        todo_tasks[2].id,
+        todo_tasks[1].id,
+    ]
+    done_tasks = fetch_all_tasks_by_stage_id(cur, done.id)
+    assert done_tasks[0].id == todo_tasks[3].id
+    assert done_tasks[-1].id == todo_tasks[0].id
+    assert [t.position for t in done_tasks] == [0, 1, 2, 3]
+
+
+def test_move_to_negative_index_moves_to_start(
+    cur: Cursor,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, tasks = setup_stage_with_n_tasks("Todo", 4)
+
+    moved = move(cur, tasks[3], stage.id, -1)
+
+    assert moved.position == 0
+    assert [t.id for t in fetch_all_tasks_by_stage_id(cur, stage.id)] == [
+        tasks[3].id,
+        tasks[0].id,
+        tasks[1].id,
+        tasks[2].id,
+    ]
+
+
+def test_move_delta_response_contains_only_changed_tasks(
+    client: TestClient,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, todo_tasks = setup_stage_with_n_tasks("Todo", 5)
+    done, done_tasks = setup_stage_with_n_tasks("Done", 3)
+
+    response = client.patch(
+        f"/tasks/{todo_tasks[2].id}/move?response=delta",
+        json={"stage_id": done.id, "to_index": 1},
+    )
+    assert response.status_code == HTTP_200_OK
+    delta = BoardDelta.model_validate(response.json())
+
+    assert {(t.id, t.stage_id, t.position) for t in delta.tasks} == {
+        (todo_tasks[3].id, todo.id, 2),
+        (todo_tasks[4].id, todo.id, 3),
+        (todo_tasks[2].id, done.id, 1),
+        (done_tasks[1].id, done.id, 2),
+        (done_tasks[2].id, done.id, 3),
+    }
+
+    response = client.patch(
+        f"/tasks/{todo_tasks[0].id}/move?response=delta",
+        json={"stage_id": todo.id, "to_index": 1},
+    )
+    next_delta = BoardDelta.model_validate(response.json())
+
+    assert next_delta.version == delta.version + 1
+    assert {(t.id, t.position) for t in next_delta.tasks} == {
+        (todo_tasks[1].id, 0),
+        (todo_tasks[0].id, 1),
+    }
+
+
+class RecordingCursor(Cursor):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.statements: list[str] = []
+
+    def execute(self, sql: str, parameters=(), /) -> Cursor:
+        self.statements.append(sql)
+        return super().execute(sql, parameters)
+
+
+def test_statements_are_reused_with_bound_values(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    stage, (a, b) = setup_stage_tasks("Todo", "a", "b")
+    name = "x'); DROP TABLE task; --"
+
+    statements = []
+    for task, new_name in ((a, name), (b, "y")):
+        recording = cur.connection.cursor(RecordingCursor)
+        fetch_task_by_id(recording, task.id)
+        patch_task(recording, task.id, TaskNameUpdate(name=new_name))
+        insert_task(recording, TaskCreate(name=new_name, stage_id=stage.id))
+        statements.append(recording.statements)
+
+    assert statements[0] == statements[1]
+    assert fetch_task_by_id(cur, a.id).name == name
@@ -0,0 +1,113 @@
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_CONTENT,
+)
+
+from src import dev_utils
+from src.schemas import StagePublic, TaskPublic
+
+
+def search(client: TestClient, q: str, **params) -> list[str]:
+    response = client.get("/tasks/search", params={"q": q, **params})
+    assert response.status_code == HTTP_200_OK, response.text
+    return [task["name"] for task in response.json()["tasks"]]
+
+
+def test_search_matches_word_prefixes_best_first(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks(
+        "Todo", "Write tests for the docs", "Review", "Write docs", "Écrire"
+    )
+
+    assert search(client, "docs") == ["Write docs", "Write tests for the docs"]
+    assert search(client, "wri DOC") == ["Write docs", "Write tests for the docs"]
+    assert search(client, "write review") == []
+    assert search(client, "ecri") == ["Écrire"]
+
+
+def test_search_follows_writes_and_filters_by_stage(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b) = setup_stage_tasks("Todo", "alpha", "beta")
+    done, (c,) = setup_stage_tasks("Done", "alpha two")
+
+    client.patch(f"/tasks/{b.id}", json={"name": "alpha three"})
+    client.delete(f"/tasks/{a.id}")
+    client.patch(f"/tasks/{c.id}/move", json={"stage_id": todo.id, "to_index": 0})
+
+    response = client.get("/tasks/search", params={"q": "alpha"})
+    assert sorted(response.json()["tasks"], key=lambda task: task["id"]) == [
+        {"name": "alpha three", "stage_id": todo.id, "id": b.id},
+        {"name": "alpha two", "stage_id": todo.id, "id": c.id},
+    ]
+    assert search(client, "beta") == []
+    assert search(client, "alpha", stage_id=done.id) == []
+
+
+def test_search_pages(
+    client: TestClient,
+    setup_stage_with_n_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, tasks = setup_stage_with_n_tasks("Todo", 25)
+
+    ids = []
+    params: dict = {"q": "task", "limit": 10}
+    while True:
+        page = client.get("/tasks/search", params=params).json()
+        ids += [task["id"] for task in page["tasks"]]
+        if page["next"] is None:
+            break
+        params["after"] = page["next"]
+
+    assert sorted(ids) == [task.id for task in tasks]
+
+
+def test_search_input_is_not_query_syntax(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    setup_stage_tasks("Todo", "fix NEAR bug", "other")
+
+    assert search(client, 'NEAR("fix" bu*') == ["fix NEAR bug"]
+    assert search(client, "*:-") == []
+
+    for params in ({"q": ""}, {"q": "fix", "after": "-1"}, {"q": "fix", "limit": 0}):
+        response = client.get("/tasks/search", params=params)
+        assert response.status_code == HTTP_422_UNPROCESSABLE_CONTENT
+    response = client.get("/tasks/search", params={"q": "fix", "stage_id": 99})
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+def test_search_after_loading_a_diff_snapshot(
+    client: TestClient,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    snapshots_path = tmp_path / "snapshots"
+    snapshots_path.mkdir()
+    monkeypatch.setattr(dev_utils, "DB_SNAPSHOTS_PATH", snapshots_path)
+    _, (task,) = setup_stage_tasks("Todo", "alpha")
+
+    client.post(
+        "/dev/snapshots/save", json={"name": "base", "comment": "", "format": "sql"}
+    )
+    client.patch(f"/tasks/{task.id}", json={"name": "omega"})
+    client.post(
+        "/dev/snapshots/save",
+        json={"name": "renamed", "comment": "", "format": "diff", "parent": "base.sql"},
+    )
+
+    client.post("/dev/snapshots/load", json={"name": "base.sql"})
+    assert search(client, "alpha") == ["alpha"]
+    client.post("/dev/snapshots/load", json={"name": "renamed.diff"})
+    assert (search(client, "alpha"), search(client, "omega")) == ([], ["omega"])
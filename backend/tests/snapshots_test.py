@@ -0,0 +1,151 @@
+from pathlib import Path
+from sqlite3 import Cursor
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_409_CONFLICT
+
+from src import dev_utils
+from src.helpers import init_conn
+from src.migrations import SCHEMA_VERSION, get_schema_version
+from src.repository import fetch_all_tasks_by_stage_id, fetch_board_version
+from src.schemas import StagePublic, TaskPublic
+from src.snapshots import backup_db, dump_sql, restore_db, snapshot_stats
+
+
+def board(cur: Cursor) -> list[tuple]:
+    rows = cur.execute(
+        "SELECT stage.name, task.name, task.position FROM task JOIN stage"
+        " ON stage.id = task.stage_id ORDER BY task.id"
+    )
+    return [tuple(row) for row in rows]
+
+
+@pytest.mark.parametrize("name", ["snapshot.db", "snapshot.db.gz", "snapshot.sql"])
+def test_snapshot_roundtrip(
+    cur: Cursor,
+    tmp_path: Path,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+    name: str,
+) -> None:
+    setup_stage_tasks("Todo", "a", "b")
+    setup_stage_tasks("Done", "c")
+    path = tmp_path / name
+
+    if name.endswith(".sql"):
+        with path.open("w") as f:
+            dump_sql(cur.connection, f)
+    else:
+        backup_db(cur.connection, path)
+
+    conn = init_conn(tmp_path / "restored.db")
+    restore_db(path, conn)
+
+    assert board(conn.cursor()) == board(cur)
+    assert get_schema_version(conn.cursor()) == SCHEMA_VERSION
+    stats = snapshot_stats(path)
+    assert (stats["stages"], stats["tasks"]) == (2, 3)
+    assert stats["size"] == path.stat().st_size
+    assert not any(p.name.startswith(".") for p in tmp_path.iterdir())
+    conn.close()
+
+
+def test_save_and_load_snapshot(
+    client: TestClient,
+    cur: Cursor,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    snapshots_path = tmp_path / "snapshots"
+    snapshots_path.mkdir()
+    monkeypatch.setattr(dev_utils, "DB_SNAPSHOTS_PATH", snapshots_path)
+    stage, _ = setup_stage_tasks("Todo", "a")
+
+    response = client.post(
+        "/dev/snapshots/save",
+        json={"name": "one", "comment": "one task", "format": "db.gz"},
+    )
+    assert response.status_code == HTTP_201_CREATED
+    assert response.json()["name"] == "one.db.gz"
+
+    client.post("/tasks", json={"name": "b", "stage_id": stage.id})
+    version = client.get("/stages/tasks").headers["ETag"]
+
+    snapshots = client.get("/dev/snapshots").json()
+    assert [(s["name"], s["comment"], s["tasks"]) for s in snapshots] == [
+        ("one.db.gz", "one task", 1)
+    ]
+
+    response = client.post("/dev/snapshots/load", json={"name": "one.db.gz"})
+    assert response.status_code == HTTP_200_OK
+
+    with client.app.state.pool.read() as read_cur:
+        assert [t.name for t in fetch_all_tasks_by_stage_id(read_cur, stage.id)] == [
+            "a"
+        ]
+        assert fetch_board_version(read_cur) > int(version.strip('"'))
+
+
+def test_diff_snapshot_chain_and_compaction(
+    client: TestClient,
+    cur: Cursor,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    snapshots_path = tmp_path / "snapshots"
+    snapshots_path.mkdir()
+    monkeypatch.setattr(dev_utils, "DB_SNAPSHOTS_PATH", snapshots_path)
+    stage, tasks = setup_stage_tasks("Todo", "a", "b")
+
+    def save(name: str, **snapshot: str) -> dict:
+        response = client.post(
+            "/dev/snapshots/save", json={"name": name, "comment": name, **snapshot}
+        )
+        assert response.status_code == HTTP_201_CREATED, response.text
+        return response.json()
+
+    def current() -> list[tuple]:
+        with client.app.state.pool.read() as read_cur:
+            return board(read_cur)
+
+    def load(name: str) -> list[tuple]:
+        response = client.post("/dev/snapshots/load", json={"name": name})
+        assert response.status_code == HTTP_200_OK, response.text
+        return current()
+
+    save("base", format="db")
+    client.patch(f"/tasks/{tasks[0].id}", json={"name": "a2"})
+    client.post("/tasks", json={"name": "c", "stage_id": stage.id})
+    one = save("one", format="diff", parent="base.db")
+    assert (one["parent"], one["tasks"]) == ("base.db", 2)
+
+    client.delete(f"/tasks/{tasks[1].id}")
+    save("two", format="diff", parent="one.diff")
+    at_two = current()
+
+    assert load("base.db") != at_two
+    response = client.post(
+        "/dev/snapshots/save",
+        json={"name": "x", "comment": "", "format": "diff", "parent": "one.diff"},
+    )
+    assert response.status_code == HTTP_409_CONFLICT
+
+    assert load("two.diff") == at_two
+    # the loaded diff is the base of further diffs
+    client.post("/tasks", json={"name": "d", "stage_id": stage.id})
+    save("three", format="diff", parent="two.diff")
+    at_three = current()
+
+    response = client.post("/dev/snapshots/compact", json={"name": "two.diff"})
+    assert response.status_code == HTTP_201_CREATED, response.text
+    assert response.json()["tasks"] == 2
+    assert not (snapshots_path / "two.diff").exists()
+    snapshots = {s["name"]: s for s in client.get("/dev/snapshots").json()}
+    assert snapshots["three.diff"]["parent"] == "two.db.gz"
+
+    load("base.db")
+    assert load("two.db.gz") == at_two
+    assert load("three.diff") == at_three
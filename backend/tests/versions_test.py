@@ -0,0 +1,170 @@
+from sqlite3 import Cursor
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_204_NO_CONTENT,
+    HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT,
+)
+
+from src.repository import (
+    VersionConflict,
+    delete_task_by_id,
+    fetch_stage_by_id,
+    fetch_task_by_id,
+    patch_task,
+)
+from src.schemas import StagePublic, TaskNameUpdate, TaskPublic
+
+
+def task_version(cur: Cursor, task_id: int) -> int:
+    task = fetch_task_by_id(cur, task_id)
+    assert task is not None
+    return task.version
+
+
+def stage_version(cur: Cursor, stage_id: int) -> int:
+    stage = fetch_stage_by_id(cur, stage_id)
+    assert stage is not None
+    return stage.version
+
+
+def test_writes_bump_versions(
+    cur: Cursor,
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b) = setup_stage_tasks("Todo", "a", "b")
+    done, _ = setup_stage_tasks("Done")
+    todo_version, done_version = (
+        stage_version(cur, todo.id),
+        stage_version(cur, done.id),
+    )
+
+    client.patch(f"/tasks/{a.id}", json={"name": "A"})
+    assert task_version(cur, a.id) == a.version + 1
+    # a rename leaves the stage as it was
+    assert stage_version(cur, todo.id) == todo_version
+
+    client.patch(f"/tasks/{b.id}/move", json={"stage_id": done.id, "to_index": 0})
+    assert task_version(cur, b.id) == b.version + 1
+    assert stage_version(cur, todo.id) == todo_version + 1
+    assert stage_version(cur, done.id) == done_version + 1
+
+
+def test_rename_with_current_version(
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, (task,) = setup_stage_tasks("Todo", "a")
+
+    response = client.patch(
+        f"/tasks/{task.id}",
+        json={"name": "renamed"},
+        headers={"If-Match": f'"{task.version}"'},
+    )
+
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["version"] == task.version + 1
+
+
+def test_rename_with_stale_version_conflicts(
+    cur: Cursor,
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, (task,) = setup_stage_tasks("Todo", "a")
+    client.patch(f"/tasks/{task.id}", json={"name": "first"})
+
+    response = client.patch(
+        f"/tasks/{task.id}",
+        json={"name": "second"},
+        headers={"If-Match": f'"{task.version}"'},
+    )
+
+    assert response.status_code == HTTP_409_CONFLICT
+    assert response.headers["ETag"] == f'"{task.version + 1}"'
+    task = fetch_task_by_id(cur, task.id)
+    assert task is not None and task.name == "first"
+
+
+def test_rename_of_missing_task(client: TestClient) -> None:
+    response = client.patch("/tasks/999", json={"name": "x"}, headers={"If-Match": "*"})
+
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+def test_move_with_stale_version_conflicts(
+    cur: Cursor,
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b) = setup_stage_tasks("Todo", "a", "b")
+    client.patch(f"/tasks/{a.id}/move", json={"stage_id": todo.id, "to_index": 1})
+
+    response = client.patch(
+        f"/tasks/{a.id}/move",
+        json={"stage_id": todo.id, "to_index": 0},
+        headers={"If-Match": f'"{a.version}"'},
+    )
+
+    assert response.status_code == HTTP_409_CONFLICT
+    b = fetch_task_by_id(cur, b.id)
+    assert b is not None and b.position == 0
+
+
+def test_delete_with_if_match(
+    cur: Cursor,
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, (task,) = setup_stage_tasks("Todo", "a")
+    stale = {"If-Match": f'"{task.version + 1}"'}
+    current = {"If-Match": f'"{task.version}"'}
+
+    assert client.delete(f"/tasks/{task.id}", headers=stale).status_code == (
+        HTTP_409_CONFLICT
+    )
+    assert client.delete(f"/tasks/{task.id}", headers=current).status_code == (
+        HTTP_204_NO_CONTENT
+    )
+    assert client.delete(f"/tasks/{task.id}", headers=current).status_code == (
+        HTTP_404_NOT_FOUND
+    )
+
+
+def test_stage_order_with_stale_version_conflicts(
+    cur: Cursor,
+    client: TestClient,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    todo, (a, b) = setup_stage_tasks("Todo", "a", "b")
+    stale = stage_version(cur, todo.id)
+    client.post("/tasks", json={"name": "c", "stage_id": todo.id})
+
+    response = client.put(
+        f"/stages/{todo.id}/order",
+        json={"task_ids": [b.id, a.id]},
+        headers={"If-Match": f'"{stale}"'},
+    )
+
+    assert response.status_code == HTTP_409_CONFLICT
+    assert response.headers["ETag"] == f'"{stale + 1}"'
+
+
+def test_conditional_writes_in_repository(
+    cur: Cursor,
+    setup_stage_tasks: Callable[..., tuple[StagePublic, list[TaskPublic]]],
+) -> None:
+    _, (task,) = setup_stage_tasks("Todo", "a")
+
+    with pytest.raises(VersionConflict) as conflict:
+        patch_task(cur, task.id, TaskNameUpdate(name="b"), {task.version + 1})
+    assert conflict.value.version == task.version
+    with pytest.raises(VersionConflict):
+        delete_task_by_id(cur, task.id, set())
+
+    assert delete_task_by_id(cur, task.id, {task.version}) == 1
@@ -0,0 +1,8 @@
+import type { Handle } from '@sveltejs/kit';
+
+// `load` reads the board version from the ETag of the board it fetches,
+// which SvelteKit only allows for headers it serializes for hydration
+export const handle: Handle = ({ event, resolve }) =>
+	resolve(event, {
+		filterSerializedResponseHeaders: (name) => name === 'etag'
+	});
@@ -1,4 +1,4 @@
-import type { StageResponse, TaskResponse } from '$lib/types';
+import type { BoardDeltaResponse, StageResponse, TaskResponse } from '$lib/types';
 
 const BACKEND_PREFIX = 'http://localhost:8000';
 
@@ -6,9 +6,9 @@ async function updateTaskMoveRequest(
 	taskID: number,
 	stageID: number,
 	toIndex: number
-): Promise<StageResponse[]> {
+): Promise<BoardDeltaResponse> {
 	const body = { to_index: toIndex, stage_id: stageID };
-	const res = await fetch(`${BACKEND_PREFIX}/tasks/${taskID}/move`, {
+	const res = await fetch(`${BACKEND_PREFIX}/tasks/${taskID}/move?response=delta`, {
 		method: 'PATCH',
 		headers: {
 			'Content-Type': 'application/json'
@@ -115,8 +115,59 @@ async function loadSnapshotRequest(name: string): Promise<boolean> {
 	return true;
 }
 
+function boardVersion(res: Response): number | undefined {
+	const etag = res.headers.get('ETag');
+	return etag ? Number(etag.replace(/^W\//, '').replaceAll('"', '')) : undefined;
+}
+
+async function fetchBoardRequest(): Promise<
+	{ stages: StageResponse[]; version: number | undefined } | undefined
+> {
+	const res = await fetch(`${BACKEND_PREFIX}/stages/tasks`);
+	if (!res.ok) {
+		console.error('error fetching stage details');
+		return undefined;
+	}
+	return { stages: await res.json(), version: boardVersion(res) };
+}
+
+type BoardEventHandlers = {
+	taskChanged: (task: TaskResponse) => void;
+	tasksMoved: (delta: BoardDeltaResponse) => void;
+	taskDeleted: (taskID: number) => void;
+	stageCreated: (stage: StageResponse) => void;
+	// the changes are too large or too old to replay, reload the whole board
+	reload: () => void;
+};
+
+// Follows board changes made by anyone, starting after board version `since`.
+// The browser reconnects on its own and resumes from the last event id.
+function subscribeBoardEvents(
+	since: number | undefined,
+	handlers: BoardEventHandlers
+): EventSource {
+	const query = since === undefined ? '' : `?since=${since}`;
+	const source = new EventSource(`${BACKEND_PREFIX}/events${query}`);
+	function on<T>(name: string, handle: (data: T) => void) {
+		source.addEventListener(name, (event) => handle(JSON.parse((event as MessageEvent).data)));
+	}
+
+	on<TaskResponse>('task.created', handlers.taskChanged);
+	on<TaskResponse>('task.updated', handlers.taskChanged);
+	on<BoardDeltaResponse>('tasks.moved', handlers.tasksMoved);
+	on<{ id: number }>('task.deleted', (data) => handlers.taskDeleted(data.id));
+	on<StageResponse>('stage.created', handlers.stageCreated);
+	on('tasks.created', handlers.reload);
+	on('board.replaced', handlers.reload);
+	on('reset', handlers.reload);
+	return source;
+}
+
 export {
 	BACKEND_PREFIX,
+	boardVersion,
+	fetchBoardRequest,
+	subscribeBoardEvents,
 	updateTaskMoveRequest,
 	updateTaskNameRequest,
 	addTaskRequest,
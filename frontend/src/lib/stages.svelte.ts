@@ -32,6 +32,29 @@ class Stages {
 		this.stages = stages;
 	}
 
+	applyTaskDelta(tasks: TaskResponse[]) {
+		const changed = new Map(tasks.map((task) => [task.id, task]));
+		this.stages = this.stages.map((stage) => {
+			const updated = stage.tasks.filter((task) => !changed.has(task.id));
+			updated.push(...tasks.filter((task) => task.stage_id === stage.id));
+			updated.sort((a, b) => a.position - b.position);
+			return { ...stage, tasks: updated };
+		});
+	}
+
+	addStage(newStage: StageResponse) {
+		if (!this.stages.some((stage) => stage.id === newStage.id)) {
+			this.stages = [...this.stages, newStage];
+		}
+	}
+
+	deleteTask(taskID: number) {
+		this.stages = this.stages.map((stage) => ({
+			...stage,
+			tasks: stage.tasks.filter((task) => task.id !== taskID)
+		}));
+	}
+
 	removeTask(stageID: number, taskID: number) {
 		const index = this.getStageIndexByID(stageID);
 		if (index === undefined) {
@@ -3,11 +3,18 @@ type TaskResponse = {
 	name: string;
 	stage_id: number;
 	position: number;
+	version: number;
 };
 
 type StageResponse = {
 	id: number;
 	name: string;
+	version: number;
+	tasks: TaskResponse[];
+};
+
+type BoardDeltaResponse = {
+	version: number;
 	tasks: TaskResponse[];
 };
 
@@ -16,4 +23,4 @@ type SnapshotResponse = {
 	comment: string;
 };
 
-export type { TaskResponse, StageResponse, SnapshotResponse };
+export type { TaskResponse, StageResponse, BoardDeltaResponse, SnapshotResponse };
@@ -1,6 +1,6 @@
 import type { SnapshotResponse, StageResponse } from '$lib/types';
 
-import { BACKEND_PREFIX } from '$lib/api';
+import { BACKEND_PREFIX, boardVersion } from '$lib/api';
 import type { PageLoad } from './$types';
 
 export const load: PageLoad = async ({ fetch }) => {
@@ -9,6 +9,7 @@ export const load: PageLoad = async ({ fetch }) => {
 		console.error('Failed to fetch stages', stagesResponse.status);
 	}
 	const stages: StageResponse[] = await stagesResponse.json();
+	const version = boardVersion(stagesResponse);
 
 	const snapshotResponse = await fetch(`${BACKEND_PREFIX}/dev/snapshots/current`);
 	let currentSnapshot: SnapshotResponse | null = null;
@@ -26,6 +27,7 @@ export const load: PageLoad = async ({ fetch }) => {
 
 	return {
 		stages,
+		version,
 		currentSnapshot,
 		allSnapshots
 	};